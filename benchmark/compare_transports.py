@@ -0,0 +1,69 @@
+import argparse
+import itertools
+from stage_breakdown import STAGES, discover_runs, load_runs, compute_stages
+from steady_state import trim_runs
+from stage_statistics import METRICS, RESAMPLES, describe, compare, holm
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Compare the latency of transports with confidence intervals, effect sizes and significance')
+    parser.add_argument('--run', type=str, nargs='+', default=["tcp_big", "uds_big", "rosbridge_big"],
+                       help='Runs to compare, all repetitions of each (e.g., "tcp_big") or a single one ("tcp_big_1")')
+    parser.add_argument('--metric', type=str, nargs='+', default=["Median", "99th Percentile"], choices=METRICS,
+                       help='Metrics to compare')
+    parser.add_argument('--resamples', type=int, default=RESAMPLES,
+                       help='Bootstrap resamples')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Seed of the bootstrap')
+    parser.add_argument('--alpha', type=float, default=0.05,
+                       help='Family-wise significance level of all comparisons together (Holm)')
+    parser.add_argument('--no-trim', action='store_true',
+                       help='Keep the transients at the start and end of each run instead of trimming to the steady state')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    columns = ["Total Transmission Time"] + STAGES
+    results = {}
+    for run in args.run:
+        df = compute_stages(load_runs(discover_runs(f'benchmark/data/{run}')))
+        if not args.no_trim:
+            df = trim_runs(df)
+        results[run] = describe(df, columns, args.resamples, args.seed)
+        print(f"{run}: {df['Run'].nunique()} repetitions, {len(df)} messages")
+        for metric in args.metric:
+            row = METRICS.index(metric)
+            print(f"  {metric} Total Transmission Time: {results[run]['estimate'][row, 0]:.3f} ms "
+                  f"[{results[run]['lower'][row, 0]:.3f}, {results[run]['upper'][row, 0]:.3f}]")
+
+    # Stages only count where both runs measured them, rosbridge has the total only
+    comparisons = {}
+    for run_a, run_b in itertools.combinations(args.run, 2):
+        for column_index, column in enumerate(columns):
+            if not (results[run_a]["sample"].counts[:, column_index].any() and results[run_b]["sample"].counts[:, column_index].any()):
+                continue
+            for metric in args.metric:
+                comparisons[run_a, run_b, metric, column] = compare(results[run_a], results[run_b], column_index, column_index, metric)
+    # Every printed comparison is a test, the p-values are adjusted for all of them together
+    adjusted = dict(zip(comparisons, holm([comparison["p"] for comparison in comparisons.values()])))
+    # A p-value of 0 means none of the resamples crossed 0, the Holm factor scales that bound as well
+    floor = 1 / args.resamples
+
+    for run_a, run_b in itertools.combinations(args.run, 2):
+        print(f"\n{run_b} vs {run_a} (difference {run_b} - {run_a}, 95% CI, bootstrap p unadjusted and Holm-adjusted over {len(comparisons)} tests, Cliff's delta)")
+        for (pair_a, pair_b, metric, column), comparison in comparisons.items():
+            if (pair_a, pair_b) != (run_a, run_b):
+                continue
+            p_holm = adjusted[run_a, run_b, metric, column]
+            significant = "significant" if p_holm < args.alpha and comparison["lower"] * comparison["upper"] > 0 else "not significant"
+            p_value = f"p < {floor:g}" if comparison["p"] == 0 else f"p = {comparison['p']:.3f}"
+            holm_value = f"Holm p < {min(floor * len(comparisons), 1):g}" if p_holm == 0 else f"Holm p = {p_holm:.3f}"
+            print(f"  {metric} {column}: {comparison['a']:.3f} -> {comparison['b']:.3f} ms, "
+                  f"{comparison['difference']:+.3f} ms [{comparison['lower']:+.3f}, {comparison['upper']:+.3f}], "
+                  f"x{comparison['ratio']:.2f}, {p_value}, {holm_value} ({significant}), "
+                  f"delta {comparison['cliffs_delta']:+.3f} ({comparison['effect']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import sys
+import numpy as np
+import pandas as pd
+from timestamp_archive import ARCHIVE_SUFFIX, iter_archive_blocks, read_archive, read_header
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ros2_api"))
+from results_io import column_file
+
+CACHE_DIR = ".cache"  # Per run, holds the CSVs as binary columns
+
+
+def load_columns(column_dir):
+    """ Memory-maps the .npy columns listed in column_dir/columns.txt into a DataFrame. """
+    with open(os.path.join(column_dir, "columns.txt")) as header_file:
+        headers = header_file.read().splitlines()
+    return pd.DataFrame({header: np.load(os.path.join(column_dir, column_file(header)), mmap_mode="r") for header in headers}, copy=False)
+
+
+def cache_key(csv_path, read_csv_kwargs):
+    """ Identifies a parse of a CSV: its mtime, size and the parse options. """
+    stat = os.stat(csv_path)
+    return f"{stat.st_mtime_ns} {stat.st_size} {sorted(read_csv_kwargs.items())!r}\n"
+
+
+def load_cached_csv(run_path, name, **read_csv_kwargs):
+    """
+    Parses `name`.csv once and keeps its columns as .npy files in run_path/.cache/`name`/,
+    later loads memory-map them. The cache is rebuilt whenever the CSV's mtime or size changes.
+    Tables with non-numeric columns aren't cached. Spaces after the separators are skipped unless
+    skipinitialspace=False is passed, so ", "-separated CSVs have the same column names as their archives.
+    """
+    read_csv_kwargs.setdefault("skipinitialspace", True)
+    csv_path = os.path.join(run_path, f"{name}.csv")
+    cache_dir = os.path.join(run_path, CACHE_DIR, name)
+    key_path = os.path.join(cache_dir, "source.txt")
+    key = cache_key(csv_path, read_csv_kwargs)
+    if os.path.isfile(key_path):
+        with open(key_path) as key_file:
+            if key_file.read() == key:
+                return load_columns(cache_dir)
+
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+        return df
+    # Written into a temporary directory and renamed, so an interrupted write never looks valid
+    temp_dir = f"{cache_dir}.{os.getpid()}.tmp"
+    os.makedirs(temp_dir, exist_ok=True)
+    with open(os.path.join(temp_dir, "columns.txt"), 'w') as header_file:
+        header_file.write("\n".join(df.columns) + "\n")
+    for header in df.columns:
+        column = df[header].to_numpy()
+        np.save(os.path.join(temp_dir, column_file(header)), column.astype(np.int64 if column.dtype.kind in "iub" else np.float64))
+    with open(os.path.join(temp_dir, "source.txt"), 'w') as key_file:
+        key_file.write(key)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(temp_dir, cache_dir)
+    return load_columns(cache_dir)
+
+
+def load_table(run_path, name, **read_csv_kwargs):
+    """
+    Loads the table `name` of a run, e.g. "arrived_messages".
+    Reads the binary columns written by the harness if present, else the archive `name`.tsz (see timestamp_archive.py),
+    else falls back to `name`.csv through the memory-mapped cache. The columns are read-only.
+    """
+    column_dir = os.path.join(run_path, name)
+    if os.path.isfile(os.path.join(column_dir, "columns.txt")):
+        return load_columns(column_dir)
+    archive_path = os.path.join(run_path, f"{name}{ARCHIVE_SUFFIX}")
+    if os.path.isfile(archive_path):
+        return read_archive(archive_path)
+    return load_cached_csv(run_path, name, **read_csv_kwargs)
+
+
+def has_table(run_path, name):
+    """ Whether a run has the table `name` in any of the forms load_table() reads. """
+    return any(os.path.exists(os.path.join(run_path, f"{name}{suffix}")) for suffix in ("", ARCHIVE_SUFFIX, ".csv"))
+
+
+def table_columns(run_path, name):
+    """ The column names of a table without loading it, as load_table() names them. """
+    column_dir = os.path.join(run_path, name)
+    if os.path.isfile(os.path.join(column_dir, "columns.txt")):
+        with open(os.path.join(column_dir, "columns.txt")) as header_file:
+            return header_file.read().splitlines()
+    archive_path = os.path.join(run_path, f"{name}{ARCHIVE_SUFFIX}")
+    if os.path.isfile(archive_path):
+        with open(archive_path, 'rb') as archive_file:
+            return [column["name"] for column in read_header(archive_file)[0]["columns"]]
+    return list(pd.read_csv(os.path.join(run_path, f"{name}.csv"), nrows=0, skipinitialspace=True).columns)
+
+
+def iter_table_chunks(run_path, name, chunk_rows, columns=None):
+    """
+    Yields the table `name` of a run as DataFrames of at most chunk_rows rows, so tables larger than the memory
+    can be processed in bounded memory: slices of the memory-mapped binary columns, of the archive's blocks,
+    or the CSV parsed chunk by chunk.
+    """
+    column_dir = os.path.join(run_path, name)
+    if os.path.isfile(os.path.join(column_dir, "columns.txt")):
+        with open(os.path.join(column_dir, "columns.txt")) as header_file:
+            headers = [header for header in header_file.read().splitlines() if columns is None or header in columns]
+        paths = {header: os.path.join(column_dir, column_file(header)) for header in headers}
+        rows = len(np.load(next(iter(paths.values())), mmap_mode="r")) if paths else 0
+        for start in range(0, rows, chunk_rows):
+            # Mapped anew per chunk, so the pages read before are unmapped and don't pile up in memory
+            yield pd.DataFrame({header: np.array(np.load(path, mmap_mode="r")[start:start + chunk_rows]) for header, path in paths.items()})
+        return
+    archive_path = os.path.join(run_path, f"{name}{ARCHIVE_SUFFIX}")
+    if os.path.isfile(archive_path):
+        # Archives are decoded a block at a time, cut into chunks of chunk_rows
+        for block in iter_archive_blocks(archive_path, columns):
+            for start in range(0, len(block), chunk_rows):
+                yield block.iloc[start:start + chunk_rows]
+        return
+    yield from pd.read_csv(os.path.join(run_path, f"{name}.csv"), chunksize=chunk_rows, usecols=columns, skipinitialspace=True)
+
+
+def load_clock_sync(run_path):
+    """ The clock_sync.json of a run (see ros2_api/clock_sync.py), None for runs recorded on the realtime clock. """
+    sync_path = os.path.join(run_path, "clock_sync.json")
+    if not os.path.isfile(sync_path):
+        return None
+    with open(sync_path) as sync_file:
+        return json.load(sync_file)
+
+
+def to_harness_clock(realtime_ns, clock_sync):
+    """
+    Maps realtime timestamps (SDK and ROS timing CSVs) onto the harness' monotonic clock.
+    The offset is interpolated linearly between the start and end measurement, which removes
+    NTP slewing and drift during the run. Timestamps are returned unchanged without clock_sync.
+    """
+    if clock_sync is None:
+        return realtime_ns
+    start, end = clock_sync["start"], clock_sync["end"]
+    span_ns = end["realtime_ns"] - start["realtime_ns"]
+    progress = (realtime_ns - start["realtime_ns"]) / span_ns if span_ns else 0.0
+    offset_ns = start["offset_ns"] + (end["offset_ns"] - start["offset_ns"]) * progress
+    return (realtime_ns - np.round(offset_ns)).astype(np.int64)
@@ -0,0 +1,82 @@
+import numpy as np
+
+BUCKETS = 2000  # About the pixel columns of a 12 inch wide figure at 150 dpi
+MODES = ["minmax", "lttb"]
+
+
+def finite_points(x, y):
+    """ x and y as arrays without the points whose y is NaN or infinite (e.g. unmatched stages). """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.isfinite(y)
+    return (x, y) if keep.all() else (x[keep], y[keep])
+
+
+def bucket_starts(x, buckets):
+    """ First index of every non-empty bucket: equally wide in x if x is sorted, else equally many points. """
+    if len(x) > 1 and np.issubdtype(x.dtype, np.number) and x[-1] > x[0] and np.all(x[1:] >= x[:-1]):
+        starts = np.searchsorted(x, np.linspace(x[0], x[-1], buckets + 1)[:-1], side="left")
+    else:
+        starts = np.arange(buckets) * len(x) // buckets
+    return np.unique(starts)
+
+
+def first_hits(mask, segments):
+    """ Index of the first True of mask in each segment, every segment needs one. """
+    hits = np.flatnonzero(mask)
+    _, first = np.unique(segments[hits], return_index=True)
+    return hits[first]
+
+
+def minmax(x, y, buckets=BUCKETS):
+    """
+    Keeps the lowest and the highest point of every bucket, in their order, so a line through them covers
+    exactly the range the full series covers in each pixel column: every spike stays visible.
+    At most 2 * buckets points in O(n).
+    """
+    x, y = finite_points(x, y)
+    if len(y) <= 2 * buckets:
+        return x, y
+    starts = bucket_starts(x, buckets)
+    segments = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(y)]))
+    lowest = np.minimum.reduceat(y, starts)[segments]
+    highest = np.maximum.reduceat(y, starts)[segments]
+    indices = np.union1d(first_hits(y == lowest, segments), first_hits(y == highest, segments))
+    return x[indices], y[indices]
+
+
+def lttb(x, y, threshold=BUCKETS):
+    """
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013): keeps the first and last point and from each bucket in between
+    the point spanning the largest triangle with the point kept before and the mean of the next bucket.
+    Follows the shape of the series with threshold points; spikes span large triangles and are kept,
+    but of a bucket holding a spike and a dip only one survives, minmax() keeps both.
+    """
+    x, y = finite_points(x, y)
+    if len(y) <= threshold or threshold < 3:
+        return x, y
+    positions = x.astype(np.float64) if np.issubdtype(x.dtype, np.number) else np.arange(len(y), dtype=np.float64)
+    edges = np.linspace(1, len(y) - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, len(y) - 1
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_x = positions[end:edges[bucket + 2]].mean()
+            next_y = y[end:edges[bucket + 2]].mean()
+        else:
+            next_x, next_y = positions[-1], y[-1]
+        previous = selected[bucket]
+        areas = np.abs((positions[previous] - next_x) * (y[start:end] - y[previous])
+                       - (positions[previous] - positions[start:end]) * (next_y - y[previous]))
+        selected[bucket + 1] = start + int(np.argmax(areas))
+    return x[selected], y[selected]
+
+
+def decimate(x, y, buckets=BUCKETS, mode="minmax"):
+    """ Reduces a series to about `buckets` pixel columns for plotting, with minmax() or lttb(). """
+    if mode == "minmax":
+        return minmax(x, y, buckets)
+    if mode == "lttb":
+        return lttb(x, y, buckets)
+    raise ValueError(f"Unknown decimation mode {mode!r}, expected one of {MODES}")
@@ -0,0 +1,178 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from data_loader import has_table, load_table
+from stage_breakdown import discover_runs, read_scenario
+
+QUANTILES = {"Median": 0.5, "99th Percentile": 0.99, "99.9th Percentile": 0.999}
+SEGMENT_LENGTH = 4096  # Intervals per Welch segment, 0.024 Hz resolution at 100 Hz, 0.24 Hz at 1 kHz
+PEAKS = 5
+DRIFT_WINDOW_S = 10
+
+
+def find_runs(base_path):
+    """ The run itself if it holds message_arrival_times, else its repetitions base_path_1, base_path_2, ... """
+    return [base_path] if has_table(base_path, "message_arrival_times") else discover_runs(base_path)
+
+
+def nominal_period_ns(path, hz=None):
+    """
+    The period the messages were sent at: 1 / hz if given, else the rate of a constant scenario.json,
+    else the number ending the run name, e.g. system_100_2 or system_100 -> 100 Hz -> 10 ms.
+    """
+    if hz is None:
+        rate = read_scenario(path).get("rate", {})
+        if rate.get("profile") == "constant":
+            hz = rate["hz"]
+    if hz is None:
+        match = re.search(r"_(\d+)(?:_\d+)?$", os.path.basename(os.path.normpath(path)))
+        if match is None:
+            raise ValueError(f"No rate in the name of {path}, pass it explicitly")
+        hz = int(match.group(1))
+    return 1_000_000_000 / hz
+
+
+def load_arrivals(path):
+    """ Arrival timestamps of a run in ns, in arrival order. """
+    return load_table(path, "message_arrival_times")["TimeArrival_ns"].to_numpy(np.int64)
+
+
+def phase_error(arrivals_ns, period_ns):
+    """
+    Time error of every arrival against an ideal clock ticking at period_ns from the first one, in ns.
+    Every arrival counts as the next tick, a lost message shifts the rest by one period.
+    """
+    return (arrivals_ns - arrivals_ns[0]).astype(np.float64) - np.arange(len(arrivals_ns)) * period_ns
+
+
+def allan_deviation(phase_ns, period_ns):
+    """
+    Overlapping Allan deviation of the rate for tau = 1, 2, 4, ... periods, as long as half the series spans 2 tau.
+    Returns (tau in s, deviation as fraction of the rate). White timer noise falls with 1/tau, a flat floor is
+    flicker of the scheduler, a rise at long tau a drifting clock or load.
+    """
+    factors = 2 ** np.arange(int(np.log2(max(len(phase_ns) // 4, 1))) + 1)
+    deviations = np.array([
+        np.sqrt(np.mean((phase_ns[2 * m:] - 2 * phase_ns[m:-m] + phase_ns[:-2 * m]) ** 2) / 2) / (m * period_ns)
+        for m in factors
+    ]) if len(phase_ns) > 2 else np.array([])
+    return factors[:len(deviations)] * period_ns / 1e9, deviations
+
+
+def spectrum(deviations_ns, period_ns, segment_length=SEGMENT_LENGTH):
+    """
+    Welch power spectrum of the interval deviations, sampled once per nominal period: Hann windowed segments
+    overlapping by half, averaged. Returns (frequency in Hz, power in ns^2/Hz). Periodic disturbances, e.g. a timer
+    tick or a GC cycle beating against the send rate, show as peaks; above half the send rate they fold back.
+    """
+    segment_length = min(segment_length, len(deviations_ns))
+    sample_rate = 1e9 / period_ns
+    if segment_length < 2:
+        return np.array([]), np.array([])
+    segments = np.lib.stride_tricks.sliding_window_view(deviations_ns, segment_length)[::segment_length // 2]
+    window = np.hanning(segment_length)
+    segments = (segments - segments.mean(axis=1, keepdims=True)) * window
+    power = np.mean(np.abs(np.fft.rfft(segments, axis=1)) ** 2, axis=0) / (sample_rate * np.sum(window ** 2))
+    power[1:-1] *= 2  # One-sided
+    return np.fft.rfftfreq(segment_length, 1 / sample_rate), power
+
+
+def spectrum_peaks(frequencies, power, count=PEAKS):
+    """
+    The `count` strongest local maxima above 0 Hz as [(frequency in Hz, power over the median power)],
+    each at least 2% of the spectrum away from a stronger one, so a broad peak counts once.
+    """
+    if len(power) < 3:
+        return []
+    inner = np.arange(1, len(power) - 1)
+    local = inner[(power[inner] > power[inner - 1]) & (power[inner] >= power[inner + 1])]
+    separation = max(len(power) // 50, 2)
+    strongest = []
+    for index in local[np.argsort(power[local])[::-1]]:
+        if all(abs(index - kept) >= separation for kept in strongest):
+            strongest.append(index)
+            if len(strongest) == count:
+                break
+    median = np.median(power[1:])
+    return [(float(frequencies[index]), float(power[index] / median) if median else np.inf) for index in strongest]
+
+
+def drift(arrivals_ns, phase_ns, period_ns, window_s=DRIFT_WINDOW_S):
+    """
+    How the rate moves over a run: a quadratic fit of the phase error over time gives the rate offset from nominal
+    (ppm, positive when slower) and its drift (ppm per minute); windows of window_s seconds give the rate over time.
+    Returns (offset_ppm, drift_ppm_per_minute, DataFrame of Time (s), Rate (Hz), Offset (ppm) per window).
+    """
+    elapsed_s = (arrivals_ns - arrivals_ns[0]) / 1e9
+    if len(arrivals_ns) < 3:
+        return np.nan, np.nan, pd.DataFrame(columns=["Time", "Rate", "Offset"])
+    curvature, slope, _ = np.polyfit(elapsed_s, phase_ns / 1e9, 2)
+    windows = (elapsed_s // window_s).astype(np.int64)
+    counts = np.bincount(windows)
+    firsts = np.searchsorted(windows, np.arange(len(counts)))
+    lasts = firsts + counts - 1
+    full = counts > 1
+    mean_interval_ns = (arrivals_ns[lasts[full]] - arrivals_ns[firsts[full]]) / (counts[full] - 1)
+    windows_df = pd.DataFrame({
+        "Time": np.flatnonzero(full) * window_s,
+        "Rate": 1e9 / mean_interval_ns,
+        "Offset": (mean_interval_ns / period_ns - 1) * 1e6,
+    })
+    return slope * 1e6, 2 * curvature * 60 * 1e6, windows_df
+
+
+def deviation_statistics(deviations_ns):
+    """ Mean, standard deviation, quantiles and extremes of interval deviations, in ms. """
+    deviations_ms = deviations_ns / 1e6
+    if not len(deviations_ms):
+        return {}
+    statistics = {"Mean": deviations_ms.mean(), "Standard Deviation": deviations_ms.std(ddof=1) if len(deviations_ms) > 1 else np.nan}
+    statistics.update(zip(QUANTILES, np.quantile(deviations_ms, list(QUANTILES.values()))))
+    statistics.update({"Min": deviations_ms.min(), "Max": deviations_ms.max(),
+                       "Max Absolute": np.abs(deviations_ms).max()})
+    return statistics
+
+
+def analyze_arrivals(arrivals_ns, period_ns, segment_length=SEGMENT_LENGTH):
+    """ Jitter, Allan deviation, spectrum and drift of one run's arrival times against the nominal period. """
+    arrivals_ns = np.asarray(arrivals_ns, dtype=np.int64)
+    deviations_ns = np.diff(arrivals_ns) - period_ns
+    phase_ns = phase_error(arrivals_ns, period_ns)
+    frequencies, power = spectrum(deviations_ns, period_ns, segment_length)
+    offset_ppm, drift_ppm, windows = drift(arrivals_ns, phase_ns, period_ns)
+    return {
+        "messages": len(arrivals_ns), "duration_s": (arrivals_ns[-1] - arrivals_ns[0]) / 1e9 if len(arrivals_ns) else 0.0,
+        "deviations_ns": deviations_ns, "statistics": deviation_statistics(deviations_ns),
+        "allan": allan_deviation(phase_ns, period_ns), "spectrum": (frequencies, power), "peaks": spectrum_peaks(frequencies, power),
+        "offset_ppm": offset_ppm, "drift_ppm_per_minute": drift_ppm, "windows": windows,
+    }
+
+
+def analyze_runs(paths, period_ns=None, segment_length=SEGMENT_LENGTH):
+    """
+    analyze_arrivals() of every repetition and of all pooled: the deviations of all repetitions together,
+    their spectra averaged over the segments of all (one segment length, the shortest run's if it is shorter)
+    and the Allan deviations averaged in variance over the taus every repetition reaches.
+    Returns ({run name: result}, pooled result, period_ns).
+    """
+    period_ns = period_ns or nominal_period_ns(paths[0])
+    arrivals = {os.path.basename(os.path.normpath(path)): load_arrivals(path) for path in paths}
+    segment_length = min([segment_length] + [len(run_arrivals) - 1 for run_arrivals in arrivals.values()])
+    runs = {name: analyze_arrivals(run_arrivals, period_ns, segment_length) for name, run_arrivals in arrivals.items()}
+
+    deviations_ns = np.concatenate([run["deviations_ns"] for run in runs.values()])
+    taus = min((run["allan"][0] for run in runs.values()), key=len)
+    allan = np.sqrt(np.mean([run["allan"][1][:len(taus)] ** 2 for run in runs.values()], axis=0)) if len(taus) else np.array([])
+    # Weighted by the segments each repetition contributed, which is the Welch average over all segments
+    weights = np.array([max((len(run["deviations_ns"]) - segment_length) // max(segment_length // 2, 1) + 1, 1) for run in runs.values()])
+    frequencies = next(iter(runs.values()))["spectrum"][0]
+    power = np.average([run["spectrum"][1] for run in runs.values()], axis=0, weights=weights)
+    pooled = {
+        "messages": sum(run["messages"] for run in runs.values()), "duration_s": sum(run["duration_s"] for run in runs.values()),
+        "deviations_ns": deviations_ns, "statistics": deviation_statistics(deviations_ns),
+        "allan": (taus, allan), "spectrum": (frequencies, power), "peaks": spectrum_peaks(frequencies, power),
+        "offset_ppm": np.mean([run["offset_ppm"] for run in runs.values()]),
+        "drift_ppm_per_minute": np.mean([run["drift_ppm_per_minute"] for run in runs.values()]),
+    }
+    return runs, pooled, period_ns
@@ -0,0 +1,217 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+from data_loader import CACHE_DIR, has_table, iter_table_chunks, load_clock_sync, table_columns
+from timestamp_archive import ARCHIVE_SUFFIX
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ros2_api"))
+from latency_histogram import LatencyHistogram
+
+PIPELINE_VERSION = 2  # Bumped whenever the outputs change, so older ones are processed again
+CHUNK_ROWS = 1_000_000  # Rows in memory at a time, ~50 MB for the arrived messages
+OUTPUT_DIR = os.path.join(CACHE_DIR, "limit")  # Derived from the run's tables, rebuilt when they change
+PER_SECOND_FILE = "per_second.csv"
+HISTOGRAM_FILE = "latency_histogram.npz"
+SUMMARY_FILE = "summary.json"
+REBASED_BELOW_NS = 10 ** 12  # Realtime timestamps are ~1.7e18, ones below ~17 minutes are relative to the run start
+# Input table -> columns it needs, the arrived table also holds the on-time latencies
+INPUT_TABLES = {
+    "arrived_messages": ["Sent Time", "Received Time"],
+    "invalid_ids_arrived_too_late": ["Sent Time", "Received Time"],
+    "invalid_ids_never_arrived": ["Sent Time"],
+}
+INTENDED_COLUMN = "Intended Time"  # The offered load, recorded by runs newer than the first limit runs
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Reduce limit runs to per-second bins, loss counts and a latency histogram in one pass')
+    parser.add_argument('--run', type=str, nargs='+',
+                       help='Run directories in benchmark/data, all with "limit" in their name by default')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                       help='Rows read at a time, bounds the memory whatever the size of the run')
+    return parser.parse_args()
+
+
+class PerSecond:
+    """ Counters, sums, minima and maxima per second since an origin, growing with the seconds seen. """
+
+    def __init__(self, origin_ns):
+        self.origin_ns = origin_ns
+        self.columns = {}
+
+    def column(self, name, seconds, fill=0.0):
+        """ The array of a column, grown to hold every second up to max(seconds). """
+        column = self.columns.get(name)
+        size = int(seconds.max()) + 1 if len(seconds) else 0
+        if column is None or len(column[0]) < size:
+            grown = np.full(max(size, len(column[0]) if column else 0), fill)
+            if column is not None:
+                grown[:len(column[0])] = column[0]
+            column = (grown, fill)
+            self.columns[name] = column
+        return column[0]
+
+    def seconds(self, timestamps_ns):
+        """ Seconds since the origin, earlier timestamps count into second 0. """
+        return np.maximum((np.asarray(timestamps_ns, dtype=np.int64) - self.origin_ns) // 1_000_000_000, 0)
+
+    def count(self, name, timestamps_ns):
+        seconds = self.seconds(timestamps_ns)
+        column = self.column(name, seconds)
+        counts = np.bincount(seconds)
+        column[:len(counts)] += counts
+
+    def add(self, name, timestamps_ns, values):
+        seconds = self.seconds(timestamps_ns)
+        column = self.column(name, seconds)
+        sums = np.bincount(seconds, weights=values)
+        column[:len(sums)] += sums
+
+    def extreme(self, name, timestamps_ns, values, function):
+        """ Running minimum (function=np.minimum) or maximum (np.maximum) per second. """
+        seconds = self.seconds(timestamps_ns)
+        fill = np.inf if function is np.minimum else -np.inf
+        function.at(self.column(name, seconds, fill), seconds, values)
+
+    def table(self):
+        """ All columns over the same seconds, missing minima and maxima as NaN. """
+        length = max((len(column) for column, _ in self.columns.values()), default=0)
+        table = {"Second": np.arange(length)}
+        for name, (column, fill) in self.columns.items():
+            padded = np.full(length, fill)
+            padded[:len(column)] = column
+            table[name] = np.where(np.isinf(padded), np.nan, padded)
+        return pd.DataFrame(table)
+
+
+def run_origin(run_path, chunk_rows):
+    """
+    The start of a run on its own clock: the harness start from clock_sync.json, else the earliest send of
+    the first chunk of each table (sends are written in send order, the first chunk holds the earliest ones).
+    Older runs were recorded on the realtime clock, timestamps far below it were already rebased to the start.
+    """
+    clock_sync = load_clock_sync(run_path)
+    if clock_sync is not None:
+        return clock_sync["start"]["monotonic_ns"]
+    firsts = []
+    for name in INPUT_TABLES:
+        if has_table(run_path, name):
+            for chunk in iter_table_chunks(run_path, name, chunk_rows, ["Sent Time"]):
+                if len(chunk):
+                    firsts.append(int(chunk["Sent Time"].min()))
+                break
+    if not firsts or min(firsts) < REBASED_BELOW_NS:
+        return 0  # Rebased by the former wall_time_subtractor.py, the run started at 0
+    return min(firsts)
+
+
+def process_limit_run(run_path, chunk_rows=CHUNK_ROWS):
+    """
+    Streams the arrived, late and lost messages of a limit run once, chunk by chunk, and writes into <run>/.cache/limit/
+    - per_second.csv: per second since the start (rebased) the messages sent, received, arrived on time,
+      late and lost (by send time, received by receive time), offered (by intended send time, if recorded)
+      and the min/mean/max latency in ms of the on-time ones,
+    - latency_histogram.npz: the LatencyHistogram of all on-time latencies,
+    - summary.json: the totals and the first loss.
+    Memory stays at one chunk plus one row per second, whatever the number of messages.
+    """
+    bins = PerSecond(run_origin(run_path, chunk_rows))
+    histogram = LatencyHistogram()
+    totals = {name: 0 for name in INPUT_TABLES}
+    first_lost_ns = None
+    offered = False
+    for name, columns in INPUT_TABLES.items():
+        if not has_table(run_path, name):
+            continue
+        intended = INTENDED_COLUMN in table_columns(run_path, name)
+        offered = offered or intended
+        for chunk in iter_table_chunks(run_path, name, chunk_rows, columns + [INTENDED_COLUMN] * intended):
+            sent = chunk["Sent Time"].to_numpy(np.int64)
+            totals[name] += len(sent)
+            bins.count("Sent", sent)
+            if intended:
+                bins.count("Offered", chunk[INTENDED_COLUMN].to_numpy(np.int64))
+            if name == "invalid_ids_never_arrived":
+                bins.count("Lost", sent)
+                if len(sent):
+                    first_lost_ns = int(sent.min()) if first_lost_ns is None else min(first_lost_ns, int(sent.min()))
+                continue
+            received = chunk["Received Time"].to_numpy(np.int64)
+            bins.count("Received", received)
+            if name == "invalid_ids_arrived_too_late":
+                bins.count("Late", sent)
+                continue
+            latency_ns = received - sent
+            histogram.record_many(latency_ns)
+            bins.count("Arrived", sent)
+            bins.add("Latency Sum", sent, latency_ns / 1_000_000)
+            bins.extreme("Min Latency", sent, latency_ns / 1_000_000, np.minimum)
+            bins.extreme("Max Latency", sent, latency_ns / 1_000_000, np.maximum)
+
+    output_dir = os.path.join(run_path, OUTPUT_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    table = bins.table()
+    for column in ["Sent", "Received", "Arrived", "Late", "Lost"] + ["Offered"] * offered:
+        table[column] = table[column].fillna(0).astype(np.int64) if column in table else 0
+    if "Latency Sum" in table:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            table["Mean Latency"] = table.pop("Latency Sum") / table["Arrived"]
+    table.to_csv(os.path.join(output_dir, PER_SECOND_FILE), index=False)
+    histogram.save(os.path.join(output_dir, HISTOGRAM_FILE))
+    summary = {
+        "version": PIPELINE_VERSION,
+        "origin_ns": bins.origin_ns,
+        "arrived": totals["arrived_messages"],
+        "late": totals["invalid_ids_arrived_too_late"],
+        "lost": totals["invalid_ids_never_arrived"],
+        "first_lost_s": (first_lost_ns - bins.origin_ns) / 1_000_000_000 if first_lost_ns is not None else None,
+        "offered": offered,
+        "chunk_rows": chunk_rows,
+    }
+    with open(os.path.join(output_dir, SUMMARY_FILE), 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    return summary
+
+
+def is_current(run_path):
+    """ Whether the outputs of process_limit_run() exist, are of this version and newer than all of its inputs. """
+    outputs = [os.path.join(run_path, OUTPUT_DIR, name) for name in (PER_SECOND_FILE, HISTOGRAM_FILE, SUMMARY_FILE)]
+    if not all(os.path.isfile(path) for path in outputs):
+        return False
+    with open(outputs[-1]) as summary_file:
+        if json.load(summary_file).get("version") != PIPELINE_VERSION:
+            return False
+    inputs = [os.path.join(run_path, f"{name}{suffix}") for name in INPUT_TABLES for suffix in ("", ARCHIVE_SUFFIX, ".csv")]
+    newest_input = max((os.path.getmtime(path) for path in inputs if os.path.exists(path)), default=0)
+    return min(os.path.getmtime(path) for path in outputs) >= newest_input
+
+
+def load_limit_run(run_path, chunk_rows=CHUNK_ROWS):
+    """ The per-second table, latency histogram and summary of a limit run, processed first if they are missing or stale. """
+    if not is_current(run_path):
+        process_limit_run(run_path, chunk_rows)
+    output_dir = os.path.join(run_path, OUTPUT_DIR)
+    with open(os.path.join(output_dir, SUMMARY_FILE)) as summary_file:
+        summary = json.load(summary_file)
+    return pd.read_csv(os.path.join(output_dir, PER_SECOND_FILE)), LatencyHistogram.load(os.path.join(output_dir, HISTOGRAM_FILE)), summary
+
+
+def main():
+    args = parse_arguments()
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    runs = args.run or sorted(name for name in os.listdir(data_dir) if "limit" in name and os.path.isdir(os.path.join(data_dir, name)))
+    for run in runs:
+        run_path = os.path.join(data_dir, run)
+        if not any(has_table(run_path, name) for name in INPUT_TABLES):
+            print(f"{run}: no arrived, late or lost messages")
+            continue
+        summary = process_limit_run(run_path, args.chunk_rows)
+        first_lost = f", first loss after {summary['first_lost_s']:.2f} s" if summary["first_lost_s"] is not None else ""
+        print(f"{run}: {summary['arrived']} arrived, {summary['late']} late, {summary['lost']} lost{first_lost}")
+
+
+if __name__ == "__main__":
+    main()
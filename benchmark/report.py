@@ -0,0 +1,397 @@
+import argparse
+import html
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+matplotlib.use("Agg")  # Headless, figures are only written to files
+import matplotlib.pyplot as plt
+import numpy as np
+from data_loader import CACHE_DIR, has_table, load_table
+from stage_breakdown import STAGES, discover_runs, load_runs, compute_stages
+from steady_state import trim_runs
+from stage_statistics import METRICS, describe
+from decimation import decimate
+from jitter import QUANTILES as JITTER_QUANTILES, analyze_arrivals, nominal_period_ns
+from limit_pipeline import INPUT_TABLES as LIMIT_TABLES, load_limit_run
+from saturation import analyze_run as analyze_saturation
+
+REPORT_VERSION = 5  # Bumped whenever the figures or tables change, so unchanged runs are rendered again
+SUMMARY_FILE = "summary.json"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Render the figures and statistics of all runs into a report')
+    parser.add_argument('--data', type=str, default="benchmark/data",
+                       help='Directory holding the run directories')
+    parser.add_argument('--output', type=str, default="benchmark/report",
+                       help='Directory the report is written to')
+    parser.add_argument('--run', type=str, nargs='+',
+                       help='Only these runs (e.g., "uds_big", "tcp_limit_1"), all by default')
+    parser.add_argument('--figure-format', type=str, nargs='+', default=["png", "svg"], choices=["png", "svg", "pdf"],
+                       help='Formats every figure is written in')
+    parser.add_argument('--summary', type=str, default="md", choices=["md", "html"],
+                       help='Format of the summary with the statistics tables')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                       help='Processes rendering runs in parallel')
+    parser.add_argument('--force', action='store_true',
+                       help='Render all runs again, even if their inputs did not change')
+    parser.add_argument('--no-trim', action='store_true',
+                       help='Keep the transients at the start and end of each run instead of trimming to the steady state')
+    return parser.parse_args()
+
+
+def run_kind(path):
+    """ What a run directory holds, which decides its figures, None for directories the report can't show. """
+    name = os.path.basename(path)
+    if has_table(path, "sweep"):
+        return "sweep"
+    if "limit" in name and (has_table(path, "invalid_ids_never_arrived") or has_table(path, "system_usage")):
+        return "limit"
+    if has_table(path, "arrived_messages"):
+        return "latency"
+    if has_table(path, "message_arrival_times"):
+        return "system"
+    return None
+
+
+def find_units(data_dir, runs=None):
+    """
+    The units of the report: the repetitions <name>_1.._n of a latency measurement together, every other run alone.
+    Returns [{"name", "kind", "paths"}] and the names of the directories that were skipped.
+    """
+    units, skipped, series = [], [], {}
+    names = runs or sorted(name for name in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, name)))
+    for name in names:
+        path = os.path.join(data_dir, name)
+        if not os.path.isdir(path):
+            paths = discover_runs(path)  # All repetitions of a series
+            kinds = {run_kind(run_path) for run_path in paths}
+            if kinds == {"latency"}:
+                units.append({"name": name, "kind": "latency", "paths": paths})
+            else:
+                units += [{"name": os.path.basename(run_path), "kind": run_kind(run_path), "paths": [run_path]} for run_path in paths]
+                skipped += [os.path.basename(run_path) for run_path in paths if not run_kind(run_path)]
+            continue
+        kind = run_kind(path)
+        series_name = re.sub(r"_\d+$", "", name)
+        if kind == "latency" and series_name != name and not runs:
+            series.setdefault(series_name, []).append(path)
+        elif kind:
+            units.append({"name": name, "kind": kind, "paths": [path]})
+        else:
+            skipped.append(name)
+    for name, paths in series.items():
+        units.append({"name": name, "kind": "latency", "paths": discover_runs(os.path.join(data_dir, name))})
+    return [unit for unit in units if unit["kind"]], skipped
+
+
+def fingerprint(paths):
+    """ Path, size and mtime of every input file of a unit, the caches excluded. """
+    files = []
+    for path in paths:
+        for root, directories, names in os.walk(path):
+            directories[:] = sorted(directory for directory in directories if directory != CACHE_DIR)
+            for name in sorted(names):
+                stat = os.stat(os.path.join(root, name))
+                files.append([os.path.relpath(os.path.join(root, name), os.path.dirname(path)), stat.st_size, stat.st_mtime_ns])
+    return {"version": REPORT_VERSION, "files": files}
+
+
+def save_figure(figure, unit_dir, name, formats):
+    """ Writes a figure in every format and closes it, returns the file names. """
+    figure.tight_layout()
+    files = []
+    for figure_format in formats:
+        files.append(f"{name}.{figure_format}")
+        figure.savefig(os.path.join(unit_dir, files[-1]), dpi=150 if figure_format == "png" else None)
+    plt.close(figure)
+    return files
+
+
+def format_interval(estimate, lower, upper):
+    return f"{estimate:.3f} [{lower:.3f}, {upper:.3f}]" if not np.isnan(estimate) else "-"
+
+
+def render_latency(unit, unit_dir, formats, trim=True):
+    df = compute_stages(load_runs(unit["paths"]))
+    if trim:
+        df = trim_runs(df)
+    columns = ["Total Transmission Time"] + STAGES
+    result = describe(df, columns)
+    figures = []
+
+    figure, ax = plt.subplots(figsize=(10, 6))
+    ax.hist(df["Total Transmission Time"].to_numpy(), bins=100, alpha=0.7, edgecolor="gray")
+    ax.set_xlabel("Delay (ms)")
+    ax.set_ylabel("Frequency")
+    ax.set_title(f"Histogram: {unit['name']}")
+    ax.grid(axis="y", linestyle="--", alpha=0.6)
+    figures += save_figure(figure, unit_dir, "histogram", formats)
+
+    figure, ax = plt.subplots(figsize=(12, 6))
+    for run, run_df in df.groupby("Run", sort=False):
+        ax.plot(*decimate(np.arange(len(run_df)), run_df["Total Transmission Time"].to_numpy()), linestyle="-", marker=".", alpha=0.5, label=run)
+    ax.set_xlabel("Message (Ordered by Time)")
+    ax.set_ylabel("Delay (ms)")
+    ax.set_title(f"Trend of Total Transmission Time: {unit['name']}")
+    ax.legend()
+    ax.grid(True, linestyle="--", alpha=0.6)
+    figures += save_figure(figure, unit_dir, "delay_trend", formats)
+
+    means = result["estimate"][METRICS.index("Mean"), 1:]
+    if not np.isnan(means).all():
+        figure, ax = plt.subplots(figsize=(12, 4))
+        left = 0
+        for stage, value, color in zip(STAGES, means, plt.cm.viridis(np.linspace(0, 1, len(STAGES)))):
+            ax.barh(0, value, left=left, height=0.5, label=f"{stage} ({value:.3f} ms)", color=color)
+            left += value
+        ax.set_yticks([])
+        ax.set_xlabel("Time (ms)")
+        ax.set_title(f"End-to-End Delay Breakdown: {unit['name']}")
+        ax.legend(loc="upper center", bbox_to_anchor=(0.5, -0.2), ncol=3)
+        ax.grid(axis="x", linestyle="--", alpha=0.3)
+        figures += save_figure(figure, unit_dir, "stage_breakdown", formats)
+
+    rows = [[column] + [format_interval(result["estimate"][row, index], result["lower"][row, index], result["upper"][row, index])
+                        for row in range(len(METRICS))]
+            for index, column in enumerate(columns) if result["sample"].counts[:, index].any()]
+    overview = [[df["Run"].nunique(), len(df), int((~df["Matched"]).sum()) if not np.isnan(means).all() else "-"]]
+    return figures, [
+        ("Messages", ["Repetitions", "Messages", "Unmatched stage timing"], overview),
+        ("Statistics in ms (95% bootstrap confidence interval)", ["Stage"] + METRICS, rows),
+    ]
+
+
+def render_limit(unit, unit_dir, formats, trim=True):
+    path = unit["paths"][0]
+    figures, tables = [], []
+    if has_table(path, "system_usage"):
+        usage = load_table(path, "system_usage")
+        figure, ax = plt.subplots(figsize=(12, 5))
+        seconds = usage["Time"].to_numpy() / 1000
+        ax.plot(seconds, usage["CPU Usage"].to_numpy(), label="CPU Usage (%)")
+        ax.plot(seconds, usage["Memory Usage"].to_numpy(), label="Memory Usage (%)")
+        ax.set_xlabel("Seconds")
+        ax.set_ylabel("Usage (%)")
+        ax.set_title(f"System Usage: {unit['name']}")
+        ax.legend()
+        ax.grid(True, linestyle="--", alpha=0.6)
+        figures += save_figure(figure, unit_dir, "system_usage", formats)
+        tables.append(("System usage", ["", "Max", "99th - 1st Percentile"], [
+            [column, f"{usage[column].max():.2f}", f"{usage[column].quantile(0.99) - usage[column].quantile(0.01):.2f}"]
+            for column in ["CPU Usage", "Memory Usage"]
+        ]))
+
+    if any(has_table(path, name) for name in LIMIT_TABLES):
+        # The per-second bins of limit_pipeline.py, streamed from the tables once, on the run's own origin
+        per_second, _, summary = load_limit_run(path)
+        recorded = {name: has_table(path, name) for name in LIMIT_TABLES}  # Some runs kept only their losses
+        seconds = per_second["Second"].to_numpy()
+        figure, ax = plt.subplots(figsize=(12, 5))
+        if recorded["arrived_messages"]:
+            ax.plot(seconds, per_second["Received"].to_numpy(), label="Received per Second")
+        if recorded["invalid_ids_arrived_too_late"]:
+            ax.plot(seconds, per_second["Late"].to_numpy(), color="orange", label="Late per Second (by send time)")
+        if recorded["invalid_ids_never_arrived"]:
+            ax.plot(seconds, per_second["Lost"].to_numpy(), color="red", label="Lost per Second (by send time)")
+        ax.set_xlabel("Seconds")
+        ax.set_ylabel("Messages per Second")
+        ax.set_title(f"Messages per Second: {unit['name']}")
+        ax.legend()
+        ax.grid(True, linestyle="--", alpha=0.6)
+        figures += save_figure(figure, unit_dir, "messages_per_second", formats)
+        first_lost = summary["first_lost_s"]
+        tables.append(("Messages", ["Arrived", "Late", "Lost", "First Loss (s after start)"], [[
+            *(summary[key] if recorded[name] else "-" for key, name in [
+                ("arrived", "arrived_messages"), ("late", "invalid_ids_arrived_too_late"), ("lost", "invalid_ids_never_arrived")]),
+            f"{first_lost:.2f}" if first_lost is not None else "-",
+        ]]))
+        saturation = analyze_saturation(path)
+        tables.append(("Saturation", ["Knee (s)", "Sustainable (Hz)", "Peak Sent (Hz)", "Limited by", "Evidence"], [[
+            saturation["knee_s"] if saturation["saturated"] else "-", f"{saturation['sustainable_hz']:.0f}",
+            f"{saturation['peak_hz']:.0f}" if saturation["peak_hz"] is not None else "-",
+            saturation["resource"] or "-", saturation["evidence"] or "-",
+        ]]))
+    return figures, tables
+
+
+def render_system(unit, unit_dir, formats, trim=True):
+    arrivals = load_table(unit["paths"][0], "message_arrival_times")["TimeArrival_ns"].to_numpy()
+    differences_ms = np.diff(arrivals) / 1_000_000
+    figures = []
+
+    figure, ax = plt.subplots(figsize=(10, 6))
+    ax.hist(differences_ms, bins=1000, alpha=0.7)
+    ax.set_xlabel("Time Between Messages (ms)")
+    ax.set_ylabel("Frequency")
+    ax.set_title(f"Histogram: {unit['name']}")
+    ax.grid(axis="y", linestyle="--", alpha=0.6)
+    figures += save_figure(figure, unit_dir, "interarrival_histogram", formats)
+
+    figure, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(np.bincount((arrivals - arrivals[0]) // 1_000_000_000), marker="o")
+    ax.set_xlabel("Time (seconds)")
+    ax.set_ylabel("Number of Messages")
+    ax.set_title(f"Messages per Second: {unit['name']}")
+    ax.grid(True)
+    figures += save_figure(figure, unit_dir, "messages_per_second", formats)
+
+    quantiles = np.quantile(differences_ms, [0.5, 0.99, 0.999]) if len(differences_ms) else [np.nan] * 3
+    tables = [("Time between messages in ms", ["Messages", "Mean", "Median", "99th Percentile", "99.9th Percentile", "Max", "Standard Deviation"], [[
+        len(arrivals), *(f"{value:.3f}" for value in [differences_ms.mean(), *quantiles, differences_ms.max(), differences_ms.std(ddof=1)]),
+    ]])]
+
+    try:
+        period_ns = nominal_period_ns(unit["paths"][0])
+    except ValueError:  # No nominal rate to measure the jitter against
+        return figures, tables
+    jitter = analyze_arrivals(arrivals, period_ns)
+
+    figure, ax = plt.subplots(figsize=(10, 6))
+    ax.loglog(*jitter["allan"], marker="o")
+    ax.set_xlabel("Tau (s)")
+    ax.set_ylabel("Allan Deviation of the Rate")
+    ax.set_title(f"Allan Deviation: {unit['name']}")
+    ax.grid(True, which="both", linestyle="--", alpha=0.6)
+    figures += save_figure(figure, unit_dir, "allan_deviation", formats)
+
+    figure, ax = plt.subplots(figsize=(10, 6))
+    frequencies, power = jitter["spectrum"]
+    ax.semilogy(frequencies[1:], power[1:])
+    for frequency, _ in jitter["peaks"]:
+        ax.axvline(frequency, color="red", linestyle="--", alpha=0.4)
+    ax.set_xlabel("Frequency (Hz)")
+    ax.set_ylabel("Power of the Interval Deviation (ns²/Hz)")
+    ax.set_title(f"Periodicity Spectrum: {unit['name']}")
+    ax.grid(True, which="both", linestyle="--", alpha=0.6)
+    figures += save_figure(figure, unit_dir, "periodicity_spectrum", formats)
+
+    statistics = jitter["statistics"]
+    tables.append((f"Deviation from the nominal period of {period_ns / 1e6:.3f} ms in ms",
+                   ["Mean", "Standard Deviation", *JITTER_QUANTILES, "Max Absolute", "Rate Offset (ppm)", "Rate Drift (ppm/min)", "Spectrum Peaks (Hz)"], [[
+        *(f"{statistics[column]:.3f}" for column in ["Mean", "Standard Deviation", *JITTER_QUANTILES, "Max Absolute"]),
+        f"{jitter['offset_ppm']:.1f}", f"{jitter['drift_ppm_per_minute']:.2f}",
+        ", ".join(f"{frequency:.2f}" for frequency, _ in jitter["peaks"]),
+    ]]))
+    return figures, tables
+
+
+def render_sweep(unit, unit_dir, formats, trim=True):
+    sweep = load_table(unit["paths"][0], "sweep").sort_values("Encoded Size")
+    figure, ax = plt.subplots(figsize=(10, 6))
+    ax.plot(sweep["Encoded Size"].to_numpy(), sweep["Median Latency"].to_numpy(), marker="o", label="Median")
+    ax.plot(sweep["Encoded Size"].to_numpy(), sweep["P99 Latency"].to_numpy(), marker="x", linestyle="--", label="p99")
+    ax.set_xscale("log")
+    ax.set_xlabel("Encoded Size (bytes)")
+    ax.set_ylabel("Delay (ms)")
+    ax.set_title(f"Latency vs Payload Size: {unit['name']}")
+    ax.legend()
+    ax.grid(True, linestyle="--", alpha=0.6)
+    figures = save_figure(figure, unit_dir, "latency_vs_size", formats)
+    rows = [[f"{value:.3f}" if isinstance(value, float) else value for value in row] for row in sweep.itertuples(index=False)]
+    return figures, [("Payload sizes", list(sweep.columns), rows)]
+
+
+RENDERERS = {"latency": render_latency, "limit": render_limit, "system": render_system, "sweep": render_sweep}
+
+
+def unit_inputs(unit, formats, trim):
+    """ What the figures and tables of a unit depend on. """
+    return {**fingerprint(unit["paths"]), "formats": formats, "trim": trim}
+
+
+def cached_summary(unit, output_dir, inputs):
+    """ The summary of the last report of a unit if its inputs are unchanged and its figures still exist, else None. """
+    unit_dir = os.path.join(output_dir, unit["name"])
+    summary_path = os.path.join(unit_dir, SUMMARY_FILE)
+    if not os.path.isfile(summary_path):
+        return None
+    with open(summary_path) as summary_file:
+        summary = json.load(summary_file)
+    if summary["inputs"] != inputs or not all(os.path.isfile(os.path.join(unit_dir, name)) for name in summary["figures"]):
+        return None
+    return summary
+
+
+def render_unit(unit, output_dir, inputs, trim=True):
+    """ Renders the figures and tables of one unit into output_dir/<name>/ and returns its summary. """
+    unit_dir = os.path.join(output_dir, unit["name"])
+    os.makedirs(unit_dir, exist_ok=True)
+    figures, tables = RENDERERS[unit["kind"]](unit, unit_dir, inputs["formats"], trim)
+    summary = {"name": unit["name"], "kind": unit["kind"], "inputs": inputs, "figures": figures,
+               "tables": [{"title": title, "headers": headers, "rows": rows} for title, headers, rows in tables]}
+    with open(os.path.join(unit_dir, SUMMARY_FILE), 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2, default=str)
+    return summary
+
+
+def markdown_table(headers, rows):
+    lines = ["| " + " | ".join(map(str, headers)) + " |", "|" + " --- |" * len(headers)]
+    return "\n".join(lines + ["| " + " | ".join(map(str, row)) + " |" for row in rows])
+
+
+def html_table(headers, rows):
+    head = "".join(f"<th>{html.escape(str(header))}</th>" for header in headers)
+    body = "".join("<tr>" + "".join(f"<td>{html.escape(str(value))}</td>" for value in row) + "</tr>" for row in rows)
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def write_summary(summaries, skipped, output_dir, summary_format):
+    """ Writes index.md or index.html with the tables of every unit and its figures (the PNGs, else the first format). """
+    sections = []
+    for summary in sorted(summaries, key=lambda summary: (summary["kind"], summary["name"])):
+        images = [name for name in summary["figures"] if name.endswith(".png")] or summary["figures"][:1]
+        if summary_format == "md":
+            parts = [f"## {summary['name']} ({summary['kind']})"]
+            parts += [f"**{table['title']}**\n\n" + markdown_table(table["headers"], table["rows"]) for table in summary["tables"]]
+            parts += [f"![{name}]({summary['name']}/{name})" for name in images]
+        else:
+            parts = [f"<h2>{html.escape(summary['name'])} ({summary['kind']})</h2>"]
+            parts += [f"<h3>{html.escape(table['title'])}</h3>" + html_table(table["headers"], table["rows"]) for table in summary["tables"]]
+            parts += [f'<img src="{html.escape(summary["name"])}/{html.escape(name)}" width="800">' for name in images]
+        sections.append("\n\n".join(parts))
+    note = f"Not shown (no table the report can plot): {', '.join(skipped)}" if skipped else ""
+    if summary_format == "md":
+        content = "\n\n".join(["# Benchmark Report"] + sections + ([note] if note else [])) + "\n"
+    else:
+        style = "table{border-collapse:collapse}td,th{border:1px solid #999;padding:2px 6px}"
+        content = (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Benchmark Report</title><style>{style}</style></head>"
+                   f"<body><h1>Benchmark Report</h1>{''.join(sections)}<p>{html.escape(note)}</p></body></html>\n")
+    path = os.path.join(output_dir, f"index.{summary_format}")
+    with open(path, 'w') as summary_file:
+        summary_file.write(content)
+    return path
+
+
+def main():
+    args = parse_arguments()
+    units, skipped = find_units(args.data, args.run)
+    os.makedirs(args.output, exist_ok=True)
+    summaries, pending = [], []
+    for unit in units:
+        inputs = unit_inputs(unit, args.figure_format, not args.no_trim)
+        summary = None if args.force else cached_summary(unit, args.output, inputs)
+        if summary:
+            summaries.append(summary)
+            print(f"{unit['name']}: unchanged, skipped")
+        else:
+            pending.append((unit, inputs))
+    if pending:
+        # Spawned like the benchmark processes, every worker imports matplotlib with the Agg backend itself
+        with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(pending))), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {unit["name"]: executor.submit(render_unit, unit, args.output, inputs, not args.no_trim) for unit, inputs in pending}
+            for name, future in futures.items():
+                try:
+                    summaries.append(future.result())
+                except Exception as error:  # One broken run shouldn't stop the report
+                    print(f"{name}: failed, {error!r}")
+                    continue
+                print(f"{name}: rendered")
+    print(f"Report written to {write_summary(summaries, skipped, args.output, args.summary)}")
+
+
+if __name__ == "__main__":
+    main()
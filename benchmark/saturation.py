@@ -0,0 +1,245 @@
+import argparse
+import collections
+import os
+import sys
+import numpy as np
+import pandas as pd
+from data_loader import has_table, load_table
+from limit_pipeline import INPUT_TABLES, load_limit_run
+from stage_breakdown import discover_runs, read_scenario
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ros2_api"))
+from rate_profiles import make_rate
+from scenarios import SCENARIOS
+
+SMOOTHING_S = 5  # Seconds every rate is summed over (centered), single-second bursts don't make a knee
+SUSTAIN_S = 10  # A knee has to hold for most of the following seconds
+SUSTAIN_FRACTION = 0.8
+MAX_LOSS = 0.001  # Lost and late messages per offered one
+TOLERANCE = 0.05  # Sent rate below the offered one
+ATTRIBUTION_S = 10  # Seconds on either side of the knee the resources are compared over
+CPU_SATURATED = 90  # % of one core for a process, of all cores for the system
+PLATEAU_RATIO = 0.25  # A resource stopped rising with the offered rate if its slope fell below this share
+QUEUE_GROWTH = 10  # A socket queue backs up if it grows this many times
+QUEUE_MIN_BYTES = 4096
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Find the saturation knee of limit runs and the resource that limits them')
+    parser.add_argument('--run', type=str, nargs='+',
+                       help='Runs or their repetitions (e.g., "tcp_limit" or "tcp_limit_1"), all limit runs by default')
+    parser.add_argument('--max-loss', type=float, default=MAX_LOSS,
+                       help='Fraction of lost and late messages above which the transport is saturated')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                       help='Fraction the sent rate may fall below the offered one before the sender is saturated')
+    return parser.parse_args()
+
+
+def limit_runs(base_path):
+    """ The run itself if it holds limit results, else its repetitions base_path_1, base_path_2, ... """
+    return [base_path] if any(has_table(base_path, name) for name in INPUT_TABLES) else discover_runs(base_path)
+
+
+def per_second(seconds, values, length):
+    """ Mean of the values sampled in each second 0..length-1, NaN for seconds without a sample. """
+    seconds = np.asarray(seconds, dtype=np.int64)
+    keep = (seconds >= 0) & (seconds < length)
+    counts = np.bincount(seconds[keep], minlength=length)
+    sums = np.bincount(seconds[keep], weights=np.asarray(values, dtype=np.float64)[keep], minlength=length)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def offered_from_profile(scenario, length):
+    """
+    Messages per second the rate profile asked for, for runs that didn't record their intended send times:
+    the scenario's profile, or the built-in limit ramp the first limit runs used, from the end of the warm-up.
+    """
+    rate = make_rate(scenario.get("rate", SCENARIOS["limit"]["rate"]))
+    warmup_s = scenario.get("warmup", 0)
+    duration_s = scenario.get("duration", np.inf)
+    offsets = np.arange(length) + 0.5 - warmup_s
+    return np.array([1 / rate.interval(offset) if 0 <= offset < duration_s else 0.0 for offset in offsets])
+
+
+def process_names(path):
+    """ The processes a run monitored, from its process_usage_<name> tables. """
+    names = set()
+    for entry in os.listdir(path):
+        if entry.startswith("process_usage_"):
+            names.add(os.path.splitext(entry)[0][len("process_usage_"):])
+    return sorted(names)
+
+
+def timeline(path):
+    """
+    Everything a limit run measured on one axis, the seconds since its start (the origin of limit_pipeline.py):
+    offered, sent, received, lost and late messages per second, the system usage and the CPU and socket queues
+    of every monitored process. Returns (DataFrame indexed by second, where the offered rate came from,
+    whether the run knows every sent message; the first limit runs only kept the lost ones).
+    """
+    df_seconds, _, summary = load_limit_run(path)
+    scenario = read_scenario(path)
+    usage = load_table(path, "system_usage") if has_table(path, "system_usage") else None
+    processes = {name: load_table(path, f"process_usage_{name}") for name in process_names(path)}
+    # The run lasts as long as anything of it was measured
+    lengths = [len(df_seconds)]
+    if usage is not None and len(usage):
+        lengths.append(int(usage["Time"].max()) // 1000 + 1)
+    length = max(lengths)
+
+    df = pd.DataFrame(index=pd.RangeIndex(length, name="Second"))
+    for column in ["Sent", "Received", "Arrived", "Late", "Lost"]:
+        counts = df_seconds[column].to_numpy() if column in df_seconds else np.zeros(len(df_seconds))
+        df[column] = np.pad(counts, (0, length - len(counts))).astype(np.float64)
+    if "Offered" in df_seconds:
+        df["Offered"] = np.pad(df_seconds["Offered"].to_numpy(), (0, length - len(df_seconds))).astype(np.float64)
+        source = "intended send times"
+    else:
+        df["Offered"] = offered_from_profile(scenario, length)
+        source = "rate profile"
+    if usage is not None:
+        seconds = usage["Time"].to_numpy() // 1000
+        df["System CPU"] = per_second(seconds, usage["CPU Usage"].to_numpy(), length)
+        df["System Memory"] = per_second(seconds, usage["Memory Usage"].to_numpy(), length)
+    for name, table in processes.items():
+        seconds = (table["Time"].to_numpy() - summary["origin_ns"]) // 1_000_000_000
+        df[f"CPU {name}"] = per_second(seconds, table["CPU Usage"].to_numpy(), length)
+        df[f"Send Queue {name}"] = per_second(seconds, table["Send Queue"].to_numpy(), length)
+        df[f"Receive Queue {name}"] = per_second(seconds, table["Receive Queue"].to_numpy(), length)
+    return df, source, summary["arrived"] > 0
+
+
+def smoothed(series, window=SMOOTHING_S):
+    return series.rolling(window, center=True, min_periods=1).mean()
+
+
+def find_knee(df, complete, max_loss=MAX_LOSS, tolerance=TOLERANCE):
+    """
+    The first second from which the run stays saturated for most of the next SUSTAIN_S seconds: more than max_loss
+    of the offered messages lost or late, or (if the run knows every sent message) fewer sent than offered by tolerance.
+    Single lost messages or short stalls before it are no knee. Returns the second, None if the run never saturated.
+    """
+    offered = smoothed(df["Offered"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        failed = smoothed(df["Lost"] + df["Late"]) / offered
+        sent = smoothed(df["Sent"]) / offered
+    violation = (offered > 0) & ((failed > max_loss) | ((sent < 1 - tolerance) & complete))
+    sustained = violation.astype(float)[::-1].rolling(SUSTAIN_S, min_periods=1).mean()[::-1] >= SUSTAIN_FRACTION
+    knees = np.flatnonzero(violation & sustained)
+    return int(knees[0]) if len(knees) else None
+
+
+def slope(x, y):
+    """ Least squares slope of y over x, NaN pairs dropped. """
+    keep = np.isfinite(x) & np.isfinite(y)
+    return np.polyfit(x[keep], y[keep], 1)[0] if keep.sum() > 2 and np.ptp(x[keep]) > 0 else np.nan
+
+
+def limiting_resource(df, knee, complete, tolerance=TOLERANCE):
+    """
+    The resource that limits the run at its knee and the evidence: a CPU (a process of one core, the system of all)
+    that is saturated after the knee, a socket queue that backs up, or a CPU that stopped rising with the offered
+    rate while the rate kept rising. Saturation beats a backlog beats a plateau; the most extreme of each wins.
+    Without any of them, a sender that falls behind the offered rate is the limit of its own pacing.
+    """
+    before = df.iloc[max(knee - ATTRIBUTION_S, 0):knee]
+    after = df.iloc[knee:knee + ATTRIBUTION_S]
+    offered = smoothed(df["Offered"]).to_numpy()
+    active = df["Offered"].to_numpy() > 0
+    candidates = []
+    for column in [column for column in df.columns if column == "System CPU" or column.startswith("CPU ")]:
+        level = after[column].mean()
+        owner = "system" if column == "System CPU" else f"process {column[len('CPU '):]}"
+        unit = "% of all cores" if column == "System CPU" else "% of one core"
+        if level >= CPU_SATURATED:
+            candidates.append((3 + level / 1000, f"CPU of the {owner}", f"saturated at {level:.0f}{unit}"))
+            continue
+        rising = slope(offered[:knee][active[:knee]], df[column].to_numpy()[:knee][active[:knee]])
+        later = slope(offered[knee:][active[knee:]], df[column].to_numpy()[knee:][active[knee:]])
+        if rising > 0 and later < PLATEAU_RATIO * rising:
+            candidates.append((1 + 1 - max(later, 0) / rising, f"CPU of the {owner}",
+                               f"stopped rising with the offered rate at {level:.1f}{unit}"))
+    for column in [column for column in df.columns if "Queue" in column]:
+        queued_before, queued_after = before[column].mean(), after[column].mean()
+        if queued_after >= QUEUE_MIN_BYTES and queued_after > QUEUE_GROWTH * max(queued_before, 1):
+            direction, name = column.split(" Queue ")
+            candidates.append((2 + min(queued_after / max(queued_before, 1), 1e6) / 1e7, f"{direction.lower()} queue of the process {name}",
+                               f"backed up from {queued_before:.0f} to {queued_after:.0f} bytes"))
+    if candidates:
+        _, resource, evidence = max(candidates)
+        return resource, evidence
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sent_ratio = after["Sent"].sum() / after["Offered"].sum()
+    if complete and sent_ratio < 1 - tolerance:
+        return "sender pacing", f"sent {sent_ratio:.0%} of the offered rate without a saturated resource"
+    return "unknown", "no monitored resource saturated, backed up or levelled off"
+
+
+def analyze_run(path, max_loss=MAX_LOSS, tolerance=TOLERANCE):
+    """ The knee, sustainable rate, peak throughput and limiting resource of one limit run, with its timeline. """
+    df, source, complete = timeline(path)
+    knee = find_knee(df, complete, max_loss, tolerance)
+    offered = smoothed(df["Offered"])
+    lost = np.flatnonzero(df["Lost"].to_numpy() > 0)
+    result = {
+        "run": os.path.basename(os.path.normpath(path)),
+        "transport": read_scenario(path).get("transport", os.path.basename(os.path.normpath(path)).split("_")[0]),
+        "offered_source": source, "timeline": df, "knee_s": knee,
+        # The rate it kept up with: offered in the second before the knee, or all of it if it never saturated
+        "sustainable_hz": float(offered.iloc[max(knee - 1, 0)]) if knee is not None else float(offered.max()),
+        "saturated": knee is not None,
+        # Sends per second from the actual send timestamps, unknown for runs that only kept their lost messages
+        "peak_hz": float(smoothed(df["Sent"]).max()) if complete else None,
+        "first_loss_s": int(lost[0]) if len(lost) else None,
+        "first_loss_hz": float(df["Offered"].iloc[lost[0]]) if len(lost) else None,
+    }
+    result["resource"], result["evidence"] = limiting_resource(df, knee, complete, tolerance) if knee is not None else ("none", "never saturated")
+    return result
+
+
+def summarize_transports(results):
+    """ Per transport: repetitions, median, min and max sustainable rate and the most frequent limiting resource. """
+    transports = collections.defaultdict(list)
+    for result in results:
+        transports[result["transport"]].append(result)
+    summary = {}
+    for transport, runs in transports.items():
+        rates = np.array([run["sustainable_hz"] for run in runs])
+        resource, count = collections.Counter(run["resource"] for run in runs).most_common(1)[0]
+        summary[transport] = {"repetitions": len(runs), "median_hz": float(np.median(rates)), "min_hz": float(rates.min()),
+                              "max_hz": float(rates.max()), "resource": resource, "resource_count": count,
+                              "saturated": sum(run["saturated"] for run in runs)}
+    return summary
+
+
+def main():
+    args = parse_arguments()
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    names = args.run or sorted(name for name in os.listdir(data_dir) if "limit" in name and os.path.isdir(os.path.join(data_dir, name)))
+    paths = list(dict.fromkeys(path for name in names for path in limit_runs(os.path.join(data_dir, name))))
+    results = []
+    for path in paths:
+        if not any(has_table(path, name) for name in INPUT_TABLES):
+            print(f"{os.path.basename(path)}: no arrived, late or lost messages")
+            continue
+        result = analyze_run(path, args.max_loss, args.tolerance)
+        results.append(result)
+        first_loss = f", first loss after {result['first_loss_s']} s at {result['first_loss_hz']:.0f} Hz" if result["first_loss_s"] is not None else ""
+        peak = f", peak {result['peak_hz']:.0f} Hz sent" if result["peak_hz"] is not None else ""
+        if result["saturated"]:
+            print(f"{result['run']}: knee after {result['knee_s']} s, sustainable {result['sustainable_hz']:.0f} Hz "
+                  f"(offered from {result['offered_source']}){peak}{first_loss}; "
+                  f"limited by the {result['resource']}: {result['evidence']}")
+        else:
+            print(f"{result['run']}: no knee up to {result['sustainable_hz']:.0f} Hz{first_loss}")
+
+    print()
+    for transport, summary in summarize_transports(results).items():
+        print(f"{transport}: sustainable {summary['median_hz']:.0f} Hz (median of {summary['repetitions']}, "
+              f"{summary['min_hz']:.0f} - {summary['max_hz']:.0f}), {summary['saturated']} saturated, "
+              f"limited by the {summary['resource']} in {summary['resource_count']} of {summary['repetitions']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from data_loader import has_table, load_table, load_clock_sync, to_harness_clock
+
+# The timestamps of a message in the order it passes them, every stage lies between two neighbours
+TIMESTAMPS = [
+    "Sent Time", "Start Serialize Py", "End Serialize Py", "Start Deserialize ROS", "End Deserialize ROS",
+    "Start Serialize ROS", "End Serialize ROS", "Start Deserialize Py", "End Deserialize Py", "Received Time",
+]
+STAGES = [
+    "Transmission Delay", "Serialization Time Py", "Send to ROS Delay", "Deserialization Time ROS",
+    "ROS Processing Time", "Serialization Time ROS", "Send to Py Delay", "Deserialization Time Py", "Reception Delay",
+]
+# Timing file -> (start column, end column, stage, row order). The files hold no ids: the SDK serializes and the
+# ROS node deserializes the commands in the order they were sent, the ROS node serializes and the SDK deserializes
+# the states in the order they arrived.
+TIMING_FILES = {
+    "serialize_time": ("Start Time", "End Time", "Serialize Py", "sent"),
+    "time_deserialize": ("Sent Time", "Received Time", "Deserialize ROS", "sent"),
+    "time_serialize": ("Sent Time", "Received Time", "Serialize ROS", "arrived"),
+    "deserialize_time": ("Start Time", "End Time", "Deserialize Py", "arrived"),
+}
+SDK_TIMING_FILES = ["serialize_time", "deserialize_time"]  # Written per client, the ROS node's files per run
+CLOCK_TOLERANCE_NS = 1_000  # Error of mapping the realtime timing files onto the harness clock
+
+
+def discover_runs(base_path):
+    """ The repetitions base_path_1, base_path_2, ... in numeric order, or [base_path] if it is a run itself. """
+    if os.path.isfile(os.path.join(base_path, "scenario.json")) or has_table(base_path, "arrived_messages"):
+        return [base_path]
+    parent, prefix = os.path.split(base_path)
+    pattern = re.compile(re.escape(prefix) + r"_(\d+)$")
+    repetitions = sorted((int(match.group(1)), name) for name in os.listdir(parent or ".")
+                         if (match := pattern.match(name)) and os.path.isdir(os.path.join(parent, name)))
+    if not repetitions:
+        raise FileNotFoundError(f"No runs {base_path}_<n> found")
+    return [os.path.join(parent, name) for _, name in repetitions]
+
+
+def optional_table(path, name, **read_csv_kwargs):
+    """ load_table() or None if the run has no such table, e.g. runs older than the table. """
+    if has_table(path, name):
+        return load_table(path, name, **read_csv_kwargs)
+    return None
+
+
+def read_scenario(path):
+    """ The scenario.json of a run, {} for runs recorded before it was written. """
+    scenario_path = os.path.join(path, "scenario.json")
+    if not os.path.isfile(scenario_path):
+        return {}
+    with open(scenario_path) as scenario_file:
+        return json.load(scenario_file)
+
+
+def timing_rows_to_skip(scenario):
+    """ Rows of a client's timing CSVs before its first measured message: the connection test and the warm-up of newer runs. """
+    return 1 + scenario.get("warmup_messages", 0) if scenario else 0
+
+
+def rows_by_id(ids, ordered_ids, skip, row_count):
+    """ Row of a timing file for each of ids, whose rows follow ordered_ids after `skip` unmeasured rows, -1 without one. """
+    rows = pd.Index(ordered_ids).get_indexer(ids) + skip
+    return np.where((rows >= skip) & (rows < row_count), rows, -1)
+
+
+def load_run(path):
+    """
+    Loads the arrived messages of one repetition with the TIMESTAMPS of all stages on the harness clock.
+    The timing rows are joined by message id: the n-th measured row of a file belongs to the n-th id in the
+    file's order, the send order of all sent messages or the arrival order of all received ones. Late and
+    reordered messages therefore never shift the later rows. A message lost after a file's writer saw it keeps
+    its row; one lost before, e.g. a command that never reached the ROS node, has none. The files hold no ids
+    to tell which, so a file in send order is joined to all sent ids if its rows match their number, to the ids
+    that arrived if they match those, and left out with a warning otherwise. A message without a row gets the
+    timestamp 0. The SDK files of multi-client runs are joined per client, the ROS node's files across all clients.
+    """
+    arrived = load_table(path, "arrived_messages")
+    late = optional_table(path, "invalid_ids_arrived_too_late")
+    lost = optional_table(path, "invalid_ids_never_arrived")
+    scenario = read_scenario(path)
+    clock_sync = load_clock_sync(path)
+    clients = scenario.get("clients", 1)
+
+    received = pd.concat([table for table in (arrived, late) if table is not None], ignore_index=True)
+    if lost is not None:
+        sent = pd.concat([received, lost], ignore_index=True).sort_values("Sent Time", kind="stable")
+    else:
+        # Older runs don't list the lost messages, their single sender numbered the ids in send order without gaps
+        sent = pd.DataFrame({"ID": np.arange(received["ID"].min(), received["ID"].max() + 1)})
+    orders = {
+        "sent": sent,
+        "arrived": received.sort_values("Received Time", kind="stable"),
+        "seen": received.sort_values("Sent Time", kind="stable"),  # Sent order without the lost ids
+    }
+
+    df = pd.DataFrame({column: arrived[column].to_numpy() for column in arrived.columns})
+    df.insert(0, "Run", os.path.basename(os.path.normpath(path)))
+    for name, (start_column, end_column, stage, order) in TIMING_FILES.items():
+        starts = np.zeros(len(df), dtype=np.int64)
+        ends = np.zeros(len(df), dtype=np.int64)
+        if name in SDK_TIMING_FILES and clients > 1:
+            sources = [(os.path.join(path, f"client_{client}"), client) for client in range(clients)]
+        else:
+            sources = [(path, None)]
+        for source, client in sources:
+            table = optional_table(source, name)
+            if table is None:
+                continue
+            ordered = orders[order] if client is None else orders[order][orders[order]["Client"] == client]
+            if order == "arrived" and scenario:
+                # Only the connection test and warm-up states that arrived are in the file, all before the measured ones
+                skip = max(len(table) - len(ordered), 0)
+            else:
+                # The ROS node's files interleave the connection tests and warm-ups of all clients
+                skip = timing_rows_to_skip(scenario) * (clients if client is None else 1)
+            if order == "sent" and len(table) - skip != len(ordered):
+                # Fewer rows than sends: the lost messages may never have reached the file's writer
+                seen = orders["seen"] if client is None else orders["seen"][orders["seen"]["Client"] == client]
+                if len(table) - skip != len(seen):
+                    print(f"{os.path.basename(os.path.normpath(source))}: {name} has {len(table) - skip} rows for "
+                          f"{len(ordered)} sent and {len(seen)} received messages, its stage is left out")
+                    continue
+                ordered = seen
+            rows = rows_by_id(df["ID"].to_numpy(), ordered["ID"].to_numpy(), skip, len(table))
+            found = rows >= 0
+            starts[found] = to_harness_clock(np.asarray(table[start_column])[rows[found]], clock_sync)
+            ends[found] = to_harness_clock(np.asarray(table[end_column])[rows[found]], clock_sync)
+        df[f"Start {stage}"] = starts
+        df[f"End {stage}"] = ends
+    return df
+
+
+def load_runs(paths, workers=None):
+    """
+    Loads the repetitions in parallel and concatenates them, the "Run" column tells them apart.
+    Threads, as reading the cached columns and parsing CSVs mostly waits on I/O and pandas' C code.
+    """
+    with ThreadPoolExecutor(max_workers=workers or len(paths)) as executor:
+        return pd.concat(list(executor.map(load_run, paths)), ignore_index=True)
+
+
+def compute_stages(df):
+    """
+    Computes the nine STAGES in ms in one pass over all rows of all runs, plus the total, schedule lag and response time.
+    A row is "Matched" if all of its timestamps exist and follow each other; the stages of the other rows are NaN,
+    so a lost or misattributed timing row never distorts the breakdown. The unmatched rows are reported per run.
+    """
+    timestamps = df[TIMESTAMPS].to_numpy(dtype=np.int64)
+    deltas = np.diff(timestamps, axis=1)
+    matched = (timestamps != 0).all(axis=1) & (deltas >= -CLOCK_TOLERANCE_NS).all(axis=1)
+    stages = pd.DataFrame(np.where(matched[:, None], deltas / 1_000_000, np.nan), columns=STAGES, index=df.index)
+    df = pd.concat([df.drop(columns=[stage for stage in STAGES if stage in df]), stages], axis=1)
+    df["Matched"] = matched
+    df["Total Transmission Time"] = (df["Received Time"] - df["Sent Time"]) / 1_000_000  # Full cycle
+    if "Intended Time" in df:  # Runs paced by deadline also record when the message should have left
+        df["Schedule Lag"] = (df["Sent Time"] - df["Intended Time"]) / 1_000_000  # ms
+        df["Response Time"] = (df["Received Time"] - df["Intended Time"]) / 1_000_000  # Full cycle incl. sender lag
+
+    # Runs without any timing files (rosbridge) have no breakdown to miss
+    timed = (timestamps[:, 1:-1] != 0).any(axis=1)
+    for run, run_df in df[["Run", "Matched"]].assign(Timed=timed).groupby("Run", sort=False):
+        unmatched = int((~run_df["Matched"]).sum())
+        if run_df["Timed"].any() and unmatched:
+            print(f"{run}: {unmatched} of {len(run_df)} messages have no consistent stage timing, their stages are excluded")
+    return df
@@ -0,0 +1,175 @@
+import math
+import os
+import sys
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ros2_api"))
+from latency_histogram import LatencyHistogram
+
+METRICS = ["Mean", "Median", "Standard Deviation", "Max", "95th Percentile", "99th Percentile"]
+QUANTILES = {"Median": 0.5, "95th Percentile": 0.95, "99th Percentile": 0.99}
+BLOCKS_PER_RUN = 10  # Contiguous blocks of a repetition resampled together, they keep the autocorrelation of the messages
+RESAMPLES = 1000
+CONFIDENCE = 0.95
+# Cliff's delta thresholds of Romano et al. (2006)
+EFFECT_SIZES = [(0.147, "negligible"), (0.33, "small"), (0.474, "medium"), (math.inf, "large")]
+
+
+def block_labels(runs, blocks_per_run=BLOCKS_PER_RUN):
+    """ Block of each message: every run (consecutive equal labels, in arrival order) is cut into blocks_per_run blocks. """
+    runs = np.asarray(runs)
+    starts = np.flatnonzero(np.r_[True, runs[1:] != runs[:-1]])
+    lengths = np.diff(np.r_[starts, len(runs)])
+    run_index = np.repeat(np.arange(len(starts)), lengths)
+    position = np.arange(len(runs)) - np.repeat(starts, lengths)
+    return run_index * blocks_per_run + position * blocks_per_run // np.repeat(lengths, lengths)
+
+
+class PooledSample:
+    """
+    Columns of messages (NaN where a message has no value) reduced once to per-block sums, maxima and
+    LatencyHistogram bucket counts, so the METRICS of any integer weighting of the blocks cost a few small
+    matrix products. Bootstrap resamples are weightings by how often a block was drawn; their quantiles are
+    exact to the histogram's 3 significant digits, the plain statistics of metrics() are exact.
+    `runs` is the repetition of each message, all messages are one repetition without it.
+    """
+
+    def __init__(self, values, blocks, runs=None):
+        self.values = np.asarray(values, dtype=np.float64)
+        blocks = np.unique(blocks, return_inverse=True)[1].reshape(-1)
+        self.block_count = int(blocks.max()) + 1
+        # Repetition of each block, for the two-stage bootstrap
+        self.block_runs = np.zeros(self.block_count, dtype=np.int64)
+        if runs is not None:
+            self.block_runs[blocks] = np.unique(runs, return_inverse=True)[1].reshape(-1)
+        present = ~np.isnan(self.values)
+        filled = np.where(present, self.values, 0.0)
+
+        def block_sums(columns):
+            return np.stack([np.bincount(blocks, weights=column, minlength=self.block_count) for column in columns.T], axis=1)
+        self.counts = block_sums(present.astype(np.float64))
+        self.sums = block_sums(filled)
+        self.squares = block_sums(filled * filled)
+        self.maxima = np.full((self.block_count, self.values.shape[1]), -np.inf)
+        np.maximum.at(self.maxima, blocks, np.where(present, self.values, -np.inf))
+        # Per column: the occupied buckets (ms, highest value of each) and their counts per block
+        histogram = LatencyHistogram()
+        self.buckets = []
+        for column in range(self.values.shape[1]):
+            valid = present[:, column]
+            values_ns = np.clip(np.round(self.values[valid, column] * 1_000_000), 0, histogram.highest_ns).astype(np.int64)
+            indices, bucket = np.unique(histogram.bucket_indices(values_ns), return_inverse=True)
+            block_counts = np.zeros((self.block_count, len(indices)))
+            np.add.at(block_counts, (blocks[valid], bucket.reshape(-1)), 1)
+            self.buckets.append((np.array([histogram.bucket_highest(int(index)) for index in indices]) / 1_000_000, block_counts))
+
+    def moments(self, weights):
+        """ Mean, standard deviation and max per column of the blocks counted `weights` times. """
+        total = weights @ self.counts
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (weights @ self.sums) / total
+            std = np.sqrt(np.maximum((weights @ self.squares - total * mean * mean) / (total - 1), 0.0))
+        maximum = np.where(weights[:, None] > 0, self.maxima, -np.inf).max(axis=0)
+        return {"Mean": mean, "Standard Deviation": std, "Max": np.where(total > 0, maximum, np.nan)}
+
+    def metrics(self, weights=None):
+        """ METRICS x columns of the pooled blocks, each block counted `weights` times, exact without weights. """
+        if weights is None:
+            rows = self.moments(np.ones(self.block_count))
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # Columns without values, e.g. the stages of rosbridge
+                quantiles = np.nanquantile(self.values, list(QUANTILES.values()), axis=0)
+            rows.update(zip(QUANTILES, quantiles))
+            return np.array([rows[metric] for metric in METRICS])
+        rows = self.moments(weights)
+        for metric, quantile in QUANTILES.items():
+            rows[metric] = np.full(self.values.shape[1], np.nan)
+        for column, (bucket_values, block_counts) in enumerate(self.buckets):
+            cumulative = np.cumsum(weights @ block_counts)
+            if not len(cumulative) or not cumulative[-1]:
+                continue
+            for metric, quantile in QUANTILES.items():
+                rank = max(math.ceil(quantile * cumulative[-1]), 1)
+                rows[metric][column] = bucket_values[np.searchsorted(cumulative, rank)]
+        return np.array([rows[metric] for metric in METRICS])
+
+    def bootstrap(self, resamples=RESAMPLES, seed=0):
+        """
+        resamples x METRICS x columns of a two-stage block bootstrap: the repetitions are drawn with replacement,
+        then the blocks within each drawn repetition. The spread covers the differences between repetitions as well
+        as the correlated messages within a run; with few repetitions the intervals are wide, as they should be.
+        Every distinct set of drawn blocks is evaluated once.
+        """
+        rng = np.random.default_rng(seed)
+        run_blocks = [np.flatnonzero(self.block_runs == run) for run in range(int(self.block_runs.max()) + 1)]
+        weights = np.zeros((resamples, self.block_count), dtype=np.int64)
+        for resample in range(resamples):
+            for run in rng.integers(0, len(run_blocks), size=len(run_blocks)):
+                blocks = run_blocks[run]
+                np.add.at(weights[resample], blocks[rng.integers(0, len(blocks), size=len(blocks))], 1)
+        unique, inverse = np.unique(weights, axis=0, return_inverse=True)
+        return np.stack([self.metrics(row) for row in unique])[inverse.reshape(-1)]
+
+
+def confidence_interval(distribution, confidence=CONFIDENCE):
+    """ Percentile interval of a bootstrap distribution along the first axis, (lower, upper). """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return tuple(np.nanquantile(distribution, [(1 - confidence) / 2, (1 + confidence) / 2], axis=0))
+
+
+def describe(df, columns, resamples=RESAMPLES, seed=0):
+    """
+    METRICS of the columns of a compute_stages() frame with bootstrap confidence intervals over its runs.
+    Returns {"estimate", "lower", "upper"} of METRICS x columns arrays and the PooledSample with its bootstrap,
+    to be reused by compare().
+    """
+    blocks = block_labels(df["Run"].to_numpy())
+    sample = PooledSample(df[columns].to_numpy(dtype=np.float64), blocks, blocks // BLOCKS_PER_RUN)
+    distribution = sample.bootstrap(resamples, seed)
+    lower, upper = confidence_interval(distribution)
+    return {"estimate": sample.metrics(), "lower": lower, "upper": upper, "sample": sample, "distribution": distribution}
+
+
+def cliffs_delta(a, b):
+    """ P(a > b) - P(a < b) over all pairs of values, NaNs dropped; negative if a tends to be smaller. """
+    a = np.sort(a[~np.isnan(a)])
+    b = np.sort(b[~np.isnan(b)])
+    if not len(a) or not len(b):
+        return math.nan
+    greater = np.searchsorted(b, a, side="left").sum()
+    smaller = (len(b) - np.searchsorted(b, a, side="right")).sum()
+    return float(greater - smaller) / (len(a) * len(b))
+
+
+def effect_size_label(delta):
+    return next(label for threshold, label in EFFECT_SIZES if abs(delta) < threshold) if not math.isnan(delta) else "n/a"
+
+
+def holm(p_values):
+    """ Holm-Bonferroni adjusted p-values of a family of tests, in the given order; compare them to the plain alpha. """
+    p_values = np.asarray(p_values, dtype=np.float64)
+    order = np.argsort(p_values)
+    adjusted = np.empty_like(p_values)
+    adjusted[order] = np.minimum(np.maximum.accumulate((len(p_values) - np.arange(len(p_values))) * p_values[order]), 1.0)
+    return adjusted
+
+
+def compare(a, b, column_a, column_b, metric="Median"):
+    """
+    Compares a metric of a column between two describe() results: the difference b - a with its confidence interval
+    from the independent bootstraps of both, the two-sided bootstrap p-value of no difference and Cliff's delta of b vs a.
+    """
+    metric_index = METRICS.index(metric)
+    estimate_a = a["estimate"][metric_index, column_a]
+    estimate_b = b["estimate"][metric_index, column_b]
+    differences = b["distribution"][:, metric_index, column_b] - a["distribution"][:, metric_index, column_a]
+    lower, upper = confidence_interval(differences)
+    p_value = min(1.0, 2 * min(np.mean(differences <= 0), np.mean(differences >= 0)))
+    delta = cliffs_delta(b["sample"].values[:, column_b], a["sample"].values[:, column_a])
+    return {
+        "a": estimate_a, "b": estimate_b, "difference": estimate_b - estimate_a, "lower": lower, "upper": upper,
+        "ratio": estimate_b / estimate_a if estimate_a else math.nan, "p": p_value,
+        "cliffs_delta": delta, "effect": effect_size_label(delta),
+    }
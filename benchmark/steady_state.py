@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+MAX_BLOCKS = 1000  # Changepoints are searched on block means, at most this many
+MIN_SEGMENT_BLOCKS = 5
+MAX_TRIM_FRACTION = 0.2  # Only changepoints in the first and last 20% are transients, the rest is the run itself
+MIN_SHIFT = 0.1  # Smallest shift of the mean that counts, ~10% on log latencies, slow wander of the mean is no transient
+
+
+def block_means(values, max_blocks=MAX_BLOCKS):
+    """ Means of equally sized consecutive blocks and the block size, the last partial block is dropped. """
+    block_size = max(len(values) // max_blocks, 1)
+    blocks = len(values) // block_size
+    return values[:blocks * block_size].reshape(blocks, block_size).mean(axis=1), block_size
+
+
+def changepoints(series, penalty, min_size=MIN_SEGMENT_BLOCKS, min_shift=MIN_SHIFT):
+    """
+    Binary segmentation for shifts in the mean: splits where the squared error drops the most,
+    as long as the drop exceeds the penalty and the means differ by min_shift. Returns the sorted split indices.
+    """
+    cumsum = np.concatenate([[0.0], np.cumsum(series)])
+    cumsum_squares = np.concatenate([[0.0], np.cumsum(series ** 2)])
+
+    def cost(start, end):
+        total = cumsum[end] - cumsum[start]
+        return cumsum_squares[end] - cumsum_squares[start] - total * total / (end - start)
+
+    found = []
+    segments = [(0, len(series))]
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2 * min_size:
+            continue
+        splits = np.arange(start + min_size, end - min_size + 1)
+        left_totals = cumsum[splits] - cumsum[start]
+        right_totals = cumsum[end] - cumsum[splits]
+        split_costs = (cumsum_squares[end] - cumsum_squares[start]
+                       - left_totals ** 2 / (splits - start) - right_totals ** 2 / (end - splits))
+        best = int(np.argmin(split_costs))
+        split = int(splits[best])
+        shift = abs(left_totals[best] / (split - start) - right_totals[best] / (end - split))
+        if cost(start, end) - split_costs[best] > penalty and shift >= min_shift:
+            found.append(split)
+            segments += [(start, split), (split, end)]
+    return sorted(found)
+
+
+def steady_state(values, max_trim_fraction=MAX_TRIM_FRACTION):
+    """
+    Detects the steady state of a latency series in arrival order and returns (start, end) sample indices.
+    The series is reduced to block means of log latencies, segmented by binary segmentation with a
+    BIC-like penalty on a robust noise estimate, and cut at the last changepoint of the head and the
+    first changepoint of the tail, so warm-up and drain transients are trimmed but regime changes aren't.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2 * MIN_SEGMENT_BLOCKS:
+        return 0, len(values)
+    if values.min() > 0:
+        values = np.log(values)  # Latencies are skewed, shifts are multiplicative
+    series, block_size = block_means(values)
+    start, end = 0, len(values)
+    for split in changepoints(series, bic_penalty(series)):
+        if split <= max_trim_fraction * len(series):
+            start = split * block_size
+        elif split >= (1 - max_trim_fraction) * len(series) and end == len(values):
+            end = split * block_size
+    # Cold-start outliers of a few messages vanish in the block means, look at the head message by message
+    head = values[start:start + MAX_BLOCKS]
+    head_splits = [split for split in changepoints(head, bic_penalty(head)) if split <= max_trim_fraction * len(head)]
+    if head_splits:
+        start += head_splits[-1]
+    return start, end
+
+
+def bic_penalty(series):
+    """ 2 sigma^2 log(n), with the noise from the differences of neighbours (MAD), robust against the shifts themselves. """
+    differences = np.diff(series)
+    sigma = 1.4826 * np.median(np.abs(differences - np.median(differences))) / np.sqrt(2)
+    return 2 * max(sigma, 1e-12) ** 2 * np.log(len(series))
+
+
+def trim_steady_state(df, column, label=""):
+    """ Keeps the steady-state rows of df by `column` and reports how many were removed. """
+    start, end = steady_state(df[column].to_numpy())
+    removed = len(df) - (end - start)
+    print(f"Steady state {label}: removed {start} leading and {len(df) - end} trailing of {len(df)} messages "
+          f"({removed / max(len(df), 1):.1%})")
+    return df.iloc[start:end].reset_index(drop=True)
+
+
+def trim_runs(df, column="Total Transmission Time"):
+    """ trim_steady_state() of each run of a stage_breakdown frame, so means and maxima compare across transports. """
+    return pd.concat([trim_steady_state(run_df.reset_index(drop=True), column, run)
+                      for run, run_df in df.groupby("Run", sort=False)]).reset_index(drop=True)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from decimation import decimate, lttb, minmax
+
+
+def noisy_series(count=1_000_000, seed=0):
+    x = np.arange(count, dtype=np.int64) * 1_000_000
+    return x, np.random.default_rng(seed).lognormal(0, 0.1, count)
+
+
+def test_short_series_is_kept():
+    x, y = noisy_series(100)
+    for decimated in (minmax(x, y, 100), lttb(x, y, 100)):
+        assert np.array_equal(decimated[0], x) and np.array_equal(decimated[1], y)
+
+
+def test_minmax_keeps_the_range_of_every_bucket():
+    x, y = noisy_series()
+    x_kept, y_kept = minmax(x, y, 1000)
+    assert len(y_kept) <= 2000
+    assert np.all(np.diff(x_kept) > 0)
+    # Every bucket of 1000 points keeps exactly its lowest and its highest point
+    buckets = y.reshape(1000, -1)
+    kept_buckets = x_kept // (1000 * 1_000_000)
+    for bucket in (0, 123, 999):
+        assert sorted(y_kept[kept_buckets == bucket]) == [buckets[bucket].min(), buckets[bucket].max()]
+
+
+def test_minmax_keeps_spike_and_dip_of_one_bucket():
+    x, y = noisy_series()
+    y[500_010], y[500_020] = 100.0, 0.001
+    _, y_kept = minmax(x, y, 1000)
+    assert 100.0 in y_kept and 0.001 in y_kept
+
+
+def test_minmax_of_unsorted_x_buckets_by_position():
+    x, y = noisy_series(100_000)
+    x = x[::-1].copy()
+    x_kept, y_kept = minmax(x, y, 100)
+    assert len(y_kept) <= 200
+    assert y_kept.max() == y.max() and y_kept.min() == y.min()
+
+
+def test_non_finite_points_are_dropped():
+    x, y = noisy_series(10_000)
+    y[::3] = np.nan
+    y[1] = np.inf
+    for x_kept, y_kept in (minmax(x, y, 100), lttb(x, y, 100)):
+        assert np.all(np.isfinite(y_kept))
+    assert len(minmax(x, y, 10_000)[1]) == np.count_nonzero(np.isfinite(y))
+
+
+def test_lttb_keeps_the_ends_and_spikes():
+    x, y = noisy_series()
+    y[700_000] = 100.0
+    x_kept, y_kept = lttb(x, y, 2000)
+    assert len(y_kept) == 2000
+    assert (x_kept[0], x_kept[-1]) == (x[0], x[-1])
+    assert np.all(np.diff(x_kept) > 0)
+    assert 100.0 in y_kept
+
+
+def test_lttb_follows_the_shape():
+    x = np.arange(100_000, dtype=np.float64)
+    y = np.sin(x / 5000)
+    x_kept, y_kept = lttb(x, y, 500)
+    assert np.allclose(np.interp(x, x_kept, y_kept), y, atol=0.01)
+
+
+def test_unknown_mode():
+    x, y = noisy_series(10)
+    with pytest.raises(ValueError):
+        decimate(x, y, mode="stride")
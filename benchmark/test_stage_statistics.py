@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stage_statistics import (METRICS, PooledSample, block_labels, cliffs_delta, compare, confidence_interval,
+                              describe, holm)
+
+
+def stage_frame(run_medians, count=5000, seed=0):
+    """ A compute_stages()-like frame: log-normal latencies in ms per run, a second stage without values. """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Run": np.repeat([f"run_{index}" for index in range(len(run_medians))], count),
+        "Total": np.concatenate([rng.lognormal(np.log(median), 0.3, count) for median in run_medians]),
+        "Empty": np.nan,
+    })
+
+
+def test_block_labels_cut_each_run():
+    labels = block_labels(["a"] * 20 + ["b"] * 10, blocks_per_run=10)
+    assert labels.tolist() == [block for block in range(10) for _ in range(2)] + list(range(10, 20))
+
+
+def test_metrics_are_exact():
+    df = stage_frame([1, 2])
+    values = df["Total"].to_numpy()
+    sample = PooledSample(df[["Total", "Empty"]].to_numpy(), block_labels(df["Run"].to_numpy()))
+    metrics = dict(zip(METRICS, sample.metrics()))
+    assert metrics["Mean"][0] == pytest.approx(values.mean())
+    assert metrics["Median"][0] == pytest.approx(np.median(values))
+    assert metrics["Standard Deviation"][0] == pytest.approx(values.std(ddof=1))
+    assert metrics["Max"][0] == values.max()
+    assert metrics["99th Percentile"][0] == pytest.approx(np.quantile(values, 0.99))
+    assert all(np.isnan(metrics[metric][1]) for metric in METRICS)
+
+
+def test_weighted_metrics_match_the_exact_ones():
+    df = stage_frame([1, 2])
+    sample = PooledSample(df[["Total"]].to_numpy(), block_labels(df["Run"].to_numpy()))
+    exact, weighted = sample.metrics(), sample.metrics(np.ones(sample.block_count))
+    assert np.allclose(weighted, exact, rtol=0.001)
+
+
+def test_bootstrap_is_seeded():
+    df = stage_frame([1, 1.1, 0.9])
+    first, second = describe(df, ["Total"], resamples=200, seed=1), describe(df, ["Total"], resamples=200, seed=1)
+    assert first["distribution"].shape == (200, len(METRICS), 1)
+    assert np.array_equal(first["distribution"], second["distribution"])
+
+
+def test_interval_covers_the_estimate():
+    result = describe(stage_frame([1, 1, 1, 1]), ["Total"], resamples=500)
+    assert np.all(result["lower"][:, 0] <= result["estimate"][:, 0])
+    assert np.all(result["estimate"][:, 0] <= result["upper"][:, 0])
+
+
+def test_interval_widens_with_differences_between_runs():
+    # Same pooled size, but the repetitions disagree: the two-stage bootstrap has to show it
+    median = METRICS.index("Median")
+    alike = describe(stage_frame([1, 1, 1, 1]), ["Total"], resamples=500)
+    apart = describe(stage_frame([0.5, 0.8, 1.2, 2]), ["Total"], resamples=500)
+    width_alike = alike["upper"][median, 0] - alike["lower"][median, 0]
+    width_apart = apart["upper"][median, 0] - apart["lower"][median, 0]
+    assert width_apart > 5 * width_alike
+
+
+def test_confidence_interval_is_a_percentile_interval():
+    lower, upper = confidence_interval(np.arange(1001, dtype=np.float64))
+    assert (lower, upper) == pytest.approx((25, 975))
+
+
+def test_holm():
+    assert holm([0.01, 0.04, 0.03, 0.005]) == pytest.approx([0.03, 0.06, 0.06, 0.02])
+    assert holm([0.5, 0.9]) == pytest.approx([1.0, 1.0])
+    assert holm([0.02]) == pytest.approx([0.02])
+
+
+def test_cliffs_delta():
+    assert cliffs_delta(np.array([3.0, 4.0]), np.array([1.0, 2.0])) == 1.0
+    assert cliffs_delta(np.array([1.0, 2.0]), np.array([3.0, np.nan])) == -1.0
+    assert cliffs_delta(np.array([1.0, 2.0]), np.array([1.0, 2.0])) == 0.0
+    assert np.isnan(cliffs_delta(np.array([np.nan]), np.array([1.0])))
+
+
+def test_compare_finds_a_real_difference_only():
+    a = describe(stage_frame([1, 1, 1], seed=1), ["Total"], resamples=500)
+    slower = describe(stage_frame([2, 2, 2], seed=2), ["Total"], resamples=500, seed=1)
+    same = describe(stage_frame([1, 1, 1], seed=3), ["Total"], resamples=500, seed=2)
+    difference = compare(a, slower, 0, 0)
+    assert difference["ratio"] == pytest.approx(2, rel=0.05)
+    assert difference["p"] < 0.01 and difference["lower"] > 0 and difference["effect"] == "large"
+    assert compare(a, same, 0, 0)["p"] > 0.05
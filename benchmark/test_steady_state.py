@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from steady_state import changepoints, bic_penalty, steady_state, trim_runs
+
+
+def latencies(count, median_ms=1.0, seed=0):
+    """ Log-normal latencies in ms around median_ms. """
+    return np.random.default_rng(seed).lognormal(np.log(median_ms), 0.2, count)
+
+
+def test_changepoint_of_a_step():
+    series = np.concatenate([np.zeros(100), np.ones(100)]) + np.random.default_rng(0).normal(0, 0.1, 200)
+    assert changepoints(series, bic_penalty(series)) == [100]
+
+
+def test_no_changepoint_in_noise():
+    series = np.random.default_rng(0).normal(0, 0.1, 1000)
+    assert changepoints(series, bic_penalty(series)) == []
+
+
+def test_stationary_run_is_kept():
+    values = latencies(20_000)
+    start, end = steady_state(values)
+    assert start <= 0.01 * len(values) and end == len(values)
+
+
+def test_warmup_and_drain_are_trimmed():
+    values = np.concatenate([latencies(1000, 5, seed=1), latencies(18_000, 1, seed=2), latencies(1000, 5, seed=3)])
+    start, end = steady_state(values)
+    assert 1000 <= start <= 1040
+    assert 18_960 <= end <= 19_000
+
+
+def test_regime_change_in_the_middle_is_kept():
+    values = np.concatenate([latencies(10_000, 1, seed=1), latencies(10_000, 3, seed=2)])
+    assert steady_state(values) == (0, len(values))
+
+
+def test_cold_start_outliers_are_trimmed():
+    # Large enough to shift the first block mean, trimmed to the minimum segment of the block means
+    values = latencies(20_000)
+    values[:5] = 50
+    start, end = steady_state(values)
+    assert 5 <= start <= 0.01 * len(values) and end == len(values)
+
+
+def test_cold_start_outliers_below_the_block_means_are_trimmed():
+    # Vanish in the block means of 100 messages, the message by message pass over the head finds them
+    values = latencies(100_000)
+    values[:5] = 5
+    assert steady_state(values) == (5, len(values))
+
+
+def test_short_series_is_kept():
+    assert steady_state([5.0, 1.0, 1.0]) == (0, 3)
+
+
+def test_trim_runs_trims_each_run():
+    warm = np.concatenate([latencies(500, 5, seed=1), latencies(9500, 1, seed=2)])
+    df = pd.DataFrame({"Run": ["a"] * 10_000 + ["b"] * 10_000,
+                       "Total Transmission Time": np.concatenate([warm, latencies(10_000, seed=3)])})
+    trimmed = trim_runs(df)
+    counts = trimmed["Run"].value_counts()
+    assert 9460 <= counts["a"] <= 9500
+    assert counts["b"] >= 9900
+    assert trimmed["Total Transmission Time"].max() < 5
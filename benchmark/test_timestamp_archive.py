@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from timestamp_archive import (ARCHIVE_SUFFIX, convert_csv, extract_csv, iter_archive_blocks, read_archive,
+                               unzigzag, write_archive, zigzag)
+
+
+def run_columns(rows=5000, seed=0):
+    """ Columns like a run table: periodic sends with jitter, receives a latency later, a float column. """
+    rng = np.random.default_rng(seed)
+    sent = 1_700_000_000_000_000_000 + np.arange(rows, dtype=np.int64) * 10_000_000 + rng.integers(-50_000, 50_000, rows)
+    return {
+        "ID": np.arange(rows, dtype=np.int64),
+        "Sent Time": sent,
+        "Received Time": sent + rng.integers(100_000, 5_000_000, rows),
+        "Delay": rng.lognormal(0, 1, rows),
+    }
+
+
+def assert_columns_equal(df, columns):
+    assert list(df.columns) == list(columns)
+    for name, column in columns.items():
+        assert df[name].dtype == column.dtype
+        # Bit for bit, NaN and -0.0 included
+        assert np.array_equal(df[name].to_numpy().view(np.int64), column.view(np.int64))
+
+
+def test_zigzag_round_trip():
+    values = np.array([0, -1, 1, -2, 2, np.iinfo(np.int64).min, np.iinfo(np.int64).max], dtype=np.int64)
+    assert zigzag(values[:5]).tolist() == [0, 1, 2, 3, 4]
+    assert np.array_equal(unzigzag(zigzag(values)), values)
+
+
+@pytest.mark.parametrize("block_rows", [1_000_000, 1000, 999])
+def test_round_trip(tmp_path, block_rows):
+    columns = run_columns()
+    columns["Delay"][[3, 7]] = [np.nan, -0.0]
+    path = tmp_path / f"arrived{ARCHIVE_SUFFIX}"
+    write_archive(path, columns, block_rows=block_rows)
+    assert_columns_equal(read_archive(path), columns)
+    assert sum(len(block) for block in iter_archive_blocks(path)) == len(columns["ID"])
+
+
+def test_compresses_timestamps(tmp_path):
+    columns = run_columns(100_000)
+    path = tmp_path / f"arrived{ARCHIVE_SUFFIX}"
+    write_archive(path, {name: columns[name] for name in ("ID", "Sent Time", "Received Time")})
+    assert path.stat().st_size < 3 * 8 * 100_000 / 4
+
+
+def test_selected_columns_decode_their_references(tmp_path):
+    columns = run_columns()
+    path = tmp_path / f"arrived{ARCHIVE_SUFFIX}"
+    write_archive(path, columns, block_rows=1000)
+    df = read_archive(path, ["Received Time"])
+    assert list(df.columns) == ["Received Time"]
+    assert np.array_equal(df["Received Time"].to_numpy(), columns["Received Time"])
+
+
+def test_empty_table(tmp_path):
+    columns = {"ID": np.array([], dtype=np.int64), "Delay": np.array([], dtype=np.float64)}
+    path = tmp_path / f"empty{ARCHIVE_SUFFIX}"
+    write_archive(path, columns)
+    assert_columns_equal(read_archive(path), columns)
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / f"arrived{ARCHIVE_SUFFIX}"
+    path.write_bytes(b"ID,Sent Time\n")
+    with pytest.raises(ValueError):
+        read_archive(path)
+
+
+@pytest.mark.parametrize("separator, newline, final_newline", [(", ", "\n", True), (",", "\r\n", False)])
+def test_csv_round_trip_is_byte_exact(tmp_path, separator, newline, final_newline):
+    columns = run_columns(2500)
+    lines = [separator.join(columns)] + [separator.join(str(column[row]) for column in columns.values()) for row in range(2500)]
+    csv_bytes = (newline.join(lines) + (newline if final_newline else "")).encode()
+    (tmp_path / "arrived.csv").write_bytes(csv_bytes)
+    assert convert_csv(tmp_path, "arrived", block_rows=1000, remove_csv=True) is not None
+    assert not (tmp_path / "arrived.csv").exists()
+    extract_csv(tmp_path, "arrived")
+    assert (tmp_path / "arrived.csv").read_bytes() == csv_bytes
+
+
+def test_text_columns_stay_csv(tmp_path):
+    (tmp_path / "names.csv").write_text("ID, Name\n1, a\n2, b\n")
+    assert convert_csv(tmp_path, "names") is None
+    assert not (tmp_path / f"names{ARCHIVE_SUFFIX}").exists()
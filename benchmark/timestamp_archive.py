@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import struct
+import zlib
+import numpy as np
+import pandas as pd
+
+ARCHIVE_SUFFIX = ".tsz"  # <run>/<table>.tsz next to or instead of <run>/<table>.csv
+MAGIC = b"TSZ\x01"
+VERSION = 1
+BLOCK_ROWS = 1_000_000  # Rows encoded independently, the unit of chunked reads
+LEVEL = 9  # zlib level, decompression is equally fast at every level
+SAMPLE_ROWS = 100_000  # Rows the encoding of a column is chosen on
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Convert the CSV tables of runs into delta-encoded compressed archives, or back')
+    parser.add_argument('--run', type=str, nargs='+',
+                       help='Run directories in benchmark/data, all by default')
+    parser.add_argument('--extract', action='store_true',
+                       help='Write the CSVs back from the archives instead, byte for byte as they were')
+    parser.add_argument('--remove-csv', action='store_true',
+                       help='Delete each CSV once its archive is written and verified to reproduce it')
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS,
+                       help='Rows per independently encoded block')
+    return parser.parse_args()
+
+
+def zigzag(deltas):
+    """ Signed int64 -> uint64 with small magnitudes small: 0, -1, 1, -2 -> 0, 1, 2, 3. """
+    return ((deltas << 1) ^ (deltas >> 63)).view(np.uint64)
+
+
+def unzigzag(values):
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def transform(values, order, reference=None):
+    """ The values minus the reference column, differenced `order` times; wraps around like the inverse. """
+    deltas = values - reference if reference is not None else values
+    for _ in range(order):
+        deltas = np.diff(deltas, prepend=np.int64(0))
+    return deltas
+
+
+def untransform(deltas, order, reference=None):
+    values = deltas
+    for _ in range(order):
+        values = np.cumsum(values, dtype=np.int64)
+    return values + reference if reference is not None else values
+
+
+def pack(deltas, level=LEVEL):
+    """
+    Zigzag-encoded deltas cut to the bytes the largest one needs and shuffled byte plane by byte plane
+    (all lowest bytes, then all second bytes, ...), so zlib sees the mostly constant high bytes as long runs.
+    Returns (width, payload).
+    """
+    values = zigzag(np.ascontiguousarray(deltas, dtype=np.int64)).astype("<u8", copy=False)
+    width = max((int(values.max()).bit_length() + 7) // 8, 1) if len(values) else 1
+    planes = values.view(np.uint8).reshape(-1, 8)[:, :width].T
+    return width, zlib.compress(np.ascontiguousarray(planes).tobytes(), level)
+
+
+def unpack(payload, width, rows):
+    planes = np.frombuffer(zlib.decompress(payload), dtype=np.uint8).reshape(width, rows)
+    values = np.zeros((rows, 8), dtype=np.uint8)
+    values[:, :width] = planes.T
+    return unzigzag(values.view("<u8").reshape(-1))
+
+
+def choose_encoding(columns, index):
+    """
+    The (order, reference) with the smallest sample for column `index`: differenced once or twice (periodic sends
+    differ from the last delta by jitter only), or relative to an earlier integer column of the same row
+    (e.g. End Time - Start Time), as it is or differenced once.
+    """
+    names = list(columns)
+    values = columns[names[index]][:SAMPLE_ROWS]
+    candidates = [(1, None), (2, None)]
+    if values.dtype.kind == "i":
+        candidates += [(order, name) for name in names[:index] if columns[name].dtype.kind == "i" for order in (0, 1)]
+    sizes = {}
+    for order, reference in candidates:
+        deltas = transform(as_int64(values), order, as_int64(columns[reference][:SAMPLE_ROWS]) if reference else None)
+        sizes[(order, reference)] = len(pack(deltas, 1)[1])
+    return min(sizes, key=sizes.get)
+
+
+def as_int64(column):
+    """ Integer columns as int64, floats as their bit patterns, so both are encoded alike and exactly. """
+    column = np.ascontiguousarray(column)
+    return column.view(np.int64) if column.dtype == np.float64 else column.astype(np.int64, copy=False)
+
+
+def csv_layout(csv_path):
+    """ The header line, separator, line ending and final newline of a CSV, what its values don't tell. """
+    with open(csv_path, 'rb') as csv_file:
+        header = csv_file.readline()
+        csv_file.seek(-1, os.SEEK_END)
+        final_newline = csv_file.read(1) == b"\n"
+    newline = "\r\n" if header.endswith(b"\r\n") else "\n"
+    header = header.decode().rstrip("\r\n")
+    return {"header": header, "separator": ", " if ", " in header else ",", "newline": newline, "final_newline": final_newline}
+
+
+def write_archive(archive_path, columns, csv=None, block_rows=BLOCK_ROWS, level=LEVEL):
+    """
+    Writes named int64/float64 columns of equal length into one archive:
+    MAGIC, the length of a JSON header (uint32, little-endian), the header and the compressed blocks.
+    The header lists the rows, the columns with their dtype and encoding, the offset, size and byte width
+    of every block of every column, and the CSV layout to write them back with (see csv_layout()).
+    """
+    columns = {name: np.asarray(column) for name, column in columns.items()}
+    rows = len(next(iter(columns.values()))) if columns else 0
+    encodings = [choose_encoding(columns, index) for index in range(len(columns))]
+    header = {
+        "version": VERSION, "rows": rows, "block_rows": block_rows, "csv": csv,
+        "columns": [{"name": name, "dtype": str(column.dtype), "order": order, "reference": reference}
+                    for (name, column), (order, reference) in zip(columns.items(), encodings)],
+        "blocks": [],
+    }
+    payloads, offset = [], 0
+    for start in range(0, rows, block_rows):
+        block = []
+        for (name, column), (order, reference) in zip(columns.items(), encodings):
+            stop = start + block_rows
+            deltas = transform(as_int64(column[start:stop]), order, as_int64(columns[reference][start:stop]) if reference else None)
+            width, payload = pack(deltas, level)
+            block.append([offset, len(payload), width])
+            payloads.append(payload)
+            offset += len(payload)
+        header["blocks"].append(block)
+    header_bytes = json.dumps(header).encode()
+    # Written under a temporary name and renamed, so an interrupted write never looks like an archive
+    temp_path = f"{archive_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as archive_file:
+        archive_file.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for payload in payloads:
+            archive_file.write(payload)
+    os.replace(temp_path, archive_path)
+
+
+def read_header(archive_file):
+    """ The header of an open archive and the file offset its blocks start at. """
+    if archive_file.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"{archive_file.name} is not a timestamp archive")
+    (length,) = struct.unpack("<I", archive_file.read(4))
+    header = json.loads(archive_file.read(length))
+    if header["version"] > VERSION:
+        raise ValueError(f"{archive_file.name} has archive version {header['version']}, this reader knows up to {VERSION}")
+    return header, len(MAGIC) + 4 + length
+
+
+def iter_archive_blocks(archive_path, columns=None):
+    """ Yields the blocks of an archive as DataFrames, reading one block at a time; `columns` selects columns. """
+    with open(archive_path, 'rb') as archive_file:
+        header, data_start = read_header(archive_file)
+        names = [column["name"] for column in header["columns"]]
+        # References have to be decoded too, even if they weren't asked for
+        wanted = set(names if columns is None else columns)
+        for column in reversed(header["columns"]):
+            if column["name"] in wanted and column["reference"]:
+                wanted.add(column["reference"])
+        for index, block in enumerate(header["blocks"]):
+            rows = min(header["block_rows"], header["rows"] - index * header["block_rows"])
+            values = {}
+            for column, (offset, size, width) in zip(header["columns"], block):
+                if column["name"] not in wanted:
+                    continue
+                archive_file.seek(data_start + offset)
+                deltas = unpack(archive_file.read(size), width, rows)
+                decoded = untransform(deltas, column["order"], values.get(column["reference"]))
+                values[column["name"]] = decoded.view(np.float64) if column["dtype"] == "float64" else decoded
+            yield pd.DataFrame({name: values[name] for name in names if columns is None or name in columns}, copy=False)
+
+
+def read_archive(archive_path, columns=None):
+    """ All rows of an archive as a DataFrame with the column names of the CSV (without leading spaces). """
+    blocks = list(iter_archive_blocks(archive_path, columns))
+    if len(blocks) == 1:
+        return blocks[0]
+    if not blocks:
+        with open(archive_path, 'rb') as archive_file:
+            header, _ = read_header(archive_file)
+        return pd.DataFrame({column["name"]: np.array([], dtype=column["dtype"]) for column in header["columns"]
+                             if columns is None or column["name"] in columns})
+    return pd.concat(blocks, ignore_index=True)
+
+
+def iter_csv_bytes(archive_path):
+    """ Yields the CSV an archive was converted from, block by block, as bytes. """
+    with open(archive_path, 'rb') as archive_file:
+        layout = read_header(archive_file)[0]["csv"]
+    if layout is None:
+        raise ValueError(f"{archive_path} wasn't converted from a CSV")
+    newline = layout["newline"]
+    yield (layout["header"] + newline).encode()
+    blocks = iter_archive_blocks(archive_path)
+    block = next(blocks, None)
+    while block is not None:
+        following = next(blocks, None)
+        # Python's shortest round-trip repr for floats, as the harness wrote them
+        text = [block[name].to_numpy().astype(str) for name in block.columns]
+        lines = pd.Series(text[0]).str.cat([pd.Series(column) for column in text[1:]], sep=layout["separator"]) if len(text) > 1 else pd.Series(text[0])
+        ending = newline if following is not None or layout["final_newline"] else ""
+        yield (newline.join(lines) + ending).encode()
+        block = following
+
+
+def matches_csv(archive_path, csv_path):
+    """ Whether the archive writes back exactly the bytes of the CSV. """
+    with open(csv_path, 'rb') as csv_file:
+        for chunk in iter_csv_bytes(archive_path):
+            if csv_file.read(len(chunk)) != chunk:
+                return False
+        return csv_file.read(1) == b""
+
+
+def convert_csv(run_path, name, block_rows=BLOCK_ROWS, remove_csv=False):
+    """
+    Archives <run>/<name>.csv as <run>/<name>.tsz. The archive is kept only if it writes the CSV back byte for byte,
+    tables with text columns or formatting the archive can't reproduce stay CSV. Returns (csv bytes, archive bytes) or None.
+    """
+    csv_path = os.path.join(run_path, f"{name}.csv")
+    archive_path = os.path.join(run_path, f"{name}{ARCHIVE_SUFFIX}")
+    # The default float parser can be off in the last digit, the archive has to hold the values the CSV wrote
+    df = pd.read_csv(csv_path, skipinitialspace=True, float_precision="round_trip")
+    if not all(dtype in (np.int64, np.float64) for dtype in df.dtypes):
+        return None
+    write_archive(archive_path, {header: df[header].to_numpy() for header in df.columns}, csv_layout(csv_path), block_rows)
+    if not matches_csv(archive_path, csv_path):
+        os.remove(archive_path)
+        return None
+    sizes = os.path.getsize(csv_path), os.path.getsize(archive_path)
+    if remove_csv:
+        os.remove(csv_path)
+    return sizes
+
+
+def extract_csv(run_path, name):
+    """ Writes <run>/<name>.csv back from its archive. """
+    csv_path = os.path.join(run_path, f"{name}.csv")
+    temp_path = f"{csv_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as csv_file:
+        for chunk in iter_csv_bytes(os.path.join(run_path, f"{name}{ARCHIVE_SUFFIX}")):
+            csv_file.write(chunk)
+    os.replace(temp_path, csv_path)
+
+
+def main():
+    args = parse_arguments()
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    runs = args.run or sorted(name for name in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, name)))
+    total_csv = total_archive = 0
+    for run in runs:
+        run_path = os.path.join(data_dir, run)
+        if args.extract:
+            for file_name in sorted(os.listdir(run_path)):
+                if file_name.endswith(ARCHIVE_SUFFIX):
+                    extract_csv(run_path, file_name[:-len(ARCHIVE_SUFFIX)])
+                    print(f"{run}/{file_name[:-len(ARCHIVE_SUFFIX)]}.csv written")
+            continue
+        for file_name in sorted(os.listdir(run_path)):
+            if not file_name.endswith(".csv"):
+                continue
+            name = file_name[:-len(".csv")]
+            sizes = convert_csv(run_path, name, args.block_rows, args.remove_csv)
+            if sizes is None:
+                print(f"{run}/{file_name}: kept as CSV, the archive can't reproduce it")
+                continue
+            total_csv += sizes[0]
+            total_archive += sizes[1]
+            print(f"{run}/{file_name}: {sizes[0] / 1e6:.2f} MB -> {sizes[1] / 1e6:.2f} MB (x{sizes[0] / sizes[1]:.1f})")
+    if total_archive:
+        print(f"Total: {total_csv / 1e6:.1f} MB -> {total_archive / 1e6:.1f} MB (x{total_csv / total_archive:.1f})")
+
+
+if __name__ == "__main__":
+    main()
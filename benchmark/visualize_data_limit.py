@@ -1,11 +1,11 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import argparse
+from data_loader import load_table
+from limit_pipeline import load_limit_run
+from saturation import analyze_run, smoothed
 from matplotlib.ticker import MaxNLocator
-from scipy.ndimage import uniform_filter1d
 from matplotlib.dates import num2date
-import os
 import seaborn as sns
 
 # Parse command-line arguments
@@ -21,108 +21,91 @@ def parse_arguments():
 args = parse_arguments()
 run = args.run
 base_path = f'benchmark/data/{run}/'
-# Load received messages from two CSV files and combine them
-df_recv_1 = pd.read_csv(f'{base_path}/arrived_messages_1.csv')
-df_recv_2 = pd.read_csv(f'{base_path}/arrived_messages_2.csv')
-df_recv = pd.concat([df_recv_1, df_recv_2]).reset_index(drop=True)
-
-# Load lost messages (IDs, Sent Time)
-df_lost = pd.read_csv(f'{base_path}/invalid_ids_never_arrived.csv')
+# Arrived and lost messages reduced to one row per second in a single streaming pass (see limit_pipeline.py),
+# processed on the first load and whenever the run's tables change
+df_seconds, _, limit_summary = load_limit_run(base_path)
+# Offered and sent rate, loss and CPU on the same seconds, with the saturation knee (see saturation.py)
+saturation = analyze_run(base_path)
+df_timeline = saturation["timeline"]
 
 # Load system monitoring logs (ms, CPU%, Memory%)
-df_monitor = pd.read_csv(f'{base_path}/system_usage.csv')
-
-def plot_delay_with_lost_messages(df_recv, df_lost, max_points=10000):
-    plt.figure(figsize=(12, 6))
-
-    # Convert to NumPy arrays for faster processing
-    message_ids = df_recv["ID"].to_numpy()
-    delays = ((df_recv["Received Time"] - df_recv["Sent Time"]) / 1_000_000).to_numpy()
-
-    # Downsample if too many points (keeping evenly spaced samples)
-    if len(message_ids) > max_points:
-        indices = np.linspace(0, len(message_ids) - 1, max_points, dtype=int)
-        message_ids = message_ids[indices]
-        delays = delays[indices]
-
-    # Plot normal delay trend
-    plt.plot(message_ids, delays, linestyle="-", marker=".", alpha=0.5, label="Message Delay (ms)")
-
-    plt.xlabel("Message ID")
-    plt.ylabel("Delay (ms)")
-    plt.title(f"Message Delay Over Time")
-    plt.legend()
-    plt.grid(True, linestyle="--", alpha=0.6)
+df_monitor = load_table(base_path, 'system_usage')
+
+def plot_delay_with_lost_messages(df_seconds):
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    # Min, mean and max delay of the messages sent in each second, every spike stays in the band
+    seconds = df_seconds["Second"].to_numpy()
+    if "Mean Latency" in df_seconds:
+        ax.fill_between(seconds, df_seconds["Min Latency"].to_numpy(), df_seconds["Max Latency"].to_numpy(), alpha=0.3, label="Min - Max Delay (ms)")
+        ax.plot(seconds, df_seconds["Mean Latency"].to_numpy(), linestyle="-", marker=".", alpha=0.7, label="Mean Delay (ms)")
+    ax_lost = ax.twinx()
+    ax_lost.plot(seconds, df_seconds["Lost"].to_numpy(), color="red", alpha=0.6, label="Lost Messages")
+    ax_lost.set_ylabel("Lost Messages per Second")
+
+    ax.set_xlabel("Seconds")
+    ax.set_ylabel("Delay (ms)")
+    ax.set_title(f"Message Delay Over Time")
+    fig.legend(loc="upper left")
+    ax.grid(True, linestyle="--", alpha=0.6)
 
     if args.save:
         plt.savefig(f"{base_path}/delay_with_lost_messages.png", dpi=300)
     else:
         plt.show()
 
-def plot_messages_per_second(df_recv, window_size=10, max_hz=10_000):
-    plt.figure()
+def plot_messages_per_second(df_timeline, saturation):
+    # Offered vs achieved rate, loss and CPU on one time axis, the knee marked where they diverge
+    fig, (ax_rate, ax_loss, ax_cpu) = plt.subplots(3, 1, sharex=True, figsize=(12, 10))
     csfont = {'fontname':'Times New Roman', 'fontsize': 14}
-
-    # Convert timestamps to seconds (assuming they are in nanoseconds)
-    df_recv["Received Time (s)"] = (df_recv["Received Time"].to_numpy()) / 1_000_000_000
-    # Bin timestamps into 1-second intervals
-    df_recv["Time Bin"] = df_recv["Received Time (s)"].astype(int).to_numpy() * 100
-    msg_per_sec = df_recv.groupby("Time Bin").size().to_numpy()
-
-    # Create a time range for the x-axis
-    time_range = np.arange(len(msg_per_sec))
-
-    # Apply smoothing for better visualization
-    smoothed_rate = uniform_filter1d(msg_per_sec, size=window_size)
-
-    # Find the time `t_max_hz` where the expected function reaches 10,000 Hz
-    t_max_hz = (max_hz - 100) / 100  # Solving 100x + 100 = 10,000 → x = (10,000 - 100) / 100
-
-    # Plot measured messages per second
-    plt.plot(time_range, smoothed_rate, linestyle="-", marker=".", alpha=0.7, label="Measured Messages per Second")
-
-    # Plot theoretical function: 100x + 100 (extended to t_max_hz)
-    theoretical_time_range = np.arange(len(time_range))
-    theoretical_values = 100 * theoretical_time_range + 100
-
-    # Trim theoretical values to only go up to 10,000 Hz
-    theoretical_time_range = theoretical_time_range[theoretical_values <= max_hz]
-    theoretical_values = theoretical_values[theoretical_values <= max_hz]
-
-    plt.plot(theoretical_time_range, theoretical_values, linestyle="--", color="red", label="Expected: 100x + 100")
-
-    plt.xlabel("Seconds", **csfont)
-    plt.ylabel("Messages per Second", **csfont)
-    plt.legend()
-    plt.grid(True, linestyle="--", alpha=0.6)
-
-    # Add padding to the axis limits for a better visual appearance
-    x_padding = 5  # Extra seconds of space
-    y_padding = max_hz * 0.05  # 5% extra space
-
-    plt.xlim(-x_padding, max(t_max_hz, max(time_range)) + x_padding)
-    plt.ylim(-y_padding, max_hz + y_padding)
+    seconds = df_timeline.index.to_numpy()
+
+    ax_rate.plot(seconds, df_timeline["Offered"].to_numpy(), linestyle="--", color="red", label=f"Offered (from the {saturation['offered_source']})")
+    if saturation["peak_hz"] is not None:
+        ax_rate.plot(seconds, smoothed(df_timeline["Sent"]).to_numpy(), label="Sent (actual send times)")
+        ax_rate.plot(seconds, smoothed(df_timeline["Received"]).to_numpy(), alpha=0.7, label="Received")
+    ax_rate.set_ylabel("Messages per Second", **csfont)
+    ax_rate.legend()
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        loss = smoothed(df_timeline["Lost"] + df_timeline["Late"]) / smoothed(df_timeline["Offered"])
+    ax_loss.plot(seconds, 100 * loss.to_numpy(), color="red", label="Lost and Late (% of offered)")
+    ax_loss.set_ylabel("Loss (%)", **csfont)
+    ax_loss.legend()
+
+    cpu_columns = [column for column in df_timeline.columns if column == "System CPU" or column.startswith("CPU ")]
+    for column in cpu_columns:
+        ax_cpu.plot(seconds, df_timeline[column].to_numpy(), label=column)
+    ax_cpu.set_ylabel("CPU Usage (%)", **csfont)
+    ax_cpu.set_xlabel("Seconds", **csfont)
+    if cpu_columns:
+        ax_cpu.legend()
+
+    for ax in (ax_rate, ax_loss, ax_cpu):
+        if saturation["saturated"]:
+            ax.axvline(saturation["knee_s"], color="black", linestyle=":", alpha=0.8)
+        ax.grid(True, linestyle="--", alpha=0.6)
+    if saturation["saturated"]:
+        ax_rate.set_title(f"Knee at {saturation['knee_s']} s, {saturation['sustainable_hz']:.0f} Hz sustainable, limited by the {saturation['resource']}")
 
     if args.save:
         plt.savefig(f"{base_path}/messages_per_second_with_padding.png", dpi=300)
     else:
         plt.show()
 
-def plot_lost_messages_histogram(df_lost, df_recv, bin_size=500):
+def plot_lost_messages_histogram(df_timeline, bin_size=500):
     plt.figure()
     csfont = {'fontname':'Times New Roman', 'fontsize': 14}
 
-    df_lost["Sent Time (s)"] = (df_lost["Sent Time"].to_numpy() - df_recv["Sent Time"][0]) / 1_000_000_000
-    df_lost["Hz at Send"] = 100 + 100 * df_lost["Sent Time (s)"]
+    # Each second's losses at the rate offered in that second
+    lost = df_timeline[df_timeline["Lost"] > 0]
+    hz_at_send = lost["Offered"].to_numpy()
 
     # Define histogram bins for Hz
-    min_hz = df_lost["Hz at Send"].min()
-    max_hz = df_lost["Hz at Send"].max()
-
-    bins = np.arange(min_hz, max_hz + bin_size, bin_size)
+    bins = np.arange(hz_at_send.min(), hz_at_send.max() + bin_size, bin_size) if len(lost) else bin_size
 
     # Create histogram with correct bins
-    plt.hist(df_lost["Hz at Send"], bins=bins, color="red", alpha=0.7)
+    plt.hist(hz_at_send, bins=bins, weights=lost["Lost"].to_numpy(), color="red", alpha=0.7)
 
     plt.xlabel("Message Rate (Hz)", **csfont)
     plt.ylabel("Number of Lost Messages", **csfont)
@@ -134,17 +117,19 @@ def plot_lost_messages_histogram(df_lost, df_recv, bin_size=500):
         plt.show()
 
 
-def stats_first_lost_message(df_lost, df_recv):
-    df_lost["Sent Time (s)"] = (df_lost["Sent Time"].to_numpy() - df_recv["Sent Time"][0]) / 1_000_000_000
-    df_lost["Hz at Send"] = 100 + 100 * df_lost["Sent Time (s)"]
-
-    # Find the first lost message
-    first_lost_message = df_lost.iloc[0]
-    first_lost_hz = first_lost_message["Hz at Send"]
-    first_lost_time = first_lost_message["Sent Time (s)"]
-    
-    #print it to console
-    print(f"First lost message at {first_lost_time:.2f} seconds with {first_lost_hz:.2f} Hz")
+def stats_first_lost_message(limit_summary, saturation):
+    # The first lost message, in seconds since the start, at the rate offered in its second
+    first_lost_time = limit_summary["first_lost_s"]
+    if first_lost_time is None:
+        print("No message was lost")
+    else:
+        print(f"First lost message at {first_lost_time:.2f} seconds with {saturation['first_loss_hz']:.2f} Hz")
+    # Single losses come long before the rate the transport can't sustain anymore
+    if saturation["saturated"]:
+        print(f"Saturation knee at {saturation['knee_s']} seconds, sustainable rate {saturation['sustainable_hz']:.0f} Hz, "
+              f"limited by the {saturation['resource']} ({saturation['evidence']})")
+    else:
+        print(f"No saturation up to {saturation['sustainable_hz']:.0f} Hz")
     
 def hardware_resources(df_monitor):
     # Log the maximum difference between maximum and minimum for both CPU and Memory
@@ -163,8 +148,8 @@ def hardware_resources(df_monitor):
 # Run the function
 hardware_resources(df_monitor)
 
-plot_lost_messages_histogram(df_lost, df_recv)
+plot_lost_messages_histogram(df_timeline)
 
-plot_messages_per_second(df_recv)
+plot_messages_per_second(df_timeline, saturation)
 
-stats_first_lost_message(df_lost, df_recv)
\ No newline at end of file
+stats_first_lost_message(limit_summary, saturation)
\ No newline at end of file
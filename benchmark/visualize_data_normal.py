@@ -1,154 +1,100 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import argparse
+import os
+import sys
+from stage_breakdown import discover_runs, load_runs, compute_stages
+from steady_state import trim_runs
+from stage_statistics import METRICS, describe
+from decimation import MODES, decimate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ros2_api"))
+from latency_histogram import LatencyHistogram
 
 # Parse command-line arguments
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Visualize benchmark data')
     parser.add_argument('--run', type=str, default="uds_big", 
-                       help='Run identifier (e.g., "uds_big_1", "rosbridge")')
+                       help='Run identifier, all repetitions of "uds_big" or only "uds_big_1"')
+    parser.add_argument('--no-trim', action='store_true',
+                       help='Keep the transients at the start and end of each run instead of trimming to the steady state')
+    parser.add_argument('--histograms', action='store_true',
+                       help='Compute the statistics from the latency histograms recorded by the harness')
+    parser.add_argument('--decimation', type=str, default="minmax", choices=MODES,
+                       help='How trend plots reduce the messages to the pixels: min and max per pixel column or LTTB')
     return parser.parse_args()
 
 # Get arguments
 args = parse_arguments()
 run = args.run
 print(f"Processing benchmark data for run: {run}")
-base_path = f'benchmark/data/{run}'
-df = pd.read_csv(f'{base_path}_1/arrived_messages.csv')
-df_2 = pd.read_csv(f'{base_path}_2/arrived_messages.csv')
-df_3 = pd.read_csv(f'{base_path}_3/arrived_messages.csv')
-
-def compute_timestamps(df, path):
-    if not run.startswith("rosbridge"):
-        df_ros_serialize = pd.read_csv(f'{path}/time_serialize.csv', skipinitialspace=True)
-        df_ros_deserialize = pd.read_csv(f'{path}/time_deserialize.csv', skipinitialspace=True)
-        # Merge new timestamps into the main dataframe
-        df["Start Serialize ROS"] = df_ros_serialize["Sent Time"]
-        df["End Serialize ROS"] = df_ros_serialize["Received Time"]
-        df["Start Deserialize ROS"] = df_ros_deserialize["Sent Time"]
-        df["End Deserialize ROS"] = df_ros_deserialize["Received Time"]
-        
-        df_py_serialize = pd.read_csv(f'{path}/serialize_time.csv', skipinitialspace=True)
-        df_py_deserialize = pd.read_csv(f'{path}/deserialize_time.csv', skipinitialspace=True)
-        
-        df["Start Serialize Py"] = df_py_serialize["Start Time"]
-        df["End Serialize Py"] = df_py_serialize["End Time"]
-        df["Start Deserialize Py"] = df_py_deserialize["Start Time"]
-        df["End Deserialize Py"] = df_py_deserialize["End Time"]
-        
-    else: # Just here to not break the code
-        df["Start Serialize ROS"] = df["Sent Time"]
-        df["End Serialize ROS"] = df["Received Time"]
-        df["Start Deserialize ROS"] = df["Sent Time"]
-        df["End Deserialize ROS"] = df["Received Time"]
-        
-        df["Start Serialize Py"] = df["Sent Time"]
-        df["End Serialize Py"] = df["Received Time"]
-        df["Start Deserialize Py"] = df["Sent Time"]
-        df["End Deserialize Py"] = df["Received Time"]
-    return df    
-
-
-# Compute all delays
-def compute_delays(df):
-    # Start Time -> Start Serialize Py -> End Serialize Py -> Start Deserialize ROS -> End Deserialize ROS -> Start Serialize ROS -> End Serialize ROS -> Start Deserialize Py -> End Deserialize Py -> End Time
-    df["Transmission Delay"] = (df["Start Serialize Py"] - df["Sent Time"]) / 1_000_000  # ms
-    df["Serialization Time Py"] = (df["End Serialize Py"] - df["Start Serialize Py"]) / 1_000_000  # ms
-    df["Send to ROS Delay"] = (df["Start Deserialize ROS"] - df["End Serialize Py"]) / 1_000_000  # ms
-    df["Deserialization Time ROS"] = (df["End Deserialize ROS"] - df["Start Deserialize ROS"]) / 1_000_000  # ms
-    df["ROS Processing Time"] = (df["Start Serialize ROS"] - df["End Deserialize ROS"]) / 1_000_000  # ms
-    df["Serialization Time ROS"] = (df["End Serialize ROS"] - df["Start Serialize ROS"]) / 1_000_000  # ms
-    df["Send to Py Delay"] = (df["Start Deserialize Py"] - df["End Serialize ROS"]) / 1_000_000  # ms
-    df["Deserialization Time Py"] = (df["End Deserialize Py"] - df["Start Deserialize Py"]) / 1_000_000  # ms
-    df["Reception Delay"] = (df["Received Time"] - df["End Deserialize Py"]) / 1_000_000  # ms
-    df["Total Transmission Time"] = (df["Received Time"] - df["Sent Time"]) / 1_000_000  # Full cycle
-    
-    return df
-
-df = compute_timestamps(df, f'{base_path}_1')
-df_2 = compute_timestamps(df_2, f'{base_path}_2')
-df_3 = compute_timestamps(df_3, f'{base_path}_3')
-df = compute_delays(df)
-df_2 = compute_delays(df_2)
-df_3 = compute_delays(df_3)
-
-df = pd.concat([df, df_2, df_3]).reset_index(drop=True)
+run_paths = discover_runs(f'benchmark/data/{run}')
+print(f"Repetitions: {', '.join(os.path.basename(path) for path in run_paths)}")
 
 # Compute statistics
-def compute_statistics_ros2api(df): #.mean(), .median(), .std(), .max(), .quantile(0.95), .quantile(0.99)
-    stats = {
-        "Mean Serialization Time (Python)": df["Serialization Time Py"].mean(),
-        "Mean Send to ROS Time": df["Send to ROS Delay"].mean(),
-        "Mean Deserialization Time (ROS)": df["Deserialization Time ROS"].mean(),
-        "Mean ROS Processing Time": df["ROS Processing Time"].mean(),
-        "Mean Serialization Time (ROS)": df["Serialization Time ROS"].mean(),
-        "Mean Send to Py Time": df["Send to Py Delay"].mean(),
-        "Mean Deserialization Time (Python)": df["Deserialization Time Py"].mean(),
-        "Mean Total Transmission Time": df["Total Transmission Time"].mean(),
-        
-        "Median Serialization Time (Python)": df["Serialization Time Py"].median(),
-        "Median Send to ROS Time": df["Send to ROS Delay"].median(),
-        "Median Deserialization Time (ROS)": df["Deserialization Time ROS"].median(),
-        "Median ROS Processing Time": df["ROS Processing Time"].median(),
-        "Median Serialization Time (ROS)": df["Serialization Time ROS"].median(),
-        "Median Send to Py Time": df["Send to Py Delay"].median(),
-        "Median Deserialization Time (Python)": df["Deserialization Time Py"].median(),
-        "Median Total Transmission Time": df["Total Transmission Time"].median(),
-        
-        "Standard Deviation Serialization Time (Python)": df["Serialization Time Py"].std(),
-        "Standard Deviation Send to ROS Time": df["Send to ROS Delay"].std(),
-        "Standard Deviation Deserialization Time (ROS)": df["Deserialization Time ROS"].std(),
-        "Standard Deviation ROS Processing Time": df["ROS Processing Time"].std(),
-        "Standard Deviation Serialization Time (ROS)": df["Serialization Time ROS"].std(),
-        "Standard Deviation Send to Py Time": df["Send to Py Delay"].std(),
-        "Standard Deviation Deserialization Time (Python)": df["Deserialization Time Py"].std(),
-        "Standard Deviation Total Transmission Time": df["Total Transmission Time"].std(),
-        
-        "Max Serialization Time (Python)": df["Serialization Time Py"].max(),
-        "Max Send to ROS Time": df["Send to ROS Delay"].max(),
-        "Max Deserialization Time (ROS)": df["Deserialization Time ROS"].max(),
-        "Max ROS Processing Time": df["ROS Processing Time"].max(),
-        "Max Serialization Time (ROS)": df["Serialization Time ROS"].max(),
-        "Max Send to Py Time": df["Send to Py Delay"].max(),
-        "Max Deserialization Time (Python)": df["Deserialization Time Py"].max(),
-        "Max Total Transmission Time": df["Total Transmission Time"].max(),
-        
-        "95th Percentile Serialization Time (Python)": df["Serialization Time Py"].quantile(0.95),
-        "95th Percentile Send to ROS Time": df["Send to ROS Delay"].quantile(0.95),
-        "95th Percentile Deserialization Time (ROS)": df["Deserialization Time ROS"].quantile(0.95),
-        "95th Percentile ROS Processing Time": df["ROS Processing Time"].quantile(0.95),
-        "95th Percentile Serialization Time (ROS)": df["Serialization Time ROS"].quantile(0.95),
-        "95th Percentile Send to Py Time": df["Send to Py Delay"].quantile(0.95),
-        "95th Percentile Deserialization Time (Python)": df["Deserialization Time Py"].quantile(0.95),
-        "95th Percentile Total Transmission Time": df["Total Transmission Time"].quantile(0.95),
-        
-        "99th Percentile Serialization Time (Python)": df["Serialization Time Py"].quantile(0.99),
-        "99th Percentile Send to ROS Time": df["Send to ROS Delay"].quantile(0.99),
-        "99th Percentile Deserialization Time (ROS)": df["Deserialization Time ROS"].quantile(0.99),
-        "99th Percentile ROS Processing Time": df["ROS Processing Time"].quantile(0.99),
-        "99th Percentile Serialization Time (ROS)": df["Serialization Time ROS"].quantile(0.99),
-        "99th Percentile Send to Py Time": df["Send to Py Delay"].quantile(0.99),
-        "99th Percentile Deserialization Time (Python)": df["Deserialization Time Py"].quantile(0.99),
-        "99th Percentile Total Transmission Time": df["Total Transmission Time"].quantile(0.99)
+STATISTIC_STAGES = [
+    ("Serialization Time (Python)", "Serialization Time Py"),
+    ("Send to ROS Time", "Send to ROS Delay"),
+    ("Deserialization Time (ROS)", "Deserialization Time ROS"),
+    ("ROS Processing Time", "ROS Processing Time"),
+    ("Serialization Time (ROS)", "Serialization Time ROS"),
+    ("Send to Py Time", "Send to Py Delay"),
+    ("Deserialization Time (Python)", "Deserialization Time Py"),
+    ("Total Transmission Time", "Total Transmission Time"),
+]
+
+def summarize(histogram):
+    """ Mean, median, std, max, p95 and p99 in ms of a LatencyHistogram in ns. """
+    return {
+        "Mean": histogram.mean() / 1_000_000,
+        "Median": histogram.value_at_quantile(0.5) / 1_000_000,
+        "Standard Deviation": histogram.std() / 1_000_000,
+        "Max": histogram.max_ns / 1_000_000,
+        "95th Percentile": histogram.value_at_quantile(0.95) / 1_000_000,
+        "99th Percentile": histogram.value_at_quantile(0.99) / 1_000_000,
     }
-    
-    for key, value in stats.items():
-        print(f"{key}: {value:.3f} ms")
-        
+
+def print_statistics(df, stages):
+    """
+    Prints the METRICS of the (label, column) stages in one pass over all columns, with 95% bootstrap
+    confidence intervals over the runs, or the plain values of {column: LatencyHistogram}.
+    """
+    stages = [(label, column) for label, column in stages if column in df]
+    if isinstance(df, dict):
+        summaries = {label: summarize(df[column]) for label, column in stages}
+        for statistic in METRICS:
+            for label, summary in summaries.items():
+                print(f"{statistic} {label}: {summary[statistic]:.3f} ms")
+        return
+    result = describe(df, [column for _, column in stages])
+    for row, statistic in enumerate(METRICS):
+        for column, (label, _) in enumerate(stages):
+            print(f"{statistic} {label}: {result['estimate'][row, column]:.3f} ms "
+                  f"[{result['lower'][row, column]:.3f}, {result['upper'][row, column]:.3f}]")
+
+def compute_statistics_ros2api(df):
+    """ df: the data frame of compute_stages(). """
+    print_statistics(df, STATISTIC_STAGES)
+
 def compute_statistics_rosbridge(df):
-    stats = {
-        "Mean Total Transmission Time": df["Total Transmission Time"].mean(),
-        "Median Total Transmission Time": df["Total Transmission Time"].median(),
-        "Standard Deviation Total Transmission Time": df["Total Transmission Time"].std(),
-        "Max Total Transmission Time": df["Total Transmission Time"].max(),
-        "95th Percentile Total Transmission Time": df["Total Transmission Time"].quantile(0.95),
-        "99th Percentile Total Transmission Time": df["Total Transmission Time"].quantile(0.99),
-        "Max Total Time, with first Message Removed": df["Total Transmission Time"][5:].max()
-    }
-    
-    for key, value in stats.items():
-        print(f"{key}: {value:.3f} ms")
+    """ df: the data frame of compute_stages(), trimmed to the steady state. """
+    print_statistics(df, [("Total Transmission Time", "Total Transmission Time")])
+
+def load_histograms(paths):
+    """
+    Merges the latency histograms recorded by the harness in each run into {"Response Time": histogram}.
+    They hold received - intended send time, unlike the Total Transmission Time from the actual send.
+    Runs recorded before the harness wrote histograms have none, those end the script with the list of them.
+    """
+    files = [os.path.join(path, "latency_histogram.npz") for path in paths]
+    missing = [path for path, file in zip(paths, files) if not os.path.isfile(file)]
+    if missing:
+        sys.exit(f"No latency_histogram.npz in {', '.join(os.path.basename(path) for path in missing)}, "
+                 "analyze them without --histograms")
+    histogram = LatencyHistogram()
+    for file in files:
+        histogram.merge(LatencyHistogram.load(file))
+    return {"Response Time": histogram}
     
 def plot_normal_histogram(df, bins=100):
     plt.figure(figsize=(10, 6))
@@ -244,7 +190,7 @@ def plot_single_stacked_bar(df):
 # Plot delay trend (Line Graph)
 def plot_delay_trend(df, column="Total Transmission Time"):
     plt.figure(figsize=(12, 6))
-    plt.plot(np.array(df["ID"]), np.array(df[column]), linestyle="-", marker=".", alpha=0.5)
+    plt.plot(*decimate(df["ID"].to_numpy(), df[column].to_numpy(), mode=args.decimation), linestyle="-", marker=".", alpha=0.5)
     plt.xlabel("Message ID (Ordered by Time)")
     plt.ylabel("Delay (ms)")
     plt.title(f"Trend of {column} Over Time")
@@ -256,7 +202,7 @@ def plot_smoothed_trend(df, column="Total Transmission Time", window_size=1000):
     smoothed_values = df[column].rolling(window=window_size).mean().to_numpy()
 
     plt.figure(figsize=(12, 6))
-    plt.plot(df["ID"].to_numpy(), smoothed_values, linestyle="-", color="red", alpha=0.8, label="Smoothed Trend")
+    plt.plot(*decimate(df["ID"].to_numpy(), smoothed_values, mode=args.decimation), linestyle="-", color="red", alpha=0.8, label="Smoothed Trend")
     
     plt.xlabel("Message ID (Ordered by Time)")
     plt.ylabel("Delay (ms)")
@@ -266,15 +212,22 @@ def plot_smoothed_trend(df, column="Total Transmission Time", window_size=1000):
     plt.show()
 
 # ---- Run Functions ----
-if not run.startswith("rosbridge"):
-    #compute_statistics_ros2api(df) 
-    plot_normal_histogram(df)
-    plot_single_stacked_bar(df)     
-    plot_average_bar_chart(df)
-    plot_delay_trend(df) # Possible with rosbridge data
-    plot_smoothed_trend(df)
+if args.histograms:
+    # Constant memory, the raw rows of the runs aren't loaded at all
+    print_statistics(load_histograms(run_paths), [("Response Time (from the intended send time)", "Response Time")])
 else:
-    compute_statistics_rosbridge(df)
-    plot_normal_histogram(df)
-    plot_delay_trend(df)
-    plot_smoothed_trend(df)
+    df = compute_stages(load_runs(run_paths))
+    if not args.no_trim:
+        df = trim_runs(df)
+    if not run.startswith("rosbridge"):
+        #compute_statistics_ros2api(df) 
+        plot_normal_histogram(df)
+        plot_single_stacked_bar(df)     
+        plot_average_bar_chart(df)
+        plot_delay_trend(df) # Possible with rosbridge data
+        plot_smoothed_trend(df)
+    else:
+        compute_statistics_rosbridge(df)
+        plot_normal_histogram(df)
+        plot_delay_trend(df)
+        plot_smoothed_trend(df)
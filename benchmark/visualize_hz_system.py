@@ -1,106 +1,143 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import argparse
+from decimation import MODES, decimate
+from jitter import QUANTILES, analyze_runs, find_runs, load_arrivals
 
 
 def parse_arguments():
-    parser = argparse.ArgumentParser(description='Visualize benchmark data')
-    parser.add_argument('--run', type=str, default="uds_big_1", 
-                       help='Run identifier (e.g., "uds_big_1", "rosbridge")')
+    parser = argparse.ArgumentParser(description='Visualize the timing fidelity of fixed-rate runs')
+    parser.add_argument('--run', type=str, default="system_100",
+                       help='Run identifier, all repetitions of it (e.g., "system_100") or a single one ("system_100_1")')
+    parser.add_argument('--hz', type=float, default=None,
+                       help='Nominal send rate, by default the constant rate of scenario.json or the number in the run name')
+    parser.add_argument('--decimation', type=str, default="minmax", choices=MODES,
+                       help='How the difference plot reduces the messages to the pixels: min and max per pixel column or LTTB')
     return parser.parse_args()
 
 # Get arguments
 args = parse_arguments()
 run = args.run
 print(f"Processing benchmark data for run: {run}")
-base_path = f'benchmark/data/{run}'
-df = pd.read_csv(f'{base_path}_1/message_arrival_times.csv')
-df_2 = pd.read_csv(f'{base_path}_2/message_arrival_times.csv')
-df_3 = pd.read_csv(f'{base_path}_3/message_arrival_times.csv')
+paths = find_runs(f'benchmark/data/{run}')
+runs, pooled, period_ns = analyze_runs(paths, 1e9 / args.hz if args.hz else None)
+hz_time = period_ns / 1e6
+first_run = next(iter(runs))
 
-def plot_messages_per_second(df):
-    # Convert nanoseconds to seconds
-    df['time_seconds'] = np.floor((df['TimeArrival_ns'] - df['TimeArrival_ns'][0]) / 1e9).astype(int)
-
-    # Count occurrences of each second
-    message_counts = df['time_seconds'].value_counts().sort_index()
-
-    # Convert index to numpy array
-    time_seconds = message_counts.index.to_numpy()
-    message_counts_values = message_counts.values
+def plot_messages_per_second(arrivals_ns):
+    # Count the messages of each second since the first one
+    message_counts = np.bincount((arrivals_ns - arrivals_ns[0]) // 1_000_000_000)
 
     # Plot the results
     plt.figure(figsize=(10, 6))
-    plt.plot(time_seconds, message_counts_values, marker='o')
+    plt.plot(np.arange(len(message_counts)), message_counts, marker='o')
     plt.xlabel('Time (seconds)')
     plt.ylabel('Number of Messages')
     plt.title('Messages per Second')
     plt.grid(True)
     plt.show()
-    
-def calculate_time_differences(df):
-    df['difference'] = df['TimeArrival_ns'].diff()
-    return df
-
-
-df = calculate_time_differences(df)
-df["difference_ms"] = df["difference"].to_numpy() / 1e6
-
-df_2 = calculate_time_differences(df_2)
-df_2["difference_ms"] = df_2["difference"].to_numpy() / 1e6
-
-df_3 = calculate_time_differences(df_3)
-df_3["difference_ms"] = df_3["difference"].to_numpy() / 1e6
 
 
-def line_chart_differences(df):
-    df = df.dropna()
-    df = df.iloc[::1000, :]
+def line_chart_differences(deviations_ns):
     plt.figure(figsize=(10, 6))
-    plt.plot(df['difference_ms'])
+    plt.plot(*decimate(np.arange(1, len(deviations_ns) + 1), (deviations_ns + period_ns) / 1e6, mode=args.decimation))
     plt.xlabel('Index')
     plt.ylabel('Time Difference (ms)')
     plt.title('Time Differences Between Messages')
     plt.grid(True)
     plt.show()
 
-def plot_normal_histogram(df, bins=1000):
-    plt.figure(figsize=(10, 6))    
-    plt.hist(df["difference_ms"], bins=bins, alpha=0.7)
+def plot_normal_histogram(deviations_ns, bins=1000):
+    plt.figure(figsize=(10, 6))
+    plt.hist((deviations_ns + period_ns) / 1e6, bins=bins, alpha=0.7)
     csfont = {'fontname':'Times New Roman', 'fontsize': 14}
 
     plt.xlabel("Delay (ms)", **csfont)
     plt.ylabel("Frequency", **csfont)
     plt.grid(axis="y", linestyle="--", alpha=0.6)
-    plt.show()    
-
-hz_time = 1 / (int(run.split("_")[-1])) * 1000
-    
-def print_stats(df):
-    print("Mean %: ", round(abs(df["difference_ms"].mean() - hz_time)*100 / hz_time, 3), "%") 
-    print("Mean: ", round(df["difference_ms"].mean(), 3), "ms")
-    print("Median: ", round(abs(df["difference_ms"].median() - hz_time)*100 / hz_time, 3), "%")
-    print("Median: ", round(df["difference_ms"].median(), 3), "ms")
-    print("Max: ", round(abs(df["difference_ms"].max() - hz_time)*100 / hz_time, 3), "%")
-    print("Max: ", round(df["difference_ms"].max(), 3), "ms")
-    print("Min: ", round(abs(df["difference_ms"].min() - hz_time)*100 / hz_time, 3), "%")
-    print("Min: ", round(df["difference_ms"].min(), 3), "ms")
-    print("99th percentile %: ", round(abs(df["difference_ms"].quantile(0.99) - hz_time)*100 / hz_time, 3), "%")
-    print("99th percentile: ", round(df["difference_ms"].quantile(0.99), 3), "ms")
-    print("99.9th percentile %: ", round(abs(df["difference_ms"].quantile(0.9999) - hz_time)*100 / hz_time, 3), "%")
-    print("99.9th percentile: ", round(df["difference_ms"].quantile(0.9999), 3), "ms")
-    
-    print("Standard Deviation: ", round(df["difference_ms"].std(), 3), "ms")
-    print("Arrived Messages: ", df.shape[0])
-    print("Total Time: ", round((df["TimeArrival_ns"].iloc[-1] - df["TimeArrival_ns"].iloc[0]) / 1e9, 3), "s")
+    plt.show()
+
+
+def plot_allan_deviation(runs, pooled):
+    # White timer noise falls with 1/tau, a floor or rise at long tau is flicker or drift of the rate
+    plt.figure(figsize=(10, 6))
+    for name, result in runs.items():
+        plt.loglog(*result["allan"], marker=".", alpha=0.6, label=name)
+    plt.loglog(*pooled["allan"], marker="o", color="black", label="All repetitions")
+    plt.xlabel("Tau (s)")
+    plt.ylabel("Allan Deviation of the Rate")
+    plt.title("Allan Deviation")
+    plt.legend()
+    plt.grid(True, which="both", linestyle="--", alpha=0.6)
+    plt.show()
+
+
+def plot_spectrum(runs, pooled):
+    # Peaks are periodic disturbances beating against the send rate, e.g. timer ticks or garbage collection
+    plt.figure(figsize=(10, 6))
+    frequencies, power = pooled["spectrum"]
+    plt.semilogy(frequencies[1:], power[1:], color="black", label="All repetitions")
+    for frequency, ratio in pooled["peaks"]:
+        plt.axvline(frequency, color="red", linestyle="--", alpha=0.4)
+        plt.annotate(f"{frequency:.2f} Hz", (frequency, power[np.searchsorted(frequencies, frequency)]), fontsize=8)
+    plt.xlabel("Frequency (Hz)")
+    plt.ylabel("Power of the Interval Deviation (ns²/Hz)")
+    plt.title(f"Periodicity Spectrum ({len(runs)} repetitions)")
+    plt.legend()
+    plt.grid(True, which="both", linestyle="--", alpha=0.6)
+    plt.show()
+
+
+def plot_drift(runs):
+    plt.figure(figsize=(10, 6))
+    for name, result in runs.items():
+        plt.plot(result["windows"]["Time"].to_numpy(), result["windows"]["Rate"].to_numpy(), marker=".", label=name)
+    plt.axhline(1e9 / period_ns, color="black", linestyle="--", label="Nominal")
+    plt.xlabel("Time (seconds)")
+    plt.ylabel("Rate (Hz)")
+    plt.title("Rate over Time")
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def relative(value_ms):
+    return round(abs(value_ms) * 100 / hz_time, 3)
+
+
+def print_stats(name, result):
+    # Deviations from the nominal period, the interval itself is hz_time + deviation
+    statistics = result["statistics"]
+    print(f"{name} (nominal period {hz_time:.3f} ms)")
+    print("Mean %: ", relative(statistics["Mean"]), "%")
+    print("Mean: ", round(hz_time + statistics["Mean"], 3), "ms")
+    for label in QUANTILES:
+        print(f"{label} %: ", relative(statistics[label]), "%")
+        print(f"{label}: ", round(hz_time + statistics[label], 3), "ms")
+    print("Max %: ", relative(statistics["Max"]), "%")
+    print("Max: ", round(hz_time + statistics["Max"], 3), "ms")
+    print("Min %: ", relative(statistics["Min"]), "%")
+    print("Min: ", round(hz_time + statistics["Min"], 3), "ms")
+    print("Standard Deviation: ", round(statistics["Standard Deviation"], 3), "ms")
+    print("Rate Offset: ", round(result["offset_ppm"], 1), "ppm")
+    print("Rate Drift: ", round(result["drift_ppm_per_minute"], 2), "ppm/min")
+    taus, deviations = result["allan"]
+    if len(taus):
+        print("Allan Deviation: ", ", ".join(f"{deviation:.2e} at {tau:g} s" for tau, deviation in list(zip(taus, deviations))[::3]))
+    print("Spectrum Peaks: ", ", ".join(f"{frequency:.2f} Hz (x{ratio:.0f})" for frequency, ratio in result["peaks"]))
+    print("Arrived Messages: ", result["messages"])
+    print("Total Time: ", round(result["duration_s"], 3), "s")
     print("\n")
-    
-print_stats(df)    
-print_stats(df_2)
-print_stats(df_3)
-concatenated_df = pd.concat([df, df_2, df_3])
-print_stats(concatenated_df)
-
-plot_messages_per_second(df)
-plot_normal_histogram(df)
+
+for name, result in runs.items():
+    print_stats(name, result)
+if len(runs) > 1:
+    print_stats("All repetitions", pooled)
+
+first_arrivals = load_arrivals(paths[0])
+plot_messages_per_second(first_arrivals)
+plot_normal_histogram(runs[first_run]["deviations_ns"])
+line_chart_differences(runs[first_run]["deviations_ns"])
+plot_allan_deviation(runs, pooled)
+plot_spectrum(runs, pooled)
+plot_drift(runs)
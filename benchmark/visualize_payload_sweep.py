@@ -0,0 +1,70 @@
+import matplotlib.pyplot as plt
+import argparse
+from data_loader import load_table
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Visualize payload size sweeps')
+    parser.add_argument('--run', type=str, nargs='+', default=["tcp_payload_sweep_1", "uds_payload_sweep_1"],
+                       help='Sweep directories, one curve each (e.g., "tcp_payload_sweep_1")')
+    parser.add_argument('--save', action='store_true',
+                       help='Save plots to PNG files instead of displaying')
+    return parser.parse_args()
+
+args = parse_arguments()
+sweeps = {run: load_table(f'benchmark/data/{run}', 'sweep').sort_values("Encoded Size") for run in args.run}
+csfont = {'fontname':'Times New Roman', 'fontsize': 14}
+
+def finish_plot(filename):
+    if args.save:
+        plt.savefig(f"benchmark/data/{args.run[0]}/{filename}", dpi=300)
+    else:
+        plt.show()
+
+def plot_latency_vs_size(sweeps):
+    plt.figure(figsize=(10, 6))
+    for run, df in sweeps.items():
+        line, = plt.plot(df["Encoded Size"].to_numpy(), df["Median Latency"].to_numpy(), marker="o", label=f"{run} median")
+        plt.plot(df["Encoded Size"].to_numpy(), df["P99 Latency"].to_numpy(), marker="x", linestyle="--", color=line.get_color(), label=f"{run} p99")
+    plt.xscale("log")
+    plt.xlabel("Encoded Size (bytes)", **csfont)
+    plt.ylabel("Delay (ms)", **csfont)
+    plt.title("Latency vs Payload Size", **csfont)
+    plt.legend()
+    plt.grid(True, linestyle="--", alpha=0.6)
+    finish_plot("latency_vs_size.png")
+
+def plot_throughput_vs_size(sweeps):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax_bytes = ax.twinx()
+    for run, df in sweeps.items():
+        line, = ax.plot(df["Encoded Size"].to_numpy(), df["Throughput"].to_numpy(), marker="o", label=f"{run} sustained msg/s")
+        ax_bytes.plot(df["Encoded Size"].to_numpy(), (df["Throughput"] * df["Encoded Size"] / 1_000_000).to_numpy(),
+                      marker="x", linestyle="--", color=line.get_color(), label=f"{run} MB/s")
+    ax.set_xscale("log")
+    ax.set_xlabel("Encoded Size (bytes)", **csfont)
+    ax.set_ylabel("Messages per Second", **csfont)
+    ax_bytes.set_ylabel("MB per Second", **csfont)
+    ax.set_title("Throughput vs Payload Size", **csfont)
+    fig.legend(loc="upper left")
+    ax.grid(True, linestyle="--", alpha=0.6)
+    finish_plot("throughput_vs_size.png")
+
+def plot_stages_vs_size(sweeps):
+    stages = ["Serialize Py", "Deserialize Py", "Deserialize ROS", "Serialize ROS"]
+    fig, axes = plt.subplots(1, len(stages), figsize=(16, 4), sharey=True)
+    for ax, stage in zip(axes, stages):
+        for run, df in sweeps.items():
+            ax.plot(df["Encoded Size"].to_numpy(), df[stage].to_numpy(), marker="o", label=run)
+        ax.set_xscale("log")
+        ax.set_xlabel("Encoded Size (bytes)")
+        ax.set_title(f"Median {stage}")
+        ax.grid(True, linestyle="--", alpha=0.6)
+    axes[0].set_ylabel("Time (ms)")
+    axes[0].legend()
+    plt.tight_layout()
+    finish_plot("stages_vs_size.png")
+
+plot_latency_vs_size(sweeps)
+plot_throughput_vs_size(sweeps)
+plot_stages_vs_size(sweeps)
@@ -0,0 +1,55 @@
+import asyncio
+from pacing import async_paced_schedule
+from clock_sync import now_ns
+from rate_profiles import make_rate
+from client import prepare_client, message_id_reader, finish_client, warmup_count, WARMUP_DRAIN_S
+
+
+async def send_messages(sdk, matcher, payload, scenario, id_num_start, id_step, count, record=True, stream=()):
+    """ Sends ids id_num_start, id_num_start + id_step, ... paced by the event loop's timer, unrecorded for the warm-up. """
+    async for index, intended_time in async_paced_schedule(count, make_rate(scenario["rate"], stream)):
+        id_num = id_num_start + index * id_step
+        message = payload.message(id_num)
+        if record:
+            matcher.mark_sent(id_num, intended_time, now_ns())
+        payload.send(sdk, message)
+
+
+async def receive_messages(arrivals, matcher, message_id):
+    """ Records the states bridged into the queue, at the time the event loop gets to them. """
+    while True:
+        msg = await arrivals.get()
+        current_time = now_ns()
+        matcher.on_arrival(message_id(msg), current_time)
+
+
+async def run_client_main(transport, scenario, client_dir, first_id, result_format):
+    sdk, payload, matcher = prepare_client(transport, scenario, client_dir, first_id)
+    warmup = warmup_count(scenario)
+    message_id = message_id_reader(payload, warmup)
+    loop = asyncio.get_running_loop()
+    arrivals = asyncio.Queue()
+
+    # The state stream calls back on the SDK's thread, hand the states over to the event loop
+    subscription = sdk.get_state_stream().subscribe(lambda msg: loop.call_soon_threadsafe(arrivals.put_nowait, msg))
+    receiver = asyncio.create_task(receive_messages(arrivals, matcher, message_id))
+    if warmup:
+        await send_messages(sdk, matcher, payload, scenario, -warmup, 1, warmup, record=False, stream=(first_id, 0))
+        await asyncio.sleep(WARMUP_DRAIN_S)
+    senders = matcher.streams
+    count = matcher.recorder.capacity // senders
+    await asyncio.gather(*(
+        send_messages(sdk, matcher, payload, scenario, first_id + t, senders, count, stream=(first_id, t + 1)) for t in range(senders)
+    ))
+
+    await asyncio.sleep(scenario["drain"])  # Wait for messages to arrive
+    receiver.cancel()
+    finish_client(sdk, subscription, matcher, scenario, client_dir, result_format)
+
+
+def run_client_async(transport, scenario, client_dir, first_id=0, result_format="npy"):
+    """
+    Same as client.run_client(), but sends and receives on an asyncio event loop like our production clients.
+    scenario["threads"] becomes the number of sender tasks, Received Time is when the loop handled the state.
+    """
+    asyncio.run(run_client_main(transport, scenario, client_dir, first_id, result_format))
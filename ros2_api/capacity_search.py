@@ -0,0 +1,153 @@
+import argparse
+import json
+import math
+import os
+import time
+import numpy as np
+from matching import NOT_RECEIVED, LATE
+from payloads import PAYLOADS
+from results_io import write_columns, RESULT_FORMATS
+from scenarios import TRANSPORTS
+from client import prepare_client, message_id_reader, finish_client, send_messages
+from run_benchmark import next_run_dir
+from clock_sync import now_ns, measure_offset, write_clock_sync
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Search the maximum sustainable message rate')
+    parser.add_argument('--transport', type=str, default="uds", choices=list(TRANSPORTS),
+                       help='Transport to search the rate limit of')
+    parser.add_argument('--payload', type=str, default="minimal_trajectory", choices=[name for name, payload in PAYLOADS.items() if payload.carries_id],
+                       help='Payload profile, it has to carry the id')
+    parser.add_argument('--start-hz', type=float, default=1000,
+                       help='First rate to try')
+    parser.add_argument('--max-hz', type=float, default=50_000,
+                       help='Highest rate to try')
+    parser.add_argument('--settle', type=float, default=2,
+                       help='Seconds at a new rate before measuring')
+    parser.add_argument('--window', type=float, default=10,
+                       help='Seconds of steady state measured per rate')
+    parser.add_argument('--drain', type=float, default=2,
+                       help='Seconds without arrivals after which the ids still missing of a rate count as lost')
+    parser.add_argument('--max-loss', type=float, default=0.001,
+                       help='SLO: highest fraction of lost messages')
+    parser.add_argument('--max-p99-ms', type=float, default=10,
+                       help='SLO: highest 99th percentile latency from the intended send time')
+    parser.add_argument('--resolution', type=float, default=0.02,
+                       help='Stop bisecting once the bracket is narrower than this fraction of the rate')
+    parser.add_argument('--max-steps', type=int, default=20,
+                       help='Highest number of rates to try')
+    parser.add_argument('--format', type=str, default="npy", choices=RESULT_FORMATS,
+                       help='Result format, binary columns or CSV')
+    return parser.parse_args()
+
+
+def wilson_interval(failures, trials, z=1.96):
+    """ 95% Wilson score interval of a failure ratio. """
+    if trials == 0:
+        return 0.0, 1.0
+    ratio = failures / trials
+    center = (ratio + z * z / (2 * trials)) / (1 + z * z / trials)
+    margin = z * math.sqrt(ratio * (1 - ratio) / trials + z * z / (4 * trials * trials)) / (1 + z * z / trials)
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def wait_for_drain(recorder, first_index, end_index, quiet_s, poll_s=0.01):
+    """
+    Waits until every id of a step arrived or none arrived for quiet_s seconds.
+    Above the limit the bridge is still working off a backlog when sending ends, a fixed wait would let it spill into the next rate.
+    """
+    missing = np.count_nonzero(recorder.status[first_index:end_index] == NOT_RECEIVED)
+    last_arrival = time.perf_counter()
+    while missing and time.perf_counter() - last_arrival < quiet_s:
+        time.sleep(poll_s)
+        still_missing = np.count_nonzero(recorder.status[first_index:end_index] == NOT_RECEIVED)
+        if still_missing < missing:
+            missing, last_arrival = still_missing, time.perf_counter()
+
+
+def evaluate_step(recorder, first_index, end_index, hz, args):
+    """ Loss, p99 latency and achieved send rate of the measured ids of one rate. """
+    status = recorder.status[first_index:end_index]
+    sent_times = recorder.sent_times[first_index:end_index]
+    received = status != NOT_RECEIVED
+    latency_ms = (recorder.received_times[first_index:end_index][received] - recorder.intended_times[first_index:end_index][received]) / 1_000_000
+    sent = len(status)
+    lost = int(np.count_nonzero(~received))
+    p99_ms = float(np.percentile(latency_ms, 99)) if len(latency_ms) else math.inf
+    achieved_hz = (sent - 1) / ((sent_times[-1] - sent_times[0]) / 1_000_000_000) if sent > 1 else 0.0
+    passed = lost / sent <= args.max_loss and p99_ms <= args.max_p99_ms
+    return {
+        "Rate": hz, "Achieved Rate": achieved_hz, "Sent": sent, "Lost": lost,
+        "Late": int(np.count_nonzero(status == LATE)), "P99 Latency": p99_ms, "Passed": int(passed),
+    }
+
+
+def main():
+    args = parse_arguments()
+    run_dir = next_run_dir(args.transport, "search")
+    ids_per_step = int(args.max_hz * (args.settle + args.window)) + 1
+    # The recorder spans every step, np.zeros only commits the ids that are actually sent
+    scenario = {"payload": {"profile": args.payload}, "messages": ids_per_step * args.max_steps, "drain": 0}
+    sdk, payload, matcher = prepare_client(args.transport, scenario, run_dir)
+    message_id = message_id_reader(payload)
+
+    def on_message_arrival(msg):
+        current_time = now_ns()
+        matcher.on_arrival(message_id(msg), current_time)
+
+    subscription = sdk.get_state_stream().subscribe(on_message_arrival)
+    clock_start = measure_offset()
+
+    steps = []
+    lower, upper = None, None  # Highest passing and lowest failing rate so far
+    hz = args.start_hz
+    for step in range(args.max_steps):
+        first_id = step * ids_per_step
+        settle_count = int(hz * args.settle)
+        count = settle_count + int(hz * args.window)
+        send_messages(sdk, matcher, payload, {"rate": {"profile": "constant", "hz": hz}}, first_id, 1, count)
+        wait_for_drain(matcher.recorder, first_id, first_id + count, args.drain)
+
+        result = evaluate_step(matcher.recorder, first_id + settle_count, first_id + count, hz, args)
+        steps.append(result)
+        print(f"{hz:.1f} Hz: achieved {result['Achieved Rate']:.0f} Hz, loss {result['Lost'] / result['Sent']:.4%}, "
+              f"p99 {result['P99 Latency']:.3f} ms -> {'pass' if result['Passed'] else 'fail'}")
+        if result["Passed"]:
+            lower = hz
+        else:
+            upper = hz
+
+        # Double until the first failure, then bisect the bracket
+        if upper is None:
+            if hz >= args.max_hz:
+                break
+            hz = min(hz * 2, args.max_hz)
+        elif lower is None:
+            hz = hz / 2
+        elif (upper - lower) / lower <= args.resolution:
+            break
+        else:
+            hz = (lower + upper) / 2
+
+    write_clock_sync(os.path.join(run_dir, "clock_sync.json"), clock_start, measure_offset())
+    finish_client(sdk, subscription, matcher, scenario, run_dir, args.format)
+    write_columns(os.path.join(run_dir, "search_steps"), {key: [step[key] for step in steps] for key in steps[0]}, args.format)
+
+    summary = {"transport": args.transport, "payload": args.payload, "max_loss": args.max_loss,
+               "max_p99_ms": args.max_p99_ms, "sustainable_hz": lower, "failing_hz": upper}
+    if lower is None:
+        print(f"Not even {args.start_hz:.0f} Hz is sustainable")
+    else:
+        at_lower = next(step for step in reversed(steps) if step["Rate"] == lower)
+        loss_low, loss_high = wilson_interval(at_lower["Lost"], at_lower["Sent"])
+        summary["loss_interval"] = [loss_low, loss_high]
+        bound = f"below {upper:.1f} Hz" if upper is not None else f"the --max-hz limit of the search"
+        print(f"Maximum sustainable rate: {lower:.1f} Hz, the limit lies {bound}; "
+              f"loss at {lower:.1f} Hz within [{loss_low:.4%}, {loss_high:.4%}] (95% Wilson)")
+    with open(os.path.join(run_dir, "search.json"), 'w') as search_file:
+        json.dump(summary, search_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
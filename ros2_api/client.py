@@ -0,0 +1,124 @@
+import itertools
+import os
+import threading
+import time
+from ros2_sdk.ros2_sdk import ROS2SDK
+from pacing import paced_schedule
+from clock_sync import now_ns
+from matching import SequenceMatcher, LATE
+from recorder import RunRecorder, parse_id
+from latency_histogram import LatencyHistogram
+from results_io import write_columns
+from payloads import make_payload
+from scenarios import TRANSPORTS, message_count
+from rate_profiles import make_rate
+
+WARMUP_DRAIN_S = 1  # Seconds for the warm-up messages to arrive before the measured phase starts
+CONNECTION_TEST_TIMEOUT_S = 10  # Seconds for the state of the connection test to arrive
+
+
+def prepare_client(transport, scenario, client_dir, first_id=0):
+    """ Connects an SDK client for the ids first_id.. and returns (sdk, payload, matcher). """
+    os.chdir(client_dir)  # The SDK writes its timing CSVs into the working directory
+    threads = scenario.get("threads", 1)
+    count = message_count(scenario) * threads
+    payload = make_payload(scenario["payload"])
+    matcher = SequenceMatcher(RunRecorder(count, first_id), threads, LatencyHistogram())
+
+    sdk = ROS2SDK()
+    sdk.connect(*TRANSPORTS[transport])
+    # The state of the connection test must be gone before the caller subscribes, or it would be read as the first message
+    test_arrived = threading.Event()
+    test_subscription = sdk.get_state_stream().subscribe(lambda msg: test_arrived.set())
+    sdk.send_effort([0, 0, 0, 0, 0, 0], "test")
+    if not test_arrived.wait(CONNECTION_TEST_TIMEOUT_S):
+        raise RuntimeError(f"No state arrived within {CONNECTION_TEST_TIMEOUT_S} s of the connection test")
+    test_subscription.dispose()
+    return sdk, payload, matcher
+
+
+def warmup_count(scenario):
+    """ Messages of the warm-up phase, scenario["warmup"] seconds at the start of the scenario's rate. """
+    return make_rate(scenario["rate"]).messages(scenario.get("warmup", 0))
+
+
+def message_id_reader(payload, warmup=0):
+    """ Returns the function that reads the id of an arrived state. """
+    if payload.carries_id:
+        return lambda msg: parse_id(msg["names"][0])
+    # Velocity commands carry no id, the states are matched in order: first the warm-up, then the run.
+    # prepare_client() waited for the state of the connection test, so it can't shift them
+    print("The payload carries no id, states are matched in arrival order: a lost state shifts every later match "
+          "and only shows as the last ids missing")
+    arrival_order = itertools.count(-warmup)
+    return lambda msg: next(arrival_order)
+
+
+def finish_client(sdk, subscription, matcher, scenario, client_dir, result_format="npy"):
+    """ Writes the SDK timing and the results of a client once its messages drained. """
+    if scenario.get("sdk_timing", True):
+        sdk.write_time_data_to_csv()
+    subscription.dispose()
+
+    write_columns(os.path.join(client_dir, "arrived_messages"), matcher.arrived(), result_format)
+    lost = matcher.lost()
+    write_columns(os.path.join(client_dir, "invalid_ids_never_arrived"), lost, result_format)
+    if len(lost["ID"]) and not make_payload(scenario["payload"]).carries_id:
+        print(f"WARNING {client_dir}: {len(lost['ID'])} states missing, but the payload carries no id. Which messages were lost "
+              f"is unknown and the latencies after the first loss belong to other messages, use a payload with ids")
+    write_columns(os.path.join(client_dir, "invalid_ids_arrived_too_late"), matcher.arrived(LATE), result_format)
+    histogram = matcher.histogram
+    histogram.save(os.path.join(client_dir, "latency_histogram.npz"))
+    print(f"{client_dir}: {matcher.sent_count()} sent, {matcher.duplicates} duplicates, {matcher.unknown} unknown ids, "
+          f"{matcher.warmup} warm-up arrivals excluded")
+    if histogram.total:
+        print(f"Response time (from the intended send time) p50 {histogram.value_at_quantile(0.5) / 1_000_000:.3f} ms, p99 {histogram.value_at_quantile(0.99) / 1_000_000:.3f} ms, "
+              f"p99.9 {histogram.value_at_quantile(0.999) / 1_000_000:.3f} ms, max {histogram.max_ns / 1_000_000:.3f} ms")
+
+
+def send_messages(sdk, matcher, payload, scenario, id_num_start, id_step, count, record=True, stream=()):
+    """
+    Sends ids id_num_start, id_num_start + id_step, ... paced by the scenario rate.
+    Without record the sends aren't recorded, for the warm-up phase.
+    `stream` tells the senders apart for random rate profiles, see rate_profiles.make_rate().
+    """
+    for index, intended_time in paced_schedule(count, make_rate(scenario["rate"], stream)):
+        id_num = id_num_start + index * id_step
+        message = payload.message(id_num)
+        if record:
+            matcher.mark_sent(id_num, intended_time, now_ns())
+        payload.send(sdk, message)
+
+
+def run_client(transport, scenario, client_dir, first_id=0, result_format="npy"):
+    """
+    Runs one SDK client with scenario["threads"] sender threads and writes its results into client_dir.
+    The client uses the ids first_id.. and the threads interleave them, so ids stay ordered by send time.
+    """
+    sdk, payload, matcher = prepare_client(transport, scenario, client_dir, first_id)
+    warmup = warmup_count(scenario)
+    message_id = message_id_reader(payload, warmup)
+
+    def on_message_arrival(msg):
+        current_time = now_ns()
+        matcher.on_arrival(message_id(msg), current_time)
+
+    subscription = sdk.get_state_stream().subscribe(on_message_arrival)
+    if warmup:
+        # Connection setup, caches and socket buffers settle on negative ids, the matcher excludes them
+        send_messages(sdk, matcher, payload, scenario, -warmup, 1, warmup, record=False, stream=(first_id, 0))
+        time.sleep(WARMUP_DRAIN_S)
+    threads = matcher.streams
+    count = matcher.recorder.capacity // threads
+    senders = [
+        threading.Thread(target=send_messages, args=(sdk, matcher, payload, scenario, first_id + t, threads, count),
+                         kwargs={"stream": (first_id, t + 1)})
+        for t in range(threads)
+    ]
+    for sender in senders:
+        sender.start()
+    for sender in senders:
+        sender.join()
+
+    time.sleep(scenario["drain"])  # Wait for messages to arrive
+    finish_client(sdk, subscription, matcher, scenario, client_dir, result_format)
@@ -0,0 +1,35 @@
+import json
+import time
+
+# The harness timestamps everything with CLOCK_MONOTONIC, it is shared by all processes of the host
+# and never stepped or slewed by NTP. The SDK's and the ROS node's timing CSVs stay on the realtime clock.
+now_ns = time.monotonic_ns
+
+OFFSET_SAMPLES = 1000
+
+
+def measure_offset(samples=OFFSET_SAMPLES):
+    """
+    Ping-pong between the two clocks: reads realtime between two monotonic reads and keeps the
+    tightest pair, like NTP keeps the exchange with the shortest round trip.
+    Returns {"monotonic_ns", "realtime_ns", "offset_ns" (realtime - monotonic), "uncertainty_ns"}.
+    """
+    best = None
+    for _ in range(samples):
+        before_ns = time.monotonic_ns()
+        realtime_ns = time.time_ns()
+        after_ns = time.monotonic_ns()
+        if best is None or after_ns - before_ns < best[2] - best[0]:
+            best = (before_ns, realtime_ns, after_ns)
+    before_ns, realtime_ns, after_ns = best
+    monotonic_ns = (before_ns + after_ns) // 2
+    return {"monotonic_ns": monotonic_ns, "realtime_ns": realtime_ns,
+            "offset_ns": realtime_ns - monotonic_ns, "uncertainty_ns": (after_ns - before_ns) // 2}
+
+
+def write_clock_sync(path, start, end):
+    """ Writes the offsets measured at the start and end of a run and the drift between them. """
+    elapsed_ns = end["monotonic_ns"] - start["monotonic_ns"]
+    drift_ppm = (end["offset_ns"] - start["offset_ns"]) / elapsed_ns * 1_000_000 if elapsed_ns else 0.0
+    with open(path, 'w') as sync_file:
+        json.dump({"clock": "monotonic", "start": start, "end": end, "drift_ppm": drift_ppm}, sync_file, indent=2)
@@ -0,0 +1,125 @@
+import math
+import numpy as np
+
+SIGNIFICANT_DIGITS = 3
+HIGHEST_NS = 3_600_000_000_000  # One hour, larger values are counted in the top bucket
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond latencies in constant memory.
+    Values below 2^sub_bucket_bits get a bucket each, above that every power of two is split into
+    2^(sub_bucket_bits - 1) linear buckets, so any quantile is exact to significant_digits digits.
+    Histograms with the same precision merge by adding their counts, across runs and processes.
+    """
+
+    def __init__(self, significant_digits=SIGNIFICANT_DIGITS, highest_ns=HIGHEST_NS):
+        self.significant_digits = significant_digits
+        self.highest_ns = highest_ns
+        # The buckets of a power of two are 1 / 2^(sub_bucket_bits - 1) of its lowest value wide
+        self.sub_bucket_bits = math.ceil(math.log2(10 ** significant_digits)) + 1
+        self.counts = np.zeros(self.bucket_index(highest_ns) + 1, dtype=np.int64)
+        self.total = 0
+        self.sum_ns = 0
+        self.sum_squares = 0.0
+        self.min_ns = None
+        self.max_ns = None
+
+    def bucket_index(self, value_ns):
+        """ Bucket of a non-negative integer value. """
+        shift = value_ns.bit_length() - self.sub_bucket_bits
+        if shift <= 0:
+            return value_ns
+        return (shift << (self.sub_bucket_bits - 1)) + (value_ns >> shift)
+
+    def bucket_indices(self, values_ns):
+        """ Vectorized bucket_index() for an int64 array. """
+        # frexp() gives the bit length of integers below 2^53, far above any latency
+        _, bit_lengths = np.frexp(values_ns.astype(np.float64))
+        shifts = np.maximum(bit_lengths - self.sub_bucket_bits, 0)
+        indices = np.where(shifts > 0, (shifts << (self.sub_bucket_bits - 1)) + (values_ns >> shifts), values_ns)
+        return indices.astype(np.int64)
+
+    def bucket_highest(self, index):
+        """ Highest value counted in a bucket. """
+        shift = max((index >> (self.sub_bucket_bits - 1)) - 1, 0)
+        if shift == 0:
+            return index
+        lowest = (index - (shift << (self.sub_bucket_bits - 1))) << shift
+        return lowest + (1 << shift) - 1
+
+    def record(self, value_ns):
+        """ Counts one latency, cheap enough for the arrival callback. """
+        value_ns = min(max(int(value_ns), 0), self.highest_ns)
+        self.counts[self.bucket_index(value_ns)] += 1
+        self.total += 1
+        self.sum_ns += value_ns
+        self.sum_squares += value_ns * value_ns
+        if self.min_ns is None or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if self.max_ns is None or value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def record_many(self, values_ns):
+        """ Counts an array of latencies at once. """
+        values_ns = np.clip(np.asarray(values_ns, dtype=np.int64), 0, self.highest_ns)
+        if not len(values_ns):
+            return
+        np.add.at(self.counts, self.bucket_indices(values_ns), 1)
+        self.total += len(values_ns)
+        self.sum_ns += int(values_ns.sum())
+        self.sum_squares += float(np.square(values_ns, dtype=np.float64).sum())
+        self.min_ns = int(values_ns.min()) if self.min_ns is None else min(self.min_ns, int(values_ns.min()))
+        self.max_ns = int(values_ns.max()) if self.max_ns is None else max(self.max_ns, int(values_ns.max()))
+
+    def merge(self, other):
+        """ Adds the counts of another histogram with the same precision. """
+        if (other.significant_digits, other.highest_ns) != (self.significant_digits, self.highest_ns):
+            raise ValueError("Only histograms with the same precision and range can be merged")
+        self.counts += other.counts
+        self.total += other.total
+        self.sum_ns += other.sum_ns
+        self.sum_squares += other.sum_squares
+        for value in (other.min_ns, other.max_ns):
+            if value is not None:
+                self.min_ns = value if self.min_ns is None else min(self.min_ns, value)
+                self.max_ns = value if self.max_ns is None else max(self.max_ns, value)
+        return self
+
+    def value_at_quantile(self, quantile):
+        """ Highest value of the bucket holding the quantile, clamped to the recorded min and max. """
+        if not self.total:
+            return math.nan
+        rank = max(math.ceil(quantile * self.total), 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(max(self.bucket_highest(index), self.min_ns), self.max_ns)
+
+    def mean(self):
+        return self.sum_ns / self.total if self.total else math.nan
+
+    def std(self):
+        """ Sample standard deviation, like pandas. """
+        if self.total < 2:
+            return math.nan
+        variance = (self.sum_squares - self.sum_ns * self.sum_ns / self.total) / (self.total - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def save(self, path):
+        """ Writes the non-empty buckets to `path` (.npz), a few KB whatever the number of samples. """
+        nonzero = np.flatnonzero(self.counts)
+        np.savez_compressed(path, indices=nonzero, counts=self.counts[nonzero], meta=np.array([
+            self.significant_digits, self.highest_ns, self.total, self.sum_ns,
+            -1 if self.min_ns is None else self.min_ns, -1 if self.max_ns is None else self.max_ns,
+        ], dtype=np.int64), sum_squares=np.array(self.sum_squares))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            significant_digits, highest_ns, total, sum_ns, min_ns, max_ns = data["meta"].tolist()
+            histogram = cls(significant_digits, highest_ns)
+            histogram.counts[data["indices"]] = data["counts"]
+            histogram.sum_squares = float(data["sum_squares"])
+        histogram.total, histogram.sum_ns = total, sum_ns
+        histogram.min_ns = None if min_ns < 0 else min_ns
+        histogram.max_ns = None if max_ns < 0 else max_ns
+        return histogram
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import queue
+import random
+import socket
+import struct
+import threading
+import time
+from pacing import sleep_until
+from scenarios import TRANSPORTS
+
+try:
+    import msgpack
+except ImportError:  # Optional, only needed for --codec msgpack
+    msgpack = None
+
+# Every message is a 4 byte big-endian length followed by the encoded message
+HEADER = struct.Struct("!I")
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Loopback stand-in for the ROS2 API bridge')
+    parser.add_argument('--transport', type=str, default="tcp", choices=list(TRANSPORTS),
+                       help='Transport to listen on, with the same addresses as the benchmarks')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                       help='Artificial processing latency per message')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                       help='Fraction of commands that get no state back')
+    parser.add_argument('--seed', type=int, default=0,
+                       help='Seed of the drop decisions')
+    parser.add_argument('--codec', type=str, default="json", choices=["json", "msgpack"],
+                       help='Encoding of the messages, must match the SDK')
+    parser.add_argument('--timing-dir', type=str, default=".",
+                       help='Directory for time_serialize.csv and time_deserialize.csv')
+    return parser.parse_args()
+
+
+def make_codec(name):
+    """ Returns (encode, decode) for the codec name. """
+    if name == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed, use --codec json or pip install msgpack")
+        return msgpack.packb, msgpack.unpackb
+    return (lambda message: json.dumps(message).encode()), json.loads
+
+
+def read_frame(conn):
+    """ Reads one length-prefixed frame, None once the peer closed the connection. """
+    header = conn.recv(HEADER.size, socket.MSG_WAITALL)
+    if len(header) < HEADER.size:
+        return None
+    size, = HEADER.unpack(header)
+    data = conn.recv(size, socket.MSG_WAITALL)
+    return data if len(data) == size else None
+
+
+def write_frame(conn, data):
+    conn.sendall(HEADER.pack(len(data)) + data)
+
+
+def state_from_command(command):
+    """ The joint state the robot would report after executing the command. """
+    names = command.get("joint_names") or command.get("names") or []
+    points = command.get("points") or command.get("trajPoints") or []
+    last_point = points[-1] if points else {}
+    values = command.get("values") or command.get("velocities") or []
+    return {
+        "names": names,
+        "positions": last_point.get("positions", []),
+        "velocities": last_point.get("velocities", values),
+        "effort": last_point.get("effort", []),
+    }
+
+
+def listen(transport):
+    """ Returns the listening (command, state) sockets of a transport. """
+    kind, config = TRANSPORTS[transport]
+    sockets = []
+    if kind == "TCP":
+        addresses = [(config["ip"], config["port_send"]), (config["ip"], config["port_recv"])]
+        family = socket.AF_INET
+    else:
+        addresses = [config["path_send"], config["path_recv"]]
+        family = socket.AF_UNIX
+    for address in addresses:
+        server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.remove(address)
+        else:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(address)
+        server.listen(16)
+        sockets.append(server)
+    return sockets
+
+
+class LoopbackBridge:
+    """
+    Echoes every command back as a state message, like the ROS2 API bridge with a robot behind it.
+    Like a ROS topic, every state goes to all connected clients, they ignore the ids of the others.
+    Records the same deserialize/serialize timestamps as the ROS node, so the stage breakdown works.
+    """
+
+    def __init__(self, transport, latency_ms=0.0, drop_rate=0.0, seed=0, codec="json", timing_dir="."):
+        self.transport = transport
+        self.latency_ns = int(latency_ms * 1_000_000)
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.encode, self.decode = make_codec(codec)
+        self.timing_dir = timing_dir
+        self.lock = threading.Lock()
+        self.state_conns = []
+        self.active_clients = 0
+        # Timestamps on the realtime clock like the ROS node, the analysis maps them via clock_sync.json
+        self.deserialize_times = []
+        self.serialize_times = []
+        self.received = self.dropped = 0
+        # A constant latency keeps the order, so a FIFO is enough to delay the states
+        self.outgoing = queue.Queue()
+
+    def serve_forever(self):
+        """ Serves any number of SDK clients, writing the timing files whenever the last one disconnects. """
+        command_server, state_server = listen(self.transport)
+        print(f"Loopback bridge listening on {self.transport}")
+        threading.Thread(target=self.accept_states, args=(state_server,), daemon=True).start()
+        threading.Thread(target=self.send_states, daemon=True).start()
+        while True:
+            command_conn, _ = command_server.accept()
+            with self.lock:
+                self.active_clients += 1
+            threading.Thread(target=self.receive_commands, args=(command_conn,), daemon=True).start()
+
+    def accept_states(self, state_server):
+        while True:
+            state_conn, _ = state_server.accept()
+            with self.lock:
+                self.state_conns.append(state_conn)
+
+    def receive_commands(self, command_conn):
+        with command_conn:
+            while (data := read_frame(command_conn)) is not None:
+                start_deserialize = time.time_ns()
+                command = self.decode(data)
+                end_deserialize = time.time_ns()
+                # Every client has its own thread, the counters and the drop sequence are shared between them
+                with self.lock:
+                    self.deserialize_times.append((start_deserialize, end_deserialize))
+                    self.received += 1
+                    drop = self.random.random() < self.drop_rate
+                    self.dropped += drop
+                if drop:
+                    continue
+                self.outgoing.put((time.perf_counter_ns() + self.latency_ns, state_from_command(command)))
+        self.outgoing.put(None)  # Ends the session after the states still queued
+
+    def send_states(self):
+        while True:
+            item = self.outgoing.get()
+            if item is None:
+                self.end_session()
+                continue
+            due_ns, state = item
+            sleep_until(due_ns)
+            start_serialize = time.time_ns()
+            data = self.encode(state)
+            self.serialize_times.append((start_serialize, time.time_ns()))
+            with self.lock:
+                state_conns = list(self.state_conns)
+            for state_conn in state_conns:
+                try:
+                    write_frame(state_conn, data)
+                except OSError:  # Client went away
+                    with self.lock:
+                        self.state_conns.remove(state_conn)
+                    state_conn.close()
+
+    def end_session(self):
+        """ Writes the timing files once the last client of a run disconnected. """
+        with self.lock:
+            self.active_clients -= 1
+            if self.active_clients:
+                return
+            for state_conn in self.state_conns:
+                state_conn.close()
+            self.state_conns = []
+            deserialize_times, serialize_times = self.deserialize_times, self.serialize_times
+            received, dropped = self.received, self.dropped
+            self.deserialize_times, self.serialize_times = [], []
+            self.received = self.dropped = 0
+        self.write_timing("time_deserialize.csv", deserialize_times)
+        self.write_timing("time_serialize.csv", serialize_times)
+        print(f"Session closed: {received} commands, {dropped} dropped")
+
+    def write_timing(self, filename, rows):
+        """ Writes timestamps in the format of the ROS node ("Sent Time, Received Time" = start, end). """
+        with open(os.path.join(self.timing_dir, filename), 'w') as timing_file:
+            timing_file.write("Sent Time, Received Time\n")
+            timing_file.writelines(f"{start}, {end}\n" for start, end in rows)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    bridge = LoopbackBridge(args.transport, args.latency_ms, args.drop_rate, args.seed, args.codec, args.timing_dir)
+    bridge.serve_forever()
@@ -0,0 +1,75 @@
+import numpy as np
+
+# Status of a message id, stored per id in RunRecorder.status
+NOT_RECEIVED = 0
+ON_TIME = 1  # First arrival, no higher id arrived before it
+LATE = 2  # First arrival, but a higher id of the same sender already arrived (reordered)
+DUPLICATE = 3  # Id that already arrived once, returned by on_arrival() only
+UNKNOWN = 4  # Id outside of this run, returned by on_arrival() only
+WARMUP = 5  # Negative id of the warm-up phase, returned by on_arrival() only
+
+
+class SequenceMatcher:
+    """
+    Matches arrivals to sends by sequence id in constant time per message.
+    The sender threads only write the send timestamps of their own ids and the receive callback
+    only writes the received timestamp and status of an id, so the hot path takes no locks.
+    """
+
+    def __init__(self, recorder, streams=1, histogram=None):
+        self.recorder = recorder
+        # Optional LatencyHistogram of received - intended, fed on every first arrival: the response time,
+        # which includes any stall of the sender (no coordinated omission, see pacing.py)
+        self.histogram = histogram
+        # Sender threads interleave their ids, reordering is only meaningful within one sender
+        self.streams = streams
+        self.highest_ids = [-1] * streams
+        self.duplicates = 0
+        self.unknown = 0
+        self.warmup = 0
+
+    def mark_sent(self, id_num, intended_time, sent_time):
+        """ Records the send of id_num, must be called before the message goes out. """
+        index = id_num - self.recorder.first_id
+        self.recorder.intended_times[index] = intended_time
+        self.recorder.sent_times[index] = sent_time
+
+    def on_arrival(self, id_num, received_time):
+        """ Records the arrival of id_num and returns its classification. """
+        status_column = self.recorder.status
+        if id_num is not None and id_num < 0:
+            self.warmup += 1
+            return WARMUP
+        index = None if id_num is None else id_num - self.recorder.first_id
+        if index is None or not 0 <= index < self.recorder.capacity or not self.recorder.sent_times[index]:
+            self.unknown += 1  # Not one of the ids this run sent
+            return UNKNOWN
+        if status_column[index]:
+            self.duplicates += 1
+            return DUPLICATE
+        self.recorder.received_times[index] = received_time
+        stream = index % self.streams
+        if id_num < self.highest_ids[stream]:
+            status = LATE
+        else:
+            self.highest_ids[stream] = id_num
+            status = ON_TIME
+        status_column[index] = status
+        if self.histogram is not None:
+            self.histogram.record(received_time - self.recorder.intended_times[index])
+        return status
+
+    def sent_count(self):
+        """ Number of ids sent so far. """
+        return int(np.count_nonzero(self.recorder.sent_times))
+
+    def arrived(self, status=ON_TIME):
+        """ Returns the columns of all ids with the given status. """
+        indices = np.flatnonzero(self.recorder.status == status)
+        return self.recorder.columns(indices)
+
+    def lost(self):
+        """ Returns the columns of all sent ids that never arrived. """
+        sent = self.recorder.sent_times != 0
+        indices = np.flatnonzero(sent & (self.recorder.status == NOT_RECEIVED))
+        return self.recorder.columns(indices, received=False)
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from clock_sync import now_ns
+
+# The last stretch before a deadline is busy-waited, time.sleep() alone overshoots by ~50-100 us
+SPIN_THRESHOLD_NS = 200_000
+
+
+def sleep_until(deadline_ns, spin_threshold_ns=SPIN_THRESHOLD_NS):
+    """ Sleeps until the perf_counter_ns() deadline, spinning for the last spin_threshold_ns. """
+    remaining_ns = deadline_ns - time.perf_counter_ns()
+    if remaining_ns > spin_threshold_ns:
+        time.sleep((remaining_ns - spin_threshold_ns) / 1_000_000_000)
+    while time.perf_counter_ns() < deadline_ns:
+        pass
+
+
+def paced_schedule(count, rate, stop_event=None, spin_threshold_ns=SPIN_THRESHOLD_NS):
+    """
+    Yields (index, intended_ns) for `count` sends, returning at each absolute deadline.
+    Deadlines are computed from the start of the run and never from the previous send,
+    so a slow send or an oversleep doesn't shift the following messages: the sender
+    catches up instead of silently lowering the rate (coordinated omission).
+    `rate` is a profile of rate_profiles.py, rate.interval(offset_s) gives the seconds to the next send.
+    intended_ns is on the harness clock (clock_sync.now_ns), like the other recorded timestamps.
+    """
+    start_ns = time.perf_counter_ns()
+    start_clock_ns = now_ns()
+    offset_s = 0.0
+    for index in range(count):
+        if stop_event is not None and stop_event.is_set():
+            return
+        offset_ns = int(offset_s * 1_000_000_000)
+        sleep_until(start_ns + offset_ns, spin_threshold_ns)
+        yield index, start_clock_ns + offset_ns
+        offset_s += rate.interval(offset_s)
+
+
+async def async_paced_schedule(count, rate):
+    """
+    Same schedule as paced_schedule(), but waits on the running event loop's timer,
+    so other tasks run in between. Its accuracy is the loop's timer resolution.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    start_clock_ns = now_ns()
+    offset_s = 0.0
+    for index in range(count):
+        delay = start + offset_s - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        yield index, start_clock_ns + int(offset_s * 1_000_000_000)
+        offset_s += rate.interval(offset_s)
@@ -0,0 +1,140 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import numpy as np
+from payloads import make_payload
+from results_io import read_columns, write_columns, RESULT_FORMATS
+from scenarios import TRANSPORTS, resolve_scenario
+from run_benchmark import next_run_dir, run_repetition
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmark"))
+from stage_breakdown import read_scenario, timing_rows_to_skip
+
+# Stage -> timing file of a run, each row holds the start and end of one message
+STAGE_FILES = {
+    "Serialize Py": "serialize_time.csv",
+    "Deserialize Py": "deserialize_time.csv",
+    "Deserialize ROS": "time_deserialize.csv",
+    "Serialize ROS": "time_serialize.csv",
+}
+SIZE_SAMPLES = 100  # Messages whose encoded size is averaged per payload size
+SUSTAINED_QUANTILES = (0.1, 0.9)  # Arrivals between these quantiles give the throughput, without the ramp-up and the tail
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Sweep the payload size and record latency and throughput per size')
+    parser.add_argument('--transport', type=str, nargs='+', default=list(TRANSPORTS), choices=list(TRANSPORTS),
+                       help='Transports to sweep')
+    parser.add_argument('--joints', type=int, nargs='+', default=[6],
+                       help='Joints per message')
+    parser.add_argument('--points', type=int, nargs='+', default=[1, 10, 100, 1000],
+                       help='Points per trajectory')
+    parser.add_argument('--name-length', type=int, nargs='+', default=[1],
+                       help='Characters per joint name')
+    parser.add_argument('--hz', type=float, default=100,
+                       help='Constant rate of the latency run of every size')
+    parser.add_argument('--duration', type=float, default=30,
+                       help='Seconds of sending per size')
+    parser.add_argument('--max-hz', type=float, default=50_000,
+                       help='Offered rate of the throughput run of every size, above what the bridge can take')
+    parser.add_argument('--max-messages', type=int, default=20_000,
+                       help='Messages sent open-loop per size to measure the throughput')
+    parser.add_argument('--drain', type=float, default=2,
+                       help='Seconds to wait for the last messages of a size')
+    parser.add_argument('--format', type=str, default="npy", choices=RESULT_FORMATS,
+                       help='Result format, binary columns or CSV')
+    parser.add_argument('--ros-timing-dir', type=str,
+                       help='Directory the ROS node writes its timing CSVs to, needed for the ROS stages')
+    return parser.parse_args()
+
+
+def median_stage_ms(run_dir, filename, skip=0):
+    """ Median end - start of a timing CSV in ms after its first `skip` rows, NaN if the run has none. """
+    path = os.path.join(run_dir, filename)
+    if not os.path.exists(path):
+        return np.nan
+    rows = np.loadtxt(path, delimiter=",", skiprows=1, dtype=np.int64, ndmin=2)[skip:]
+    return float(np.median(rows[:, 1] - rows[:, 0])) / 1_000_000 if len(rows) else np.nan
+
+
+def sustained_throughput(run_dir, messages):
+    """ Receive rate in msg/s and lost fraction of a run sent open-loop above capacity. """
+    received = np.sort(read_columns(os.path.join(run_dir, "arrived_messages"))["Received Time"])
+    loss = 1 - len(received) / messages
+    if len(received) < 2:
+        return np.nan, loss
+    first, last = (int(quantile * (len(received) - 1)) for quantile in SUSTAINED_QUANTILES)
+    span_s = (received[last] - received[first]) / 1_000_000_000
+    return ((last - first) / span_s if span_s > 0 else np.nan), loss
+
+
+def summarize_run(run_dir, payload_spec):
+    """ Encoded size, latency and stage medians of one payload size. """
+    payload = make_payload(payload_spec)
+    arrived = read_columns(os.path.join(run_dir, "arrived_messages"))
+    latency_ms = (arrived["Received Time"] - arrived["Sent Time"]) / 1_000_000
+    row = {
+        "Joints": payload_spec["joints"],
+        "Points": payload_spec["points"],
+        "Name Length": payload_spec["name_length"],
+        "Encoded Size": np.mean([payload.encoded_size(id_num) for id_num in range(SIZE_SAMPLES)]),
+        "Median Latency": float(np.median(latency_ms)) if len(latency_ms) else np.nan,
+        "P99 Latency": float(np.percentile(latency_ms, 99)) if len(latency_ms) else np.nan,
+    }
+    # The connection test and the warm-up come first in every timing file, their cold starts would skew the medians
+    skip = timing_rows_to_skip(read_scenario(run_dir))
+    for stage, filename in STAGE_FILES.items():
+        row[stage] = median_stage_ms(run_dir, filename, skip)
+    return row
+
+
+def main():
+    args = parse_arguments()
+    for transport in args.transport:
+        rows, runs, max_runs = [], [], []
+        for joints, points, name_length in itertools.product(args.joints, args.points, args.name_length):
+            payload_spec = {"profile": "trajectory", "joints": joints, "points": points, "name_length": name_length}
+            name = f"size_j{joints}_p{points}_n{name_length}"
+            scenario = resolve_scenario(name, {
+                "payload": payload_spec,
+                "rate": {"profile": "constant", "hz": args.hz},
+                "duration": args.duration,
+                "drain": args.drain,
+            })
+            run_dir = run_repetition(transport, name, scenario, args.format, ros_timing_dir=args.ros_timing_dir)
+            if run_dir is None:
+                continue
+            row = summarize_run(run_dir, payload_spec)
+            # At --hz the receive rate is only the offered rate, the throughput comes from sending as fast as the sender can.
+            # No warm-up, it would be a second of --max-hz, the quantiles of sustained_throughput() leave out the ramp-up.
+            max_scenario = resolve_scenario(f"{name}_max", {
+                "payload": payload_spec,
+                "rate": {"profile": "constant", "hz": args.max_hz},
+                "messages": args.max_messages,
+                "drain": args.drain,
+                "warmup": 0,
+            })
+            max_run_dir = run_repetition(transport, f"{name}_max", max_scenario, args.format, ros_timing_dir=args.ros_timing_dir)
+            if max_run_dir is None:
+                continue
+            row["Throughput"], row["Saturated Loss"] = sustained_throughput(max_run_dir, args.max_messages)
+            rows.append(row)
+            runs.append(os.path.basename(run_dir))
+            max_runs.append(os.path.basename(max_run_dir))
+            print(f"{name}: {rows[-1]['Encoded Size']:.0f} bytes, median {rows[-1]['Median Latency']:.3f} ms, "
+                  f"{rows[-1]['Throughput']:.0f} msg/s sustained at {args.max_hz:.0f} Hz offered ({rows[-1]['Saturated Loss']:.1%} lost)")
+        if not rows:
+            continue
+
+        sweep_dir = next_run_dir(transport, "payload_sweep")
+        write_columns(os.path.join(sweep_dir, "sweep"), {key: [row[key] for row in rows] for key in rows[0]}, args.format)
+        with open(os.path.join(sweep_dir, "sweep.json"), 'w') as sweep_file:
+            json.dump({"transport": transport, "hz": args.hz, "duration": args.duration, "max_hz": args.max_hz,
+                       "max_messages": args.max_messages, "runs": runs, "max_runs": max_runs}, sweep_file, indent=2)
+        print(f"Sweep of {transport} written to {sweep_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import json
+import numpy as np
+from ros2_sdk.ros2_sdk import TrajPoint
+
+JOINT_NAMES = ["x", "y", "z", "w", "t"]  # Names after the id, as in the recorded runs
+CHUNK_SIZE = 1024  # Messages whose values are generated in one go
+CACHED_CHUNKS = 4  # Chunks kept around, enough for sender threads that interleave ids
+
+
+def joint_names_for(id_num, joints, name_length=None):
+    """ The id followed by joints - 1 short joint names, padded with "_" to name_length characters if given. """
+    names = JOINT_NAMES + [f"j{i}" for i in range(len(JOINT_NAMES), joints - 1)]
+    if name_length is not None:
+        names = [name.ljust(name_length, "_") for name in names]
+    return [str(id_num)] + names[:joints - 1]
+
+
+def json_size(command):
+    """ Bytes of a command encoded as JSON, the default codec of the loopback bridge. """
+    return len(json.dumps(command).encode())
+
+
+class ChunkedValues:
+    """
+    Random values of message ids, generated with NumPy a chunk at a time on first use.
+    Every chunk has its own generator seeded with (seed, chunk index), so the values of an id
+    only depend on the seed and the id, whichever ids and threads came before.
+    """
+
+    def __init__(self, seed, make_chunk):
+        self.seed = seed
+        self.make_chunk = make_chunk  # Generator -> tuple of arrays with CHUNK_SIZE rows
+        self.chunks = {}
+
+    def get(self, id_num):
+        """ Returns the row of each array of the chunk for id_num. """
+        chunk_index, row = divmod(id_num, CHUNK_SIZE)
+        chunk = self.chunks.get(chunk_index)
+        if chunk is None:
+            # Negative ids (the warm-up) get their own streams, seeds have to be non-negative
+            entropy = [self.seed, chunk_index] if chunk_index >= 0 else [self.seed, 0, -chunk_index]
+            chunk = self.make_chunk(np.random.default_rng(entropy))
+            self.chunks[chunk_index] = chunk
+            if len(self.chunks) > CACHED_CHUNKS:
+                self.chunks.pop(next(iter(self.chunks)), None)
+        return [values[row] for values in chunk]
+
+
+class VelocityPayload:
+    """ Velocity commands with random values, they carry no id. """
+    carries_id = False
+
+    def __init__(self, seed=0, joints=6):
+        self.values = ChunkedValues(seed, lambda rng: (rng.uniform(-5, 5, (CHUNK_SIZE, joints)),))
+
+    def message(self, id_num):
+        vel_array, = self.values.get(id_num)
+        return vel_array.tolist()
+
+    def send(self, sdk, message):
+        sdk.send_velocity(message, name="velocity")
+
+    def encoded_size(self, id_num):
+        return json_size({"values": self.message(id_num)})
+
+
+class TrajectoryPayload:
+    """ Trajectories with random points, the id is sent as the first joint name. """
+    carries_id = True
+
+    def __init__(self, seed=0, joints=6, points=10, name_length=None):
+        self.joints = joints
+        self.name_length = name_length
+        self.values = ChunkedValues(seed, lambda rng: (
+            rng.uniform(-5, 5, (CHUNK_SIZE, points, joints)),  # Positions
+            rng.uniform(-5, 5, (CHUNK_SIZE, points, joints)),  # Velocities
+            rng.integers(0, 10, (CHUNK_SIZE, points), endpoint=True),  # Seconds
+            rng.integers(0, 500000, (CHUNK_SIZE, points), endpoint=True),  # Nanoseconds
+        ))
+
+    def message(self, id_num):
+        positions, velocities, seconds, nanoseconds = self.values.get(id_num)
+        trajPoints = [
+            TrajPoint(positions=pos_array, velocities=vel_array, effort=[], seconds=sec, nanoseconds=nsec)
+            for pos_array, vel_array, sec, nsec in zip(positions.tolist(), velocities.tolist(), seconds.tolist(), nanoseconds.tolist())
+        ]
+        return trajPoints, joint_names_for(id_num, self.joints, self.name_length)
+
+    def send(self, sdk, message):
+        trajPoints, joint_names = message
+        sdk.send_trajectory(trajPoints=trajPoints, joint_names=joint_names, name="trajectory")
+
+    def encoded_size(self, id_num):
+        positions, velocities, seconds, nanoseconds = self.values.get(id_num)
+        points = [
+            {"positions": pos_array, "velocities": vel_array, "effort": [], "seconds": sec, "nanoseconds": nsec}
+            for pos_array, vel_array, sec, nsec in zip(positions.tolist(), velocities.tolist(), seconds.tolist(), nanoseconds.tolist())
+        ]
+        return json_size({"joint_names": joint_names_for(id_num, self.joints, self.name_length), "points": points})
+
+
+class MinimalTrajectoryPayload:
+    """ The smallest trajectory that still carries the id, used to find the rate limit. """
+    carries_id = True
+
+    def __init__(self, seed=0):
+        self.trajPoints = [TrajPoint(positions=[], velocities=[1.0, 1.0, 1.0, 1.0], effort=[], seconds=0, nanoseconds=0)]
+
+    def message(self, id_num):
+        return [str(id_num)]
+
+    def send(self, sdk, message):
+        sdk.send_trajectory(trajPoints=self.trajPoints, joint_names=message, name="trajectory")
+
+    def encoded_size(self, id_num):
+        point = {"positions": [], "velocities": [1.0, 1.0, 1.0, 1.0], "effort": [], "seconds": 0, "nanoseconds": 0}
+        return json_size({"joint_names": self.message(id_num), "points": [point]})
+
+
+PAYLOADS = {
+    "velocity": VelocityPayload,
+    "trajectory": TrajectoryPayload,
+    "minimal_trajectory": MinimalTrajectoryPayload,
+}
+
+
+def make_payload(spec):
+    """
+    Builds the payload of a scenario, e.g. {"profile": "trajectory", "points": 10, "seed": 0}.
+    Messages are generated on demand: payload.message(id_num) before the send timestamp
+    is taken, payload.send(sdk, message) to send it. payload.encoded_size(id_num) is the
+    JSON size of a message, for the analysis only.
+    """
+    options = dict(spec)
+    profile = options.pop("profile")
+    if profile not in PAYLOADS:
+        raise ValueError(f"Unknown payload profile {profile!r}, expected one of {list(PAYLOADS)}")
+    return PAYLOADS[profile](**options)
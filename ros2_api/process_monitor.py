@@ -0,0 +1,147 @@
+import os
+import socket
+import struct
+import time
+import psutil
+from pacing import sleep_until
+from clock_sync import now_ns
+from results_io import write_columns
+
+# sock_diag netlink request for the queue lengths of all unix sockets, /proc/net/unix has none
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST_DUMP = 0x301
+NLMSG_ERROR, NLMSG_DONE = 2, 3
+UDIAG_SHOW_RQLEN = 0x10
+UNIX_DIAG_RQLEN = 4
+NLMSG_HEADER = struct.Struct("=IHHII")
+UNIX_DIAG_REQUEST = struct.Struct("=BBHIII8x")
+UNIX_DIAG_MESSAGE = struct.Struct("=BBBBI8x")
+ATTRIBUTE_HEADER = struct.Struct("=HH")
+
+COLUMNS = ["Time", "CPU Usage", "RSS", "Voluntary Switches", "Involuntary Switches", "Threads", "Send Queue", "Receive Queue"]
+
+
+def socket_inodes(pid):
+    """ Inodes of the sockets a process has open. """
+    inodes = set()
+    fd_dir = f"/proc/{pid}/fd"
+    for fd in os.listdir(fd_dir):
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:  # Closed in the meantime
+            continue
+        if target.startswith("socket:["):
+            inodes.add(int(target[8:-1]))
+    return inodes
+
+
+def tcp_queue_depths():
+    """ {inode: (send queue, receive queue)} in bytes of all TCP sockets. """
+    depths = {}
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as table_file:
+                lines = table_file.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            send_queue, receive_queue = fields[4].split(":")  # tx_queue:rx_queue in hex
+            depths[int(fields[9])] = (int(send_queue, 16), int(receive_queue, 16))
+    return depths
+
+
+def unix_queue_depths():
+    """
+    {inode: (send queue, receive queue)} of all unix sockets, via sock_diag like `ss -x`.
+    Raises OSError where netlink or sock_diag isn't available, e.g. in containers or under seccomp.
+    """
+    depths = {}
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_SOCK_DIAG) as diag:
+        request = UNIX_DIAG_REQUEST.pack(socket.AF_UNIX, 0, 0, 0xffffffff, 0, UDIAG_SHOW_RQLEN)
+        diag.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(request), SOCK_DIAG_BY_FAMILY, NLM_F_REQUEST_DUMP, 1, 0) + request)
+        while True:
+            data = diag.recv(65536)
+            offset = 0
+            while offset < len(data):
+                length, message_type, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+                if message_type in (NLMSG_DONE, NLMSG_ERROR):
+                    return depths
+                _, _, _, _, inode = UNIX_DIAG_MESSAGE.unpack_from(data, offset + NLMSG_HEADER.size)
+                attribute = offset + NLMSG_HEADER.size + UNIX_DIAG_MESSAGE.size
+                while attribute < offset + length:
+                    attribute_length, attribute_type = ATTRIBUTE_HEADER.unpack_from(data, attribute)
+                    if attribute_type == UNIX_DIAG_RQLEN:
+                        receive_queue, send_queue = struct.unpack_from("=II", data, attribute + ATTRIBUTE_HEADER.size)
+                        depths[inode] = (send_queue, receive_queue)
+                    attribute += (attribute_length + 3) & ~3
+                offset += (length + 3) & ~3
+
+
+def monitor_processes(pids, interval_ms, stop_monitoring, run_dir, result_format="npy"):
+    """
+    Samples the processes {name: pid} every interval_ms until stop_monitoring is set and writes
+    one process_usage_<name> table per process: CPU in % of one core, RSS in bytes, the cumulative
+    context switches, the thread count and the bytes queued in all of the process' sockets.
+    Meant to run in its own process, so it doesn't compete with the measured ones for the GIL.
+    """
+    samples = {name: {column: [] for column in COLUMNS} for name in pids}
+    processes, last_cpu = {}, {}
+    for name, pid in pids.items():
+        try:
+            process = psutil.Process(pid)
+            last_cpu[name] = (now_ns(), sum(process.cpu_times()[:2]))
+        except psutil.NoSuchProcess:  # Exited before the monitor started, its table stays empty
+            print(f"Process {name} ({pid}) has already exited, it isn't monitored")
+            continue
+        processes[name] = process
+    hidden_sockets = set()  # Processes of other users, e.g. a bridge run as root, whose sockets can't be listed
+    unix_depths = True  # Until sock_diag fails once, then the unix queues are recorded as 0
+    interval_ns = int(interval_ms * 1_000_000)
+    deadline_ns = time.perf_counter_ns()
+    try:
+        while not stop_monitoring.is_set() and processes:
+            deadline_ns += interval_ns
+            sleep_until(deadline_ns, 0)  # No spinning, the monitor mustn't steal CPU from the measured processes
+            depths = tcp_queue_depths()
+            if unix_depths:
+                try:
+                    depths.update(unix_queue_depths())
+                except OSError as error:
+                    print(f"No unix socket queue depths ({error}), they are recorded as 0")
+                    unix_depths = False
+            for name, process in list(processes.items()):
+                try:
+                    with process.oneshot():
+                        sample_ns = now_ns()
+                        cpu_s = sum(process.cpu_times()[:2])  # user + system
+                        memory = process.memory_info()
+                        switches = process.num_ctx_switches()
+                        threads = process.num_threads()
+                    try:
+                        queues = [depths.get(inode, (0, 0)) for inode in socket_inodes(process.pid)]
+                    except (psutil.AccessDenied, PermissionError):
+                        if name not in hidden_sockets:
+                            print(f"No access to the sockets of {name} ({process.pid}), its queue depths are recorded as 0")
+                            hidden_sockets.add(name)
+                        queues = []
+                except (psutil.NoSuchProcess, FileNotFoundError):  # Exited, keep what was sampled so far
+                    del processes[name]
+                    continue
+                last_ns, last_cpu_s = last_cpu[name]
+                last_cpu[name] = (sample_ns, cpu_s)
+                row = samples[name]
+                row["Time"].append(sample_ns)
+                # CPU times advance in clock ticks (usually 10 ms), short intervals are noisy but average out
+                row["CPU Usage"].append(100 * (cpu_s - last_cpu_s) * 1_000_000_000 / max(sample_ns - last_ns, 1))
+                row["RSS"].append(memory.rss)
+                row["Voluntary Switches"].append(switches.voluntary)
+                row["Involuntary Switches"].append(switches.involuntary)
+                row["Threads"].append(threads)
+                row["Send Queue"].append(sum(send for send, _ in queues))
+                row["Receive Queue"].append(sum(receive for _, receive in queues))
+    finally:
+        # Whatever stopped the monitor, the samples so far are written
+        for name, columns in samples.items():
+            write_columns(os.path.join(run_dir, f"process_usage_{name}"), columns, result_format)
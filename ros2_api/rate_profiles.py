@@ -0,0 +1,138 @@
+import math
+import numpy as np
+
+
+class ConstantRate:
+    """ A fixed frequency. """
+
+    def __init__(self, hz):
+        self.hz = hz
+
+    def interval(self, offset_s):
+        return 1 / self.hz
+
+    def messages(self, duration):
+        return int(self.hz * duration)
+
+
+class LinearRamp:
+    """ A frequency that increases linearly with the elapsed (intended) time. """
+
+    def __init__(self, starting_hz, increase_hz_per_second):
+        self.starting_hz = starting_hz
+        self.increase_hz_per_second = increase_hz_per_second
+
+    def interval(self, offset_s):
+        return 1 / (self.starting_hz + self.increase_hz_per_second * offset_s)
+
+    def messages(self, duration):
+        return int(self.starting_hz * duration + self.increase_hz_per_second * duration ** 2 / 2)
+
+
+class PoissonArrivals:
+    """
+    Exponentially distributed intervals with a mean rate of hz, from a fixed seed.
+    Every stream, e.g. (client, sender), draws its own intervals from the seed, so parallel senders don't send in lockstep.
+    """
+
+    def __init__(self, hz, seed=0, stream=()):
+        self.hz = hz
+        self.rng = np.random.default_rng([seed, *stream])
+
+    def interval(self, offset_s):
+        return self.rng.exponential(1 / self.hz)
+
+    def messages(self, duration):
+        return int(self.hz * duration)
+
+
+class Bursts:
+    """ burst_size messages back-to-back, bursts_per_second times a second. """
+
+    def __init__(self, burst_size, bursts_per_second):
+        self.burst_size = burst_size
+        self.period_s = 1 / bursts_per_second
+        self.sent = 0
+
+    def interval(self, offset_s):
+        self.sent += 1
+        if self.sent % self.burst_size:
+            return 0.0
+        # The next burst starts one period after the start of this one
+        return self.sent // self.burst_size * self.period_s - offset_s
+
+    def messages(self, duration):
+        return int(duration / self.period_s) * self.burst_size
+
+
+class Sinusoidal:
+    """ A frequency of mean_hz +- amplitude_hz with a period of period_s seconds. """
+
+    def __init__(self, mean_hz, amplitude_hz, period_s):
+        if amplitude_hz >= mean_hz:
+            raise ValueError("The amplitude of a sinusoidal rate has to stay below its mean")
+        self.mean_hz = mean_hz
+        self.amplitude_hz = amplitude_hz
+        self.period_s = period_s
+
+    def interval(self, offset_s):
+        return 1 / (self.mean_hz + self.amplitude_hz * math.sin(2 * math.pi * offset_s / self.period_s))
+
+    def messages(self, duration):
+        # Integral of the frequency over the duration
+        phase = 2 * math.pi * duration / self.period_s
+        return int(self.mean_hz * duration + self.amplitude_hz * self.period_s / (2 * math.pi) * (1 - math.cos(phase)))
+
+
+class TraceReplay:
+    """
+    Replays the intervals between the arrivals recorded in a message_arrival_times.csv (TimeArrival_ns),
+    sped up by `speed` and repeated from the start once the trace ends.
+    """
+
+    def __init__(self, path, speed=1.0):
+        arrivals_ns = np.loadtxt(path, delimiter=",", skiprows=1, usecols=0, dtype=np.int64, ndmin=1)
+        if len(arrivals_ns) < 2:
+            raise ValueError(f"{path} needs at least two arrivals to replay")
+        self.intervals = np.maximum(np.diff(arrivals_ns), 0) / 1_000_000_000 / speed
+        self.next_index = 0
+
+    def interval(self, offset_s):
+        interval = self.intervals[self.next_index]
+        self.next_index = (self.next_index + 1) % len(self.intervals)
+        return float(interval)
+
+    def messages(self, duration):
+        trace_s = self.intervals.sum()
+        repeats, remainder_s = divmod(duration, trace_s) if trace_s else (0, 0)
+        return int(repeats) * len(self.intervals) + int(np.searchsorted(np.cumsum(self.intervals), remainder_s, side="right"))
+
+
+RATE_PROFILES = {
+    "constant": ConstantRate,
+    "ramp": LinearRamp,
+    "poisson": PoissonArrivals,
+    "burst": Bursts,
+    "sinusoidal": Sinusoidal,
+    "trace": TraceReplay,
+}
+SEEDED_PROFILES = {"poisson"}  # Profiles drawing random intervals, one stream per sender
+
+
+def make_rate(spec, stream=()):
+    """
+    Builds the rate profile of a scenario, e.g. {"profile": "constant", "hz": 200},
+    {"profile": "poisson", "hz": 200, "seed": 0}, {"profile": "burst", "burst_size": 10, "bursts_per_second": 20},
+    {"profile": "sinusoidal", "mean_hz": 200, "amplitude_hz": 150, "period_s": 10} or
+    {"profile": "trace", "path": "benchmark/data/system_100_1/message_arrival_times.csv", "speed": 1.0}.
+    rate.interval(offset_s) returns the seconds from the send intended at offset_s to the next one,
+    rate.messages(duration) the number of sends in duration seconds.
+    `stream` identifies the sender as a tuple of non-negative ints; random profiles draw a separate sequence for each.
+    """
+    options = dict(spec)
+    profile = options.pop("profile")
+    if profile not in RATE_PROFILES:
+        raise ValueError(f"Unknown rate profile {profile!r}, expected one of {list(RATE_PROFILES)}")
+    if profile in SEEDED_PROFILES:
+        options["stream"] = tuple(stream)
+    return RATE_PROFILES[profile](**options)
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def parse_id(name):
+    """ Parses the message id carried in names[0], None if it isn't one of ours. """
+    try:
+        return int(name)
+    except (TypeError, ValueError):
+        return None
+
+
+class RunRecorder:
+    """
+    Preallocated int64 columns indexed by message id.
+    np.zeros() only maps the pages, memory is committed as ids are written,
+    so a run of millions of messages starts instantly and stays small.
+    """
+
+    def __init__(self, capacity, first_id=0):
+        self.capacity = capacity
+        self.first_id = first_id  # Id of index 0, clients of a fan-in run use disjoint id ranges
+        self.intended_times = np.zeros(capacity, dtype=np.int64)
+        self.sent_times = np.zeros(capacity, dtype=np.int64)
+        self.received_times = np.zeros(capacity, dtype=np.int64)
+        self.status = np.zeros(capacity, dtype=np.uint8)  # One status byte per id, see matching.py
+
+    def columns(self, indices, received=True):
+        """ Returns the named columns for the given indices, in the order of the CSV headers. """
+        columns = {
+            "ID": indices + self.first_id,
+            "Intended Time": self.intended_times[indices],
+            "Sent Time": self.sent_times[indices],
+        }
+        if received:
+            columns["Received Time"] = self.received_times[indices]
+        return columns
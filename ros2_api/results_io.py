@@ -0,0 +1,53 @@
+import csv
+import os
+import numpy as np
+
+# "npy": a directory per table with one .npy per column, "csv": a single CSV file as before
+RESULT_FORMATS = ("npy", "csv")
+
+
+def column_file(header):
+    """ File name of a column, e.g. "Sent Time" -> "sent_time.npy". """
+    return header.lower().replace(" ", "_") + ".npy"
+
+
+def write_columns(path, columns, fmt="npy"):
+    """
+    Writes named columns to `path` (without extension) in a single bulk write per column.
+    npy: `path`/columns.txt holds the headers in order, next to one .npy file per column.
+    csv: `path`.csv with the headers in the first row.
+    """
+    if fmt == "npy":
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "columns.txt"), 'w') as header_file:
+            header_file.write("\n".join(columns.keys()) + "\n")
+        for header, column in columns.items():
+            np.save(os.path.join(path, column_file(header)), np.asarray(column))
+    elif fmt == "csv":
+        with open(f"{path}.csv", 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(columns.keys())
+            writer.writerows(zip(*(np.asarray(column).tolist() for column in columns.values())))
+    else:
+        raise ValueError(f"Unknown result format {fmt!r}, expected one of {RESULT_FORMATS}")
+
+
+def read_columns(path):
+    """ Reads the named columns written by write_columns(), from `path`/ or `path`.csv. """
+    header_path = os.path.join(path, "columns.txt")
+    if os.path.isfile(header_path):
+        with open(header_path) as header_file:
+            headers = header_file.read().splitlines()
+        return {header: np.load(os.path.join(path, column_file(header))) for header in headers}
+    with open(f"{path}.csv", newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        headers = next(reader)
+        rows = list(reader)
+    columns = {}
+    for i, header in enumerate(headers):
+        values = [row[i] for row in rows]
+        try:
+            columns[header] = np.array(values, dtype=np.int64)
+        except ValueError:  # e.g. the usage percentages of system_usage
+            columns[header] = np.array(values, dtype=np.float64)
+    return columns
@@ -0,0 +1,241 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import numpy as np
+import psutil
+from results_io import write_columns, read_columns, RESULT_FORMATS
+from payloads import make_payload
+from scenarios import TRANSPORTS, SCENARIOS, message_count, resolve_scenario, load_scenario_file
+from client import run_client, warmup_count
+from async_client import run_client_async
+from process_monitor import monitor_processes
+from clock_sync import measure_offset, now_ns, write_clock_sync
+from latency_histogram import LatencyHistogram
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmark", "data")
+ROS_TIMING_FILES = ["time_serialize.csv", "time_deserialize.csv"]  # Written by the ROS node
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Run ROS2 API benchmarks')
+    parser.add_argument('--scenario', type=str, default="big",
+                       help=f'Built-in scenario ({", ".join(SCENARIOS)})')
+    parser.add_argument('--scenario-file', type=str,
+                       help='JSON sweep of transports, scenarios and repetitions (see scenarios.py)')
+    parser.add_argument('--transport', type=str, nargs='+', default=["tcp"], choices=list(TRANSPORTS),
+                       help='Transports to run the scenario on')
+    parser.add_argument('--repetitions', type=int, default=1,
+                       help='Runs per transport and scenario')
+    parser.add_argument('--hz', type=float,
+                       help='Override the scenario with a constant rate')
+    parser.add_argument('--rate', type=json.loads,
+                       help='Override the rate profile with JSON, e.g. \'{"profile": "poisson", "hz": 500}\' (see rate_profiles.py)')
+    parser.add_argument('--duration', type=float,
+                       help='Override the seconds of sending')
+    parser.add_argument('--clients', type=int,
+                       help='Override the number of SDK clients, each in its own process')
+    parser.add_argument('--threads', type=int,
+                       help='Override the number of sender threads per client')
+    parser.add_argument('--asyncio', action='store_true',
+                       help='Pace and receive on an asyncio event loop instead of threads')
+    parser.add_argument('--monitor', action='store_true',
+                       help='Record system and per-process usage, also for scenarios that don\'t by default')
+    parser.add_argument('--monitor-interval-ms', type=float,
+                       help='Override the per-process sampling interval, down to 10 ms')
+    parser.add_argument('--bridge-pid', type=int,
+                       help='PID of the ROS2 API bridge (or loopback bridge), monitored next to the SDK clients')
+    parser.add_argument('--format', type=str, default="npy", choices=RESULT_FORMATS,
+                       help='Result format, binary columns or CSV')
+    parser.add_argument('--ros-timing-dir', type=str,
+                       help='Directory the ROS node writes its timing CSVs to, they are moved into the run directory')
+    return parser.parse_args()
+
+
+def next_run_dir(transport, name):
+    """ Creates the first free benchmark/data/<transport>_<scenario>_<n>/ directory, n starting at 1. """
+    for n in itertools.count(1):
+        run_dir = os.path.join(DATA_DIR, f"{transport}_{name}_{n}")
+        if not os.path.exists(run_dir):
+            os.makedirs(run_dir)
+            return run_dir
+
+
+def monitor_system_resources(system_data, stop_monitoring, start_ns):
+    while not stop_monitoring.is_set():
+        # Record timestamp (milliseconds since the run's clock_sync start, the origin of the per-second analysis)
+        elapsed_ms = (now_ns() - start_ns) // 1_000_000
+
+        # Get CPU and memory usage
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory_percent = psutil.virtual_memory().percent
+
+        # Store data
+        system_data.append([elapsed_ms, cpu_percent, memory_percent])
+
+        # Sleep for 100ms
+        time.sleep(0.1)
+
+
+def collect_files(names, source_dir, run_dir, timeout_s=5):
+    """
+    Moves timing files written outside of the harness into the run directory.
+    The bridge writes them once the SDK disconnected, so they may take a moment to appear.
+    """
+    deadline = time.time() + timeout_s
+    while not all(os.path.exists(os.path.join(source_dir, name)) for name in names) and time.time() < deadline:
+        time.sleep(0.1)
+    for name in names:
+        path = os.path.join(source_dir, name)
+        if os.path.exists(path):
+            shutil.move(path, os.path.join(run_dir, name))
+        else:
+            print(f"{path} was not written, the run has no ROS timing")
+
+
+def merge_clients(run_dir, clients, result_format="npy"):
+    """ Merges the tables of all clients into one timeline, with the client of each message. """
+    for name, time_column in [("arrived_messages", "Received Time"), ("invalid_ids_never_arrived", "Sent Time"),
+                              ("invalid_ids_arrived_too_late", "Received Time")]:
+        tables = [read_columns(os.path.join(run_dir, f"client_{client}", name)) for client in range(clients)]
+        merged = {header: np.concatenate([table[header] for table in tables]) for header in tables[0]}
+        merged["Client"] = np.concatenate([np.full(len(table["ID"]), client) for client, table in enumerate(tables)])
+        order = np.argsort(merged[time_column], kind="stable")
+        write_columns(os.path.join(run_dir, name), {header: column[order] for header, column in merged.items()}, result_format)
+    histogram = LatencyHistogram()
+    for client in range(clients):
+        histogram.merge(LatencyHistogram.load(os.path.join(run_dir, f"client_{client}", "latency_histogram.npz")))
+    histogram.save(os.path.join(run_dir, "latency_histogram.npz"))
+
+    arrived = read_columns(os.path.join(run_dir, "arrived_messages"))
+    if len(arrived["ID"]) > 1:
+        sent_span_s = (arrived["Sent Time"].max() - arrived["Sent Time"].min()) / 1_000_000_000
+        latency_ms = (arrived["Received Time"] - arrived["Sent Time"]) / 1_000_000
+        print(f"{run_dir}: {clients} clients, {len(latency_ms) / sent_span_s:.0f} msg/s arrived, "
+              f"p99 latency {np.percentile(latency_ms, 99):.3f} ms, max {latency_ms.max():.3f} ms")
+
+
+def start_process_monitor(pids, scenario, run_dir, result_format):
+    """ Starts monitor_processes() in its own process, returns (process, stop event). """
+    context = multiprocessing.get_context("spawn")
+    stop_monitoring = context.Event()
+    monitor = context.Process(target=monitor_processes, args=(pids, scenario.get("monitor_interval_ms", 100), stop_monitoring, run_dir, result_format))
+    monitor.start()
+    return monitor, stop_monitoring
+
+
+def run_once(transport, scenario, run_dir, result_format="npy", bridge_pid=None):
+    """
+    Runs one repetition of a scenario on a transport and writes its results into run_dir.
+    With scenario["clients"] > 1 every client is a separate process with its own id range
+    and its results in run_dir/client_<n>/, merged into run_dir afterwards.
+    Monitored scenarios also sample the SDK client processes and the bridge (bridge_pid) one by one.
+    """
+    clients = scenario.get("clients", 1)
+    if clients > 1 or scenario.get("threads", 1) > 1:
+        if not make_payload(scenario["payload"]).carries_id:
+            raise ValueError("Several clients or sender threads need a payload that carries the id")
+
+    clock_start = measure_offset()  # Relates the harness clock to the realtime clock of the SDK and ROS timing
+    system_data = []
+    stop_monitoring = threading.Event()
+    monitoring_thread = threading.Thread(target=monitor_system_resources, args=(system_data, stop_monitoring, clock_start["monotonic_ns"]))
+    monitoring_thread.daemon = True
+    if scenario["monitor"]:
+        monitoring_thread.start()
+
+    bridge = {"bridge": bridge_pid} if bridge_pid else {}
+    process_monitor = None
+    client_target = run_client_async if scenario.get("asyncio") else run_client
+    if clients == 1:
+        if scenario["monitor"]:
+            process_monitor = start_process_monitor({"sdk": os.getpid(), **bridge}, scenario, run_dir, result_format)
+        client_target(transport, scenario, run_dir, 0, result_format)
+    else:
+        ids_per_client = message_count(scenario) * scenario.get("threads", 1)
+        context = multiprocessing.get_context("spawn")
+        processes = []
+        for client in range(clients):
+            client_dir = os.path.join(run_dir, f"client_{client}")
+            os.makedirs(client_dir)
+            processes.append(context.Process(target=client_target, args=(transport, scenario, client_dir, client * ids_per_client, result_format)))
+        for process in processes:
+            process.start()
+        if scenario["monitor"]:
+            pids = {f"sdk_{client}": process.pid for client, process in enumerate(processes)}
+            process_monitor = start_process_monitor({**pids, **bridge}, scenario, run_dir, result_format)
+        for process in processes:
+            process.join()
+        failed = [client for client, process in enumerate(processes) if process.exitcode != 0]
+        if failed:
+            raise RuntimeError(f"Clients {failed} of {run_dir} failed")
+        merge_clients(run_dir, clients, result_format)
+
+    if scenario["monitor"]:
+        stop_monitoring.set()
+        monitoring_thread.join()
+        monitor, stop_process_monitor = process_monitor
+        stop_process_monitor.set()
+        monitor.join()
+        if monitor.exitcode != 0:
+            print(f"The process monitor of {run_dir} failed with exit code {monitor.exitcode}, its process_usage tables may be cut short")
+        time_ms, cpu_usage, memory_usage = zip(*system_data)
+        write_columns(os.path.join(run_dir, "system_usage"), {"Time": time_ms, "CPU Usage": cpu_usage, "Memory Usage": memory_usage}, result_format)
+    write_clock_sync(os.path.join(run_dir, "clock_sync.json"), clock_start, measure_offset())
+    with open(os.path.join(run_dir, "scenario.json"), 'w') as scenario_file:
+        json.dump({"transport": transport, "messages": message_count(scenario), "warmup_messages": warmup_count(scenario), **scenario}, scenario_file, indent=2)
+
+
+def run_repetition(transport, name, scenario, result_format="npy", bridge_pid=None, ros_timing_dir=None):
+    """ Runs run_once() into a new run directory and collects the ROS timing, returns the directory or None if the run failed. """
+    run_dir = next_run_dir(transport, name)
+    print(f"Running {name} on {transport} into {run_dir}")
+    # Every run gets its own process, so no SDK state or socket survives into the next run
+    process = multiprocessing.get_context("spawn").Process(target=run_once, args=(transport, scenario, run_dir, result_format, bridge_pid))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        print(f"Run {run_dir} failed with exit code {process.exitcode}")
+        return None
+    if ros_timing_dir:
+        collect_files(ROS_TIMING_FILES, ros_timing_dir, run_dir)
+    return run_dir
+
+
+def main():
+    args = parse_arguments()
+    if args.scenario_file:
+        transports, repetitions, scenarios = load_scenario_file(args.scenario_file)
+    else:
+        overrides = {}
+        if args.hz is not None:
+            overrides["rate"] = {"profile": "constant", "hz": args.hz}
+        if args.rate is not None:
+            overrides["rate"] = args.rate
+        if args.duration is not None:
+            overrides["duration"] = args.duration
+        if args.clients is not None:
+            overrides["clients"] = args.clients
+        if args.threads is not None:
+            overrides["threads"] = args.threads
+        if args.asyncio:
+            overrides["asyncio"] = True
+        if args.monitor:
+            overrides["monitor"] = True
+        if args.monitor_interval_ms is not None:
+            overrides["monitor_interval_ms"] = args.monitor_interval_ms
+        transports, repetitions = args.transport, args.repetitions
+        scenarios = [(args.scenario, resolve_scenario(args.scenario, overrides))]
+
+    for name, scenario in scenarios:
+        for transport in transports:
+            for _ in range(repetitions):
+                run_repetition(transport, name, scenario, args.format, args.bridge_pid, args.ros_timing_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import json
+import os
+from rate_profiles import make_rate
+
+# Transport name -> arguments of sdk.connect()
+TRANSPORTS = {
+    "tcp": ("TCP", {"port_send": 5555, "port_recv": 5556, "ip": "localhost"}),
+    "uds": ("UDS", {"path_recv": "/tmp/test_ros2_send.socket", "path_send": "/tmp/test_sdk_send.socket"}),
+}
+
+# Built-in scenarios, formerly benchmark_normal.py, benchmark_big.py and benchmark_limit.py
+# duration: seconds of sending, drain: seconds to wait for the last messages,
+# warmup: seconds of unrecorded sending before the measured phase (default 1),
+# monitor: record system and per-process usage, monitor_interval_ms: per-process sampling interval (default 100),
+# sdk_timing: write the SDK's serialize/deserialize timing CSVs,
+# clients: SDK client processes, threads: sender threads per client (each sends at the full rate),
+# asyncio: pace and receive on an event loop, threads are then sender tasks
+SCENARIOS = {
+    "small": {
+        "payload": {"profile": "velocity"},
+        "rate": {"profile": "constant", "hz": 200},
+        "duration": 500,
+        "drain": 5,
+    },
+    "big": {
+        "payload": {"profile": "trajectory", "joints": 6, "points": 10},
+        "rate": {"profile": "constant", "hz": 100},
+        "duration": 600,
+        "drain": 5,
+    },
+    "limit": {
+        "payload": {"profile": "minimal_trajectory"},
+        "rate": {"profile": "ramp", "starting_hz": 100, "increase_hz_per_second": 100},
+        "duration": 300,
+        "drain": 60,
+        "monitor": True,
+        "sdk_timing": False,
+    },
+}
+
+
+def message_count(scenario):
+    """ Number of messages sent by a scenario, given explicitly or by its rate and duration. """
+    if "messages" in scenario:
+        return scenario["messages"]
+    return make_rate(scenario["rate"]).messages(scenario["duration"])
+
+
+def resolve_scenario(name, overrides=None):
+    """ Returns the scenario `name`, a built-in one updated with `overrides` or a new one. """
+    if name not in SCENARIOS and not overrides:
+        raise ValueError(f"Unknown scenario {name!r}, expected one of {list(SCENARIOS)} or a scenario file")
+    scenario = {"drain": 5, "monitor": False, "warmup": 1, **SCENARIOS.get(name, {}), **(overrides or {})}
+    for key in ("payload", "rate"):
+        if key not in scenario:
+            raise ValueError(f"Scenario {name!r} has no {key}")
+    if "messages" not in scenario and "duration" not in scenario:
+        raise ValueError(f"Scenario {name!r} needs a duration or a number of messages")
+    if "path" in scenario["rate"]:  # The clients run in their run directory, traces are found from here
+        scenario["rate"] = {**scenario["rate"], "path": os.path.abspath(scenario["rate"]["path"])}
+    return scenario
+
+
+def load_scenario_file(path):
+    """
+    Loads a sweep from a JSON file:
+    {"transports": ["tcp", "uds"], "repetitions": 3,
+     "scenarios": [{"name": "big"}, {"name": "big_fast", "payload": {...}, "rate": {...}, "duration": 60}]}
+    Each entry overrides the built-in scenario of the same name, if there is one.
+    Returns (transports, repetitions, [(name, scenario), ...]).
+    """
+    with open(path) as scenario_file:
+        sweep = json.load(scenario_file)
+    transports = sweep.get("transports", list(TRANSPORTS))
+    scenarios = []
+    for entry in sweep["scenarios"]:
+        overrides = dict(entry)
+        name = overrides.pop("name")
+        scenarios.append((name, resolve_scenario(name, overrides)))
+    return transports, sweep.get("repetitions", 1), scenarios
@@ -0,0 +1,95 @@
+import math
+import numpy as np
+import pytest
+from latency_histogram import LatencyHistogram
+
+RELATIVE_ERROR = 0.001  # 3 significant digits
+
+
+def latencies(count=20_000, seed=0):
+    """ Log-normal latencies from microseconds to seconds, in ns. """
+    return np.random.default_rng(seed).lognormal(mean=13, sigma=2, size=count).astype(np.int64)
+
+
+def test_bucket_holds_value_within_precision():
+    histogram = LatencyHistogram()
+    for value in [0, 1, 2047, 2048, 2049, 123_456, 999_999_999, 3_600_000_000_000]:
+        highest = histogram.bucket_highest(histogram.bucket_index(value))
+        assert value <= highest <= value + value * RELATIVE_ERROR
+
+
+def test_vectorized_buckets_match_scalar():
+    histogram = LatencyHistogram()
+    values = np.concatenate([np.arange(5000), latencies()])
+    assert histogram.bucket_indices(values).tolist() == [histogram.bucket_index(int(value)) for value in values]
+
+
+def test_record_many_matches_record():
+    values = latencies()
+    one_by_one, at_once = LatencyHistogram(), LatencyHistogram()
+    for value in values:
+        one_by_one.record(value)
+    at_once.record_many(values)
+    assert np.array_equal(one_by_one.counts, at_once.counts)
+    assert (one_by_one.total, one_by_one.sum_ns, one_by_one.min_ns, one_by_one.max_ns) == \
+        (at_once.total, at_once.sum_ns, at_once.min_ns, at_once.max_ns)
+    assert one_by_one.sum_squares == pytest.approx(at_once.sum_squares)
+
+
+@pytest.mark.parametrize("quantile", [0.0, 0.5, 0.9, 0.99, 0.999, 1.0])
+def test_quantile_within_precision(quantile):
+    values = latencies()
+    histogram = LatencyHistogram()
+    histogram.record_many(values)
+    exact = np.sort(values)[max(math.ceil(quantile * len(values)), 1) - 1]
+    assert abs(histogram.value_at_quantile(quantile) - exact) <= exact * RELATIVE_ERROR
+
+
+def test_statistics_match_numpy():
+    values = latencies()
+    histogram = LatencyHistogram()
+    histogram.record_many(values)
+    assert histogram.mean() == pytest.approx(values.mean())
+    assert histogram.std() == pytest.approx(values.std(ddof=1))
+    assert (histogram.min_ns, histogram.max_ns) == (values.min(), values.max())
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert math.isnan(histogram.value_at_quantile(0.5))
+    assert math.isnan(histogram.mean())
+
+
+def test_merge_equals_recording_everything():
+    first, second = latencies(seed=1), latencies(seed=2)
+    merged, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    merged.record_many(np.concatenate([first, second]))
+    left.record_many(first)
+    right.record_many(second)
+    left.merge(right)
+    assert np.array_equal(left.counts, merged.counts)
+    assert (left.total, left.sum_ns, left.min_ns, left.max_ns) == (merged.total, merged.sum_ns, merged.min_ns, merged.max_ns)
+    assert left.value_at_quantile(0.99) == merged.value_at_quantile(0.99)
+
+
+def test_merge_rejects_other_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram().merge(LatencyHistogram(significant_digits=2))
+
+
+def test_save_load_round_trip(tmp_path):
+    histogram = LatencyHistogram()
+    histogram.record_many(latencies())
+    path = tmp_path / "latency_histogram.npz"
+    histogram.save(path)
+    loaded = LatencyHistogram.load(path)
+    assert np.array_equal(loaded.counts, histogram.counts)
+    assert (loaded.total, loaded.sum_ns, loaded.sum_squares, loaded.min_ns, loaded.max_ns) == \
+        (histogram.total, histogram.sum_ns, histogram.sum_squares, histogram.min_ns, histogram.max_ns)
+
+
+def test_save_load_empty(tmp_path):
+    path = tmp_path / "latency_histogram.npz"
+    LatencyHistogram().save(path)
+    loaded = LatencyHistogram.load(path)
+    assert loaded.total == 0 and loaded.min_ns is None and loaded.max_ns is None
@@ -0,0 +1,84 @@
+import numpy as np
+from latency_histogram import LatencyHistogram
+from matching import SequenceMatcher, NOT_RECEIVED, ON_TIME, LATE, DUPLICATE, UNKNOWN, WARMUP
+from recorder import RunRecorder
+
+
+def sent_matcher(count, first_id=0, streams=1, histogram=None):
+    """ A matcher whose ids first_id .. first_id + count - 1 were sent 1 ms apart, 10 us after their intended time. """
+    matcher = SequenceMatcher(RunRecorder(count, first_id), streams, histogram)
+    for id_num in range(first_id, first_id + count):
+        matcher.mark_sent(id_num, id_num * 1_000_000, id_num * 1_000_000 + 10_000)
+    return matcher
+
+
+def test_in_order_arrivals_are_on_time():
+    matcher = sent_matcher(5)
+    assert [matcher.on_arrival(id_num, id_num * 1_000_000 + 500_000) for id_num in range(5)] == [ON_TIME] * 5
+    arrived = matcher.arrived()
+    assert arrived["ID"].tolist() == list(range(5))
+    assert (arrived["Received Time"] - arrived["Sent Time"]).tolist() == [490_000] * 5
+    assert len(matcher.lost()["ID"]) == 0
+
+
+def test_reordered_arrival_is_late():
+    matcher = sent_matcher(3)
+    assert [matcher.on_arrival(id_num, 5_000_000) for id_num in (0, 2, 1)] == [ON_TIME, ON_TIME, LATE]
+    assert matcher.arrived(LATE)["ID"].tolist() == [1]
+    assert matcher.arrived(ON_TIME)["ID"].tolist() == [0, 2]
+
+
+def test_second_arrival_is_duplicate_and_keeps_the_first():
+    matcher = sent_matcher(2)
+    assert matcher.on_arrival(1, 3_000_000) == ON_TIME
+    assert matcher.on_arrival(1, 4_000_000) == DUPLICATE
+    assert matcher.duplicates == 1
+    assert matcher.arrived()["Received Time"].tolist() == [3_000_000]
+
+
+def test_missing_ids_are_lost():
+    matcher = sent_matcher(5)
+    for id_num in (0, 1, 3):
+        matcher.on_arrival(id_num, 10_000_000)
+    lost = matcher.lost()
+    assert lost["ID"].tolist() == [2, 4]
+    assert "Received Time" not in lost
+    assert matcher.recorder.status[[2, 4]].tolist() == [NOT_RECEIVED] * 2
+
+
+def test_unsent_ids_are_neither_lost_nor_arrived():
+    matcher = SequenceMatcher(RunRecorder(10))
+    matcher.mark_sent(0, 1, 2)
+    assert matcher.on_arrival(5, 3) == UNKNOWN  # Within the run, but never sent
+    assert matcher.sent_count() == 1
+    assert matcher.lost()["ID"].tolist() == [0]
+
+
+def test_foreign_and_warmup_ids():
+    matcher = sent_matcher(3, first_id=100)
+    assert matcher.on_arrival(99, 1) == UNKNOWN  # Id range of another client
+    assert matcher.on_arrival(103, 1) == UNKNOWN
+    assert matcher.on_arrival(None, 1) == UNKNOWN  # Payload without an id
+    assert matcher.on_arrival(-1, 1) == WARMUP
+    assert (matcher.unknown, matcher.warmup) == (3, 1)
+    assert matcher.on_arrival(101, 200_000_000) == ON_TIME
+    assert matcher.arrived()["ID"].tolist() == [101]
+
+
+def test_reordering_is_per_sender_stream():
+    # Two senders interleave their ids: sender 0 sends the even ones, sender 1 the odd ones
+    matcher = sent_matcher(6, streams=2)
+    statuses = [matcher.on_arrival(id_num, 10_000_000) for id_num in (0, 2, 4, 1, 3, 5)]
+    assert statuses == [ON_TIME] * 6
+    assert matcher.on_arrival(5, 10_000_000) == DUPLICATE
+
+
+def test_histogram_records_first_arrivals_from_the_intended_time():
+    histogram = LatencyHistogram()
+    matcher = sent_matcher(3, histogram=histogram)
+    matcher.on_arrival(0, 2_000_000)
+    matcher.on_arrival(1, 3_000_000)
+    matcher.on_arrival(1, 9_000_000)  # Duplicate, not recorded
+    assert histogram.total == 2
+    assert (histogram.min_ns, histogram.max_ns) == (2_000_000, 2_000_000)
+    assert np.isclose(histogram.mean(), 2_000_000)